@@ -22,5 +22,50 @@ License:
     All rights reserved.
 """
 
+import importlib
+import sys
+import typing
+
 from .__version__ import __version__  # noqa: F401
-from .flirextractor import FlirExtractor  # noqa: F401
+
+_lazy_exports = dict(
+    ThermalAggregator=".aggregate",
+    AsyncFlirExtractor=".aio",
+    FlirExtractor=".flirextractor",
+    ThermalIndex=".index",
+    Instrumentation=".instrument",
+    FlirExtractorPool=".pool",
+    RadiometricImage=".radiometric",
+    FlirClient=".server",
+    ThermalVisualImage=".visual",
+)
+"""Map of each exported class to its module, which is only imported when
+the class is first used, as NumPy, PIL and ExifTool are slow to import"""
+
+__all__ = ["__version__", *_lazy_exports]
+
+if typing.TYPE_CHECKING or sys.version_info < (3, 7):
+    # module-level __getattr__ needs Python 3.7
+    from .aggregate import ThermalAggregator  # noqa: F401
+    from .aio import AsyncFlirExtractor  # noqa: F401
+    from .flirextractor import FlirExtractor  # noqa: F401
+    from .index import ThermalIndex  # noqa: F401
+    from .instrument import Instrumentation  # noqa: F401
+    from .pool import FlirExtractorPool  # noqa: F401
+    from .radiometric import RadiometricImage  # noqa: F401
+    from .server import FlirClient  # noqa: F401
+    from .visual import ThermalVisualImage  # noqa: F401
+else:
+
+    def __getattr__(name: str) -> typing.Any:
+        module_name = _lazy_exports.get(name)
+        if module_name is None:
+            raise AttributeError(
+                f"module {__name__!r} has no attribute {name!r}"
+            )
+        value = getattr(importlib.import_module(module_name, __name__), name)
+        globals()[name] = value  # so __getattr__ isn't called again
+        return value
+
+    def __dir__() -> typing.List[str]:
+        return sorted({*globals(), *_lazy_exports})
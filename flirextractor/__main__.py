@@ -0,0 +1,6 @@
+"""Runs the `flirextractor` command line interface, see `cli.py`."""
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,263 @@
+"""Aggregates per-pixel statistics over long series of same-shaped images.
+
+Uses Welford's online algorithm, so images can be streamed through without
+keeping them in memory, and Chan et al.'s parallel algorithm to merge
+aggregators, so that shards can be aggregated in parallel and then reduced.
+
+References:
+    Chan, Golub, LeVeque, "Updating Formulae and a Pairwise Algorithm for
+    Computing Sample Variances", 1979.
+"""
+import typing
+
+import numpy as np  # type: ignore
+
+
+class ThermalAggregator:
+    """Per-pixel running statistics of a series of same-shaped images.
+
+    Memory use is `O(H * W)`, however many images are aggregated.
+    NaN pixels are ignored, so each pixel has its own `count`.
+    Any numeric images can be aggregated, e.g. thermal data in Celcius,
+    or raw thermal data, as the min/max of raw data can be converted
+    afterwards, since the raw to Celcius conversion is monotonic.
+    Histograms of raw data can not be converted, as files with different
+    calibrations would be binned inconsistently, so the `aggregate` methods
+    of `FlirExtractor` and `FlirExtractorPool` raise a `ValueError` if
+    given both `histogram_bins` and `raw=True`.
+
+    Attributes:
+        images: The number of images aggregated.
+        count: The per-pixel number of non-NaN values.
+        min, max: The per-pixel min/max.
+        histogram_bins: The edges of the bins of `histogram`, or `None`
+            if no histogram is calculated.
+        histogram: The number of values (of every pixel) in each bin.
+
+    Example:
+        with FlirExtractor() as extractor:
+            aggregator = ThermalAggregator()
+            aggregator.update_iter(extractor.iter_thermal(filepaths))
+            print(aggregator.mean, aggregator.std)
+    """
+
+    images: int
+    count: typing.Optional[np.ndarray]
+    min: typing.Optional[np.ndarray]
+    max: typing.Optional[np.ndarray]
+    histogram_bins: typing.Optional[np.ndarray]
+    histogram: typing.Optional[np.ndarray]
+    _mean: typing.Optional[np.ndarray]
+    _m2: typing.Optional[np.ndarray]
+
+    def __init__(
+        self, histogram_bins: typing.Optional[typing.Sequence[float]] = None
+    ):
+        self.images = 0
+        self.count = None
+        self._mean = None
+        self.min = None
+        self.max = None
+        self._m2 = None
+        self.histogram_bins = None
+        self.histogram = None
+        if histogram_bins is not None:
+            self.histogram_bins = np.asarray(histogram_bins, dtype=np.float64)
+            if self.histogram_bins.ndim != 1 or len(self.histogram_bins) < 2:
+                raise ValueError("histogram_bins must have at least 2 edges.")
+            self.histogram = np.zeros(
+                len(self.histogram_bins) - 1, dtype=np.int64
+            )
+
+    @property
+    def shape(self) -> typing.Optional[typing.Tuple[int, ...]]:
+        """The shape of the aggregated images, or `None` if still empty."""
+        return None if self._mean is None else self._mean.shape
+
+    def _init_accumulators(self, shape: typing.Tuple[int, ...]):
+        self.count = np.zeros(shape, dtype=np.int64)
+        self._mean = np.zeros(shape, dtype=np.float64)
+        self._m2 = np.zeros(shape, dtype=np.float64)
+        self.min = np.full(shape, np.nan, dtype=np.float64)
+        self.max = np.full(shape, np.nan, dtype=np.float64)
+
+    def _check_shape(self, shape: typing.Tuple[int, ...]):
+        if self._mean is None:
+            self._init_accumulators(shape)
+        elif shape != self._mean.shape:
+            raise ValueError(
+                f"Can not aggregate an image of shape {shape} with images "
+                f"of shape {self._mean.shape}."
+            )
+
+    def update(self, image: np.ndarray) -> "ThermalAggregator":
+        """Adds a single 2-D image.
+
+        Parameters:
+            image: The image to add, e.g. thermal data in Celcius.
+
+        Returns:
+            This aggregator, for chaining.
+        """
+        image = np.asarray(image, dtype=np.float64)
+        self._check_shape(image.shape)
+        assert self.count is not None and self._mean is not None
+        valid = ~np.isnan(image)
+        self.count += valid
+        # delta is 0 for NaN pixels, so they are not updated
+        delta = np.subtract(
+            image, self._mean, where=valid, out=np.zeros_like(image)
+        )
+        self._mean += np.divide(
+            delta, self.count, where=valid, out=np.zeros_like(delta)
+        )
+        # m2 += delta * (image - new mean)
+        delta *= np.subtract(
+            image, self._mean, where=valid, out=np.zeros_like(image)
+        )
+        self._m2 += delta
+        np.fmin(self.min, image, out=self.min)
+        np.fmax(self.max, image, out=self.max)
+        self._update_histogram(image)
+        self.images += 1
+        return self
+
+    def update_stack(self, stack: np.ndarray) -> "ThermalAggregator":
+        """Adds a `(N, H, W)` stack of images, e.g. from `get_thermal_stack`.
+
+        Faster than calling `update` on each image, as the stack's statistics
+        are calculated at once, and then merged.
+
+        Parameters:
+            stack: The images to add.
+
+        Returns:
+            This aggregator, for chaining.
+        """
+        stack = np.asarray(stack, dtype=np.float64)
+        if len(stack) == 0:
+            return self
+        stack_aggregator = ThermalAggregator()
+        stack_aggregator._init_accumulators(stack.shape[1:])
+        valid = ~np.isnan(stack)
+        stack_aggregator.count = valid.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            stack_aggregator._mean = np.nan_to_num(
+                np.nansum(stack, axis=0) / stack_aggregator.count
+            )
+            deviations = stack - stack_aggregator._mean
+            stack_aggregator._m2 = np.nansum(deviations ** 2, axis=0)
+            stack_aggregator.min = np.fmin.reduce(stack, axis=0)
+            stack_aggregator.max = np.fmax.reduce(stack, axis=0)
+        stack_aggregator.images = len(stack)
+        self._merge_moments(stack_aggregator)
+        self._update_histogram(stack)
+        return self
+
+    def update_iter(
+        self,
+        images: typing.Iterable[
+            typing.Union[np.ndarray, typing.Tuple[typing.Any, np.ndarray]]
+        ],
+    ) -> "ThermalAggregator":
+        """Adds every image from an iterable, e.g. `iter_thermal`.
+
+        Parameters:
+            images: An iterable of images, or of `(filepath, image)`, so that
+                the output of `FlirExtractor.iter_thermal` can be used.
+
+        Returns:
+            This aggregator, for chaining.
+        """
+        for image in images:
+            if isinstance(image, tuple):
+                _, image = image
+            self.update(image)
+        return self
+
+    def _update_histogram(self, values: np.ndarray):
+        if self.histogram is None:
+            return
+        finite = values[np.isfinite(values)]
+        counts, _ = np.histogram(finite, bins=self.histogram_bins)
+        self.histogram += counts
+
+    def _merge_moments(self, other: "ThermalAggregator"):
+        """Merges everything except the histogram of another aggregator."""
+        if other._mean is None:
+            return  # nothing to merge
+        self._check_shape(other._mean.shape)
+        assert self.count is not None and self._mean is not None
+        assert other.count is not None and self._m2 is not None
+
+        count = self.count + other.count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            other_weight = np.nan_to_num(other.count / count)
+        delta = other._mean - self._mean
+        self._mean += delta * other_weight
+        self._m2 += other._m2 + delta ** 2 * self.count * other_weight
+        self.count = count
+        np.fmin(self.min, other.min, out=self.min)
+        np.fmax(self.max, other.max, out=self.max)
+        self.images += other.images
+
+    def merge(self, other: "ThermalAggregator") -> "ThermalAggregator":
+        """Adds the statistics of another aggregator, e.g. from another worker.
+
+        Parameters:
+            other: The aggregator to merge into this one.
+                It must have the same image shape and histogram bins.
+
+        Returns:
+            This aggregator, for chaining.
+        """
+        if self.histogram_bins is None or other.histogram_bins is None:
+            same_bins = self.histogram_bins is other.histogram_bins
+        else:
+            same_bins = np.array_equal(
+                self.histogram_bins, other.histogram_bins
+            )
+        if not same_bins:
+            raise ValueError("Can not merge aggregators with different bins.")
+        self._merge_moments(other)
+        if self.histogram is not None:
+            self.histogram += other.histogram
+        return self
+
+    @classmethod
+    def merge_all(
+        cls, aggregators: typing.Iterable["ThermalAggregator"]
+    ) -> "ThermalAggregator":
+        """Merges aggregators, e.g. from multiple shards, into a new one."""
+        aggregators = list(aggregators)
+        if not aggregators:
+            return cls()
+        first = aggregators[0]
+        merged = cls(first.histogram_bins)
+        for aggregator in aggregators:
+            merged.merge(aggregator)
+        return merged
+
+    @property
+    def mean(self) -> typing.Optional[np.ndarray]:
+        """The per-pixel mean, NaN where `count` is 0."""
+        if self._mean is None or self.count is None:
+            return None
+        return np.where(self.count > 0, self._mean, np.nan)
+
+    @property
+    def variance(self) -> typing.Optional[np.ndarray]:
+        """The per-pixel population variance, NaN where `count` is 0."""
+        if self._m2 is None or self.count is None:
+            return None
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 0, self._m2 / self.count, np.nan)
+
+    @property
+    def std(self) -> typing.Optional[np.ndarray]:
+        """The per-pixel population standard deviation."""
+        variance = self.variance
+        return None if variance is None else np.sqrt(variance)
+
+    def __repr__(self) -> str:
+        return f"ThermalAggregator(images={self.images}, shape={self.shape})"
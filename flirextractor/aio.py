@@ -0,0 +1,459 @@
+"""Extracts thermal data from FLIR images without blocking an asyncio loop.
+
+ExifTool is run with `-stay_open` using `asyncio.subprocess`, so that
+requests are written and read through non-blocking pipes, and many requests
+can be in flight in each ExifTool process at once.
+Decoding and converting thermal data is done in an executor.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+import json
+import os
+import tempfile
+import typing
+from typing import Deque, Iterable, List, Optional, Tuple
+
+import numpy as np  # type: ignore
+from exiftool import executable as exiftool_default_exe  # type: ignore
+
+from .fff import FFFParseError, read_flir_data
+from .get_thermal import (
+    DEFAULT_CHUNK_SIZE,
+    ENGINES,
+    Buffer,
+    RawData,
+    _decode_and_convert,
+    _parse_raw_batch,
+    _raw_batch_params,
+    _read_buffer,
+    _try_load_flir_file,
+)
+from .pathutils import Path, get_str_filepath
+from .utils import chunked
+
+DEFAULT_MAX_IN_FLIGHT = 4
+"""Default number of requests written to each ExifTool before replies"""
+_STREAM_LIMIT = 2 ** 28
+"""Maximum size of a single ExifTool reply, in bytes"""
+
+
+class _AsyncExifTool:
+    """A `-stay_open` ExifTool process, driven by `asyncio.subprocess`.
+
+    Each request is tagged with a unique `-execute{number}`, so that
+    ExifTool ends its reply with `{ready{number}}`.
+    As ExifTool replies in order, requests can be pipelined, with a single
+    reader task resolving each request's future in turn.
+    If ExifTool exits, or a reply is too long to read, pending requests fail
+    and ExifTool is restarted.
+    JSON replies are parsed in `executor`, as they can be many megabytes.
+    """
+
+    executable: str
+    max_in_flight: int
+    executor: Optional[concurrent.futures.Executor]
+    _process: Optional[asyncio.subprocess.Process]
+    _pending: Deque[Tuple[bytes, "asyncio.Future[bytes]"]]
+    _reader: Optional["asyncio.Future[None]"]
+
+    def __init__(
+        self,
+        executable: str,
+        max_in_flight: int,
+        executor: Optional[concurrent.futures.Executor] = None,
+    ):
+        self.executable = executable
+        self.max_in_flight = max_in_flight
+        self.executor = executor
+        self._process = None
+        self._pending = collections.deque()
+        self._reader = None
+        self._counter = itertools.count()
+
+    @property
+    def pending(self) -> int:
+        """The number of requests waiting for a reply."""
+        return len(self._pending)
+
+    async def start(self):
+        # asyncio primitives must be created in the running event loop
+        self._drain_lock = asyncio.Lock()
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._running = asyncio.Event()  # cleared while restarting
+        self._process = await self._spawn()
+        self._running.set()
+
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        return await asyncio.create_subprocess_exec(
+            self.executable,
+            "-stay_open",
+            "True",
+            "-@",
+            "-",
+            "-common_args",
+            "-G",
+            "-n",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            limit=_STREAM_LIMIT,
+        )
+
+    async def terminate(self):
+        process = self._process
+        if process is None:
+            return  # already terminated, do nothing
+        self._process = None
+        stdin = process.stdin
+        assert stdin is not None  # created with PIPE
+        try:
+            stdin.write(b"-stay_open\nFalse\n")
+            await stdin.drain()
+        except ConnectionError:
+            pass  # ExifTool has already exited
+        stdin.close()
+        # ExifTool replies to requests in flight before exiting, and only
+        # the reader task may read stdout
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+        await process.wait()
+
+    async def _read_replies(self, process: asyncio.subprocess.Process):
+        """Reads replies until no requests are pending."""
+        stdout = process.stdout
+        assert stdout is not None  # created with PIPE
+        try:
+            while self._pending:
+                sentinel, future = self._pending[0]
+                output = await stdout.readuntil(sentinel)
+                self._pending.popleft()
+                if not future.cancelled():
+                    end = len(output) - len(sentinel)
+                    future.set_result(output[:end].strip())
+        except (asyncio.LimitOverrunError, asyncio.IncompleteReadError) as e:
+            # ExifTool exited, or its output can no longer be matched to
+            # requests, so it can not reply to any pending request
+            self._running.clear()
+            self._fail_pending(e)
+            try:
+                await self._restart(process)
+            finally:
+                self._running.set()
+        except Exception as error:
+            self._fail_pending(error)
+
+    def _fail_pending(self, error: BaseException):
+        while self._pending:
+            _, future = self._pending.popleft()
+            if not future.cancelled():
+                future.set_exception(error)
+
+    async def _restart(self, process: asyncio.subprocess.Process):
+        """Replaces a broken ExifTool process, unless it was terminated."""
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+        if self._process is not process:
+            return  # terminated while waiting
+        new_process = await self._spawn()
+        if self._process is process:
+            self._process = new_process
+        else:  # terminated while spawning
+            new_process.kill()
+            await new_process.wait()
+
+    async def execute(self, *params: str) -> bytes:
+        """Runs ExifTool with the given params.
+
+        Returns:
+            The output of ExifTool, without the `{ready}` sentinel.
+        """
+        if self._process is None:
+            raise AttributeError("ExifTool was not started.")
+        async with self._in_flight:
+            await self._running.wait()
+            # read after waiting, as the process may have been restarted
+            process = self._process
+            if process is None:
+                raise AttributeError("ExifTool was terminated.")
+            stdin = process.stdin
+            assert stdin is not None  # created with PIPE
+            number = next(self._counter)
+            command = b"\n".join(
+                (*map(os.fsencode, params), f"-execute{number}\n".encode())
+            )
+            future = asyncio.get_event_loop().create_future()
+            # write and enqueue without yielding, to keep requests in order
+            stdin.write(command)
+            self._pending.append((f"{{ready{number}}}".encode(), future))
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.ensure_future(
+                    self._read_replies(process)
+                )
+            async with self._drain_lock:
+                await stdin.drain()
+            return await future
+
+    async def execute_json(self, *params: str) -> List[typing.Dict]:
+        """Runs ExifTool with the given params, parsing the JSON output.
+
+        Returns:
+            The parsed JSON output, with an item for each file ExifTool
+            could read, or an empty list if it could not read any,
+            like `_execute_json`.
+        """
+        output = await self.execute("-j", *params)
+        return await asyncio.get_event_loop().run_in_executor(
+            self.executor, _parse_json, output
+        )
+
+
+def _parse_json(output: bytes) -> List[typing.Dict]:
+    """Parses the JSON output of ExifTool, which is empty if it could not
+    read any files."""
+    if not output.strip():
+        return []
+    return json.loads(output.decode("utf-8"))
+
+
+def _get_str_filepaths(filepaths: Iterable[Path]) -> List[str]:
+    """Like `get_str_filepath`, but for many filepaths."""
+    return [get_str_filepath(filepath) for filepath in filepaths]
+
+
+def _load_native(
+    str_paths: typing.Sequence[str],
+) -> List[Optional[RawData]]:
+    """Loads FLIR files natively, with `None` if they can not be parsed."""
+    return [_try_load_flir_file(str_path) for str_path in str_paths]
+
+
+def _convert_chunk(
+    raw_data: typing.Sequence[
+        Tuple[typing.Mapping[str, typing.Any], typing.Union[bytes, np.ndarray]]
+    ]
+) -> List[np.ndarray]:
+    """Decodes (if needed) and converts a chunk of raw data to Celcius."""
+    return [_decode_and_convert(metadata, raw) for metadata, raw in raw_data]
+
+
+def _write_temp_file(data: bytes) -> str:
+    """Writes data to a temporary file, returning its path."""
+    fd, tmp_path = tempfile.mkstemp(suffix=".jpg")
+    with os.fdopen(fd, "wb") as tmp_file:
+        tmp_file.write(data)
+    return tmp_path
+
+
+class AsyncFlirExtractor:
+    """Extracts thermal data from FLIR images using asyncio.
+
+    The asyncio counterpart to `FlirExtractor`, which never blocks the
+    event loop. Each ExifTool process can have `max_in_flight` requests
+    written to it at once, and requests are sent to the least busy process.
+
+    Attributes:
+        exiftoolpath: The path to the ExifTool executable.
+        engine: How to load FLIR images, see `FlirExtractor`.
+        chunk_size: The number of files to load in each ExifTool request
+            in `get_thermal_batch`.
+        processes: The number of ExifTool processes to use.
+        max_in_flight: The number of requests each ExifTool process can
+            have in flight at once.
+        executor: The executor used to parse and convert thermal data,
+            or `None` to use the event loop's default executor.
+
+    Example:
+        async with AsyncFlirExtractor(processes=2) as extractor:
+            thermal_data = await extractor.get_thermal("./FLIR.jpg")
+    """
+
+    exiftoolpath: Optional[Path]
+    engine: str
+    chunk_size: int
+    processes: int
+    max_in_flight: int
+    executor: Optional[concurrent.futures.Executor]
+    _exiftools: Optional[List[_AsyncExifTool]]
+
+    def __init__(
+        self,
+        exiftoolpath: Path = exiftool_default_exe,
+        engine: str = "exiftool",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        processes: int = 1,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        executor: Optional[concurrent.futures.Executor] = None,
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine}, must be in {ENGINES}.")
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be positive, not {chunk_size}.")
+        if processes < 1:
+            raise ValueError(f"processes must be positive, not {processes}.")
+        if max_in_flight < 1:
+            raise ValueError(
+                f"max_in_flight must be positive, not {max_in_flight}."
+            )
+        self.exiftoolpath = exiftoolpath
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.processes = processes
+        self.max_in_flight = max_in_flight
+        self.executor = executor
+        self._exiftools = None
+
+    @property
+    def exiftools(self) -> List[_AsyncExifTool]:
+        _exiftools = self._exiftools
+        if _exiftools is None:
+            raise AttributeError(
+                "ExifTool was not initialized. "
+                "Use AsyncFlirExtractor in a context manager, e.g. \n"
+                "async with AsyncFlirExtractor() as e:\n"
+                "    await e.do_magic()"
+            )
+        return _exiftools
+
+    async def open(self):
+        """Creates the Exiftool processes.
+
+        Not recommended, use `async with:` context manager instead.
+        """
+        if self._exiftools is not None:
+            raise Exception("ExifTool was already initialized.")
+        self._exiftools = []
+        try:
+            for _ in range(self.processes):
+                exiftool = _AsyncExifTool(
+                    str(self.exiftoolpath), self.max_in_flight, self.executor
+                )
+                await exiftool.start()
+                self._exiftools.append(exiftool)
+        except BaseException:
+            await self.close()
+            raise
+
+    async def close(self):
+        """Closes the Exiftool processes.
+
+        Not recommended, use `async with:` context manager instead.
+        """
+        if self._exiftools is None:
+            return  # already closed, do nothing
+        exiftools, self._exiftools = self._exiftools, None
+        await asyncio.gather(*(exiftool.terminate() for exiftool in exiftools))
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exception_type, exception_value, traceback):
+        await self.close()
+
+    async def _get_thermal_chunk(
+        self, str_paths: typing.Sequence[str]
+    ) -> List[np.ndarray]:
+        """Loads and converts a chunk of files."""
+        loop = asyncio.get_event_loop()
+        raw_data: List[Optional[typing.Tuple[typing.Any, typing.Any]]]
+        raw_data = [None] * len(str_paths)
+        if self.engine == "native":
+            raw_data = await loop.run_in_executor(
+                self.executor, _load_native, str_paths
+            )
+
+        fallback_indexes = [
+            index for index, data in enumerate(raw_data) if data is None
+        ]
+        if fallback_indexes:
+            fallback_paths = [str_paths[index] for index in fallback_indexes]
+            exiftool = min(self.exiftools, key=lambda e: e.pending)
+            json_output = await exiftool.execute_json(
+                *_raw_batch_params(fallback_paths)
+            )
+            fallback_data = await loop.run_in_executor(
+                self.executor, _parse_raw_batch, fallback_paths, json_output
+            )
+            for index, data in zip(fallback_indexes, fallback_data):
+                raw_data[index] = data
+        return await loop.run_in_executor(
+            self.executor, _convert_chunk, raw_data
+        )
+
+    async def get_thermal(self, filepath: Path) -> np.ndarray:
+        """Gets a thermal image from a FLIR file.
+
+        Parameters:
+            filepath: The path to the FLIR file.
+
+        Returns:
+            The thermal data in Celcius as a 2-D numpy array.
+        """
+        loop = asyncio.get_event_loop()
+        str_path = await loop.run_in_executor(
+            self.executor, get_str_filepath, filepath
+        )
+        thermal_images = await self._get_thermal_chunk((str_path,))
+        return thermal_images[0]
+
+    async def get_thermal_batch(
+        self, filepaths: Iterable[Path]
+    ) -> List[np.ndarray]:
+        """Gets thermal images from a list of FLIR files.
+
+        Chunks of `chunk_size` files are loaded concurrently.
+
+        Parameters:
+            filepaths: The paths to the FLIR files.
+
+        Returns:
+            A list of the thermal data in Celcius as 2-D numpy arrays,
+            in the same order as `filepaths`.
+        """
+        loop = asyncio.get_event_loop()
+        # filepaths is iterated in the executor, so list it on the loop
+        str_paths = await loop.run_in_executor(
+            self.executor, _get_str_filepaths, list(filepaths)
+        )
+        chunk_results = await asyncio.gather(
+            *(
+                self._get_thermal_chunk(chunk)
+                for chunk in chunked(str_paths, self.chunk_size)
+            )
+        )
+        return [image for chunk in chunk_results for image in chunk]
+
+    async def get_thermal_from_bytes(self, buffer: Buffer) -> np.ndarray:
+        """Gets a thermal image from an in-memory FLIR image.
+
+        The image is parsed natively, and is only written to a temporary
+        file if it can only be loaded with ExifTool.
+
+        Parameters:
+            buffer: The contents of the FLIR image, or a binary file object.
+
+        Returns:
+            The thermal data in Celcius as a 2-D numpy array.
+        """
+        loop = asyncio.get_event_loop()
+        data = await loop.run_in_executor(self.executor, _read_buffer, buffer)
+        try:
+            raw_data = await loop.run_in_executor(
+                self.executor, read_flir_data, data
+            )
+        except FFFParseError:
+            tmp_path = await loop.run_in_executor(
+                self.executor, _write_temp_file, data
+            )
+            try:
+                thermal_images = await self._get_thermal_chunk((tmp_path,))
+            finally:
+                os.unlink(tmp_path)
+            return thermal_images[0]
+        thermal_images = await loop.run_in_executor(
+            self.executor, _convert_chunk, (raw_data,)
+        )
+        return thermal_images[0]
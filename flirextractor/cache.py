@@ -0,0 +1,278 @@
+"""Caches raw and converted thermal data on disk.
+
+Arrays are stored as `.npy` files, so that they can be loaded with
+`np.load(mmap_mode="r")` without reading the whole file.
+"""
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import typing
+
+import numpy as np  # type: ignore
+
+from .pathutils import Path
+
+RAW_DIR = "raw"
+"""Subdirectory of the cache storing raw thermal data and metadata"""
+THERMAL_DIR = "thermal"
+"""Subdirectory of the cache storing thermal data in Celcius"""
+CACHE_VERSION = 2
+"""Change this to invalidate all old cache entries"""
+EVICT_TO = 0.9
+"""Fraction of `max_size` that eviction shrinks the cache to, so that the
+cache is not scanned again on every following put"""
+
+CachedRawData = typing.Tuple[typing.Dict[str, typing.Any], np.ndarray]
+"""The metadata and the raw thermal data of a FLIR file"""
+
+
+def _touch(path: pathlib.Path):
+    """Marks a file as recently used, as mtime is used for LRU eviction."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass  # e.g. read-only cache, or evicted by another process
+
+
+class ThermalCache:
+    """A size-bounded on-disk cache of raw and converted thermal data.
+
+    Entries are keyed by the absolute path, size and modification time of
+    the FLIR file, so modified files are automatically reloaded, and by the
+    engine that loaded it, as engines return slightly different metadata.
+    Converted entries are also keyed by any conversion parameters.
+    When the cache grows larger than `max_size` bytes, the least recently
+    used entries are deleted, until it is under `EVICT_TO` of `max_size`.
+
+    Attributes:
+        cache_dir: The directory to store cached data in.
+        max_size: The maximum size of the cache in bytes, or `None` for
+            no limit.
+    """
+
+    cache_dir: pathlib.Path
+    max_size: typing.Optional[int]
+    _size: typing.Optional[int]
+    _lock: threading.Lock
+
+    def __init__(self, cache_dir: Path, max_size: typing.Optional[int] = None):
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.max_size = max_size
+        self._size = None  # calculated lazily, as it needs a directory scan
+        self._lock = threading.Lock()
+        for subdir in (RAW_DIR, THERMAL_DIR):
+            (self.cache_dir / subdir).mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def file_key(
+        str_path: str,
+        params: typing.Optional[typing.Mapping] = None,
+        engine: str = "exiftool",
+    ) -> str:
+        """Creates the cache key of a FLIR file.
+
+        Parameters:
+            str_path: The absolute path to the FLIR file.
+            params: Any conversion parameters to also key on.
+            engine: The engine that loaded the file, see `ENGINES`.
+
+        Returns:
+            A hex digest of the path, size, modification time, engine
+            and params.
+        """
+        stat = os.stat(str_path)
+        key_data = [
+            CACHE_VERSION,
+            str_path,
+            stat.st_size,
+            stat.st_mtime_ns,
+            engine,
+        ]
+        if params:
+            key_data.append(sorted(params.items()))
+        key_json = json.dumps(key_data, default=repr)
+        return hashlib.sha256(key_json.encode("utf-8")).hexdigest()
+
+    def _load_npy(self, path: pathlib.Path) -> typing.Optional[np.ndarray]:
+        """Memory-maps an array, marking it as recently used."""
+        try:
+            array = np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return None  # missing, or corrupted
+        _touch(path)
+        return array
+
+    def _write_atomic(
+        self, path: pathlib.Path, write: typing.Callable[[typing.IO], None]
+    ):
+        """Writes a file so that readers never see a half-written file."""
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                write(tmp_file)
+            try:
+                replaced_size = path.stat().st_size
+            except FileNotFoundError:
+                replaced_size = 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._add_size(os.stat(path).st_size - replaced_size)
+
+    def get_raw(
+        self, str_path: str, engine: str = "exiftool"
+    ) -> typing.Optional[CachedRawData]:
+        """Loads the cached metadata and raw thermal data of a FLIR file.
+
+        Parameters:
+            str_path: The absolute path to the FLIR file.
+            engine: The engine that loaded the file, see `ENGINES`.
+
+        Returns:
+            `metadata, raw_np`, or `None` if the file is not cached.
+        """
+        key = self.file_key(str_path, engine=engine)
+        raw_np = self._load_npy(self.cache_dir / RAW_DIR / f"{key}.npy")
+        if raw_np is None:
+            return None
+        try:
+            metadata_path = self.cache_dir / RAW_DIR / f"{key}.json"
+            metadata = json.loads(metadata_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        _touch(metadata_path)
+        return metadata, raw_np
+
+    def put_raw(
+        self,
+        str_path: str,
+        metadata: typing.Mapping[str, typing.Any],
+        raw_np: np.ndarray,
+        engine: str = "exiftool",
+    ):
+        """Stores the metadata and raw thermal data of a FLIR file.
+
+        Parameters:
+            str_path: The absolute path to the FLIR file.
+            metadata: The metadata of the FLIR file.
+            raw_np: The raw thermal data of the FLIR file.
+            engine: The engine that loaded the file, see `ENGINES`.
+        """
+        key = self.file_key(str_path, engine=engine)
+        metadata_json = json.dumps(dict(metadata)).encode("utf-8")
+        self._write_atomic(
+            self.cache_dir / RAW_DIR / f"{key}.json",
+            lambda file: file.write(metadata_json),
+        )
+        self._write_atomic(
+            self.cache_dir / RAW_DIR / f"{key}.npy",
+            lambda file: np.save(file, raw_np),
+        )
+        self.evict()
+
+    def get_thermal(
+        self,
+        str_path: str,
+        params: typing.Optional[typing.Mapping] = None,
+        engine: str = "exiftool",
+    ) -> typing.Optional[np.ndarray]:
+        """Loads the cached thermal data in Celcius of a FLIR file.
+
+        Parameters:
+            str_path: The absolute path to the FLIR file.
+            params: The conversion parameters used, if not the defaults.
+            engine: The engine that loaded the file, see `ENGINES`.
+
+        Returns:
+            A read-only memory-mapped array, or `None` if not cached.
+        """
+        key = self.file_key(str_path, params, engine)
+        return self._load_npy(self.cache_dir / THERMAL_DIR / f"{key}.npy")
+
+    def put_thermal(
+        self,
+        str_path: str,
+        thermal_np: np.ndarray,
+        params: typing.Optional[typing.Mapping] = None,
+        engine: str = "exiftool",
+    ):
+        """Stores the thermal data in Celcius of a FLIR file.
+
+        Parameters:
+            str_path: The absolute path to the FLIR file.
+            thermal_np: The thermal data in Celcius.
+            params: The conversion parameters used, if not the defaults.
+            engine: The engine that loaded the file, see `ENGINES`.
+        """
+        key = self.file_key(str_path, params, engine)
+        self._write_atomic(
+            self.cache_dir / THERMAL_DIR / f"{key}.npy",
+            lambda file: np.save(file, thermal_np),
+        )
+        self.evict()
+
+    def _entry_stats(self) -> typing.List[typing.Tuple[int, int, str]]:
+        """Lists `mtime_ns, size, path` of every file in the cache, skipping
+        files deleted since listing them, e.g. by another process."""
+        stats = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # already evicted by another process
+            stats.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return stats
+
+    def _entries(self) -> typing.List[os.DirEntry]:
+        """Lists every file in the cache."""
+        entries = []
+        for subdir in (RAW_DIR, THERMAL_DIR):
+            with os.scandir(self.cache_dir / subdir) as dir_entries:
+                entries.extend(
+                    entry
+                    for entry in dir_entries
+                    if entry.is_file() and not entry.name.endswith(".tmp")
+                )
+        return entries
+
+    def _add_size(self, size: int):
+        with self._lock:
+            if self._size is not None:
+                self._size += size
+
+    @property
+    def size(self) -> int:
+        """The total size of the cache in bytes."""
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entry_stats())
+            return self._size
+
+    def evict(self):
+        """Deletes the least recently used entries if over `max_size`,
+        until under `EVICT_TO` of `max_size`."""
+        if self.max_size is None or self.size <= self.max_size:
+            return
+        low_water = self.max_size * EVICT_TO
+        with self._lock:
+            entries = sorted(self._entry_stats())
+            self._size = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if self._size <= low_water:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass  # already evicted by another process
+                self._size -= size
+
+    def clear(self):
+        """Deletes every entry in the cache."""
+        with self._lock:
+            for entry in self._entries():
+                os.unlink(entry.path)
+            self._size = 0
@@ -0,0 +1,556 @@
+"""The `flirextractor` command line interface.
+
+Example:
+    flirextractor convert ./archive --output ./thermal --workers 4
+    flirextractor thumbnails ./archive --output ./previews --palette iron
+    flirextractor serve --workers 4
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import pathlib
+import signal
+import sys
+import time
+import typing
+
+from exiftool import executable as exiftool_default_exe  # type: ignore
+
+from .__version__ import __version__
+from .defaults import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_RETRIES,
+    DEFAULT_THUMBNAIL_SIZE,
+    DEFAULT_TIMEOUT,
+    ENGINES,
+    PALETTES,
+    default_socket_path,
+)
+from .pathutils import DEFAULT_PATTERNS, iter_inputs
+from .utils import chunked
+
+if typing.TYPE_CHECKING:
+    import numpy as np  # type: ignore  # noqa: F401
+
+    from .pool import FlirExtractorPool  # noqa: F401
+
+FORMATS = ("npy", "npz")
+"""Output formats of `flirextractor convert`"""
+MANIFEST_NAME = "manifest.jsonl"
+"""The name of the manifest of converted files in the output directory"""
+THUMBNAIL_FORMATS = ("png", "jpg")
+"""Output formats of `flirextractor thumbnails`"""
+
+
+class Manifest:
+    """A record of converted files, so that interrupted jobs can resume.
+
+    Each line of the manifest is a JSON object with the `source` file
+    (as an absolute path), its `size` and `mtime_ns`, and the `output` file.
+    A source file is only converted again if it was modified, or its output
+    was deleted.
+
+    Attributes:
+        path: The path to the manifest file.
+    """
+
+    path: pathlib.Path
+    _entries: typing.Dict[str, typing.Dict[str, typing.Any]]
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self._entries = {}
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as manifest_file:
+                for line in manifest_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # e.g. half-written line when killed
+                    self._entries[entry["source"]] = entry
+
+    def is_done(self, filepath: pathlib.Path) -> bool:
+        """Checks if a file has already been converted, and is unmodified."""
+        entry = self._entries.get(str(filepath.resolve()))
+        if entry is None or not os.path.exists(entry["output"]):
+            return False
+        stat = filepath.stat()
+        return (entry["size"], entry["mtime_ns"]) == (
+            stat.st_size,
+            stat.st_mtime_ns,
+        )
+
+    def add(
+        self,
+        done: typing.Iterable[typing.Tuple[pathlib.Path, pathlib.Path]],
+    ):
+        """Records that files have been converted.
+
+        Parameters:
+            done: `source, output` for each converted file.
+        """
+        lines = []
+        for source, output in done:
+            stat = source.stat()
+            entry: typing.Dict[str, typing.Any] = dict(
+                source=str(source.resolve()),
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                output=str(output),
+            )
+            self._entries[entry["source"]] = entry
+            lines.append(json.dumps(entry) + "\n")
+        with open(self.path, "a", encoding="utf-8") as manifest_file:
+            manifest_file.writelines(lines)
+            manifest_file.flush()
+            os.fsync(manifest_file.fileno())
+
+
+def _write_output(
+    output: pathlib.Path, thermal_data: "np.ndarray", file_format: str
+):
+    """Writes thermal data atomically, so outputs are never half-written."""
+    import numpy as np  # type: ignore  # slow to import
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_output = output.with_name(f".{output.name}.tmp")
+    with open(tmp_output, "wb") as output_file:
+        if file_format == "npz":
+            np.savez_compressed(output_file, thermal=thermal_data)
+        else:
+            np.save(output_file, thermal_data)
+    os.replace(tmp_output, output)
+
+
+_FileOutput = typing.Tuple[pathlib.Path, pathlib.Path]
+"""`filepath, output` of a file to write"""
+
+
+def _claim_output(
+    outputs: typing.Dict[str, pathlib.Path],
+    filepath: pathlib.Path,
+    output: pathlib.Path,
+) -> bool:
+    """Records that a file is written to an output path, so that two files
+    are never written to the same output, e.g. `IR_1.jpg` and `IR_1.JPG`,
+    or `IR_1.jpg` in two input directories.
+
+    Outputs that only differ in case are the same output, as they are the
+    same file on case-insensitive file systems, e.g. on macOS and Windows.
+
+    Parameters:
+        outputs: The file written to each output so far.
+        filepath: The file to write.
+        output: The path to write the file to.
+
+    Returns:
+        `False` if the file was already written to the output, e.g. if it
+        was found by two inputs.
+
+    Raises:
+        FileExistsError if a different file is written to the output.
+    """
+    source = filepath.resolve()
+    key = str(output).casefold()
+    claimant = outputs.get(key)
+    if claimant is None:
+        outputs[key] = source
+        return True
+    if claimant != source:
+        raise FileExistsError(f"{output} is also the output of {claimant}.")
+    return False
+
+
+def convert(
+    pool: "FlirExtractorPool",
+    files: typing.Iterable[typing.Tuple[pathlib.Path, pathlib.PurePath]],
+    output_dir: pathlib.Path,
+    file_format: str = "npy",
+    dtype: typing.Optional[str] = None,
+    manifest: typing.Optional[Manifest] = None,
+    retries: int = DEFAULT_RETRIES,
+    timeout: typing.Optional[float] = DEFAULT_TIMEOUT,
+) -> typing.Dict[str, float]:
+    """Converts FLIR files into `.npy` or `.npz` files.
+
+    Files are loaded in batches, so that every worker in the pool is busy,
+    and each batch is recorded in the manifest once it has been written.
+    Files that fail to load are reported, and skipped, but not recorded,
+    so they are tried again when the job is rerun. So are files with the
+    same output path as an earlier file, instead of overwriting it.
+
+    Parameters:
+        pool: An open `FlirExtractorPool` to load files with.
+        files: `filepath, relative_path` of each file, see `iter_inputs`.
+        output_dir: The directory to write outputs to, at `relative_path`.
+        file_format: The output format, see `FORMATS`.
+        dtype: The dtype to store thermal data as, e.g. `"float32"`.
+        manifest: A manifest of converted files to skip and record.
+        retries: The number of times to retry each file after a transient
+            error, see `FlirExtractor.get_thermal_results`.
+        timeout: The maximum time in seconds to wait for each ExifTool
+            call, or `None` to wait forever.
+
+    Returns:
+        The number of `converted`, `skipped` and `failed` files,
+        the `input_bytes` converted, and the `seconds` taken.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(
+            f"Unknown format {file_format}, must be in {FORMATS}."
+        )
+    start = time.perf_counter()
+    stats: typing.Dict[str, float] = dict(
+        converted=0, skipped=0, failed=0, input_bytes=0
+    )
+    batch_size = pool.workers * pool.chunk_size
+    outputs: typing.Dict[str, pathlib.Path] = {}
+    with concurrent.futures.ThreadPoolExecutor(pool.workers) as writer:
+        for batch in chunked(files, batch_size):
+            todo = []
+            for filepath, relative_path in batch:
+                output = output_dir / relative_path.with_suffix(
+                    f".{file_format}"
+                )
+                try:
+                    first = _claim_output(outputs, filepath, output)
+                except FileExistsError as e:
+                    print(
+                        f"Could not convert {filepath}: {e!r}", file=sys.stderr
+                    )
+                    stats["failed"] += 1
+                    continue
+                if not first or (
+                    manifest is not None and manifest.is_done(filepath)
+                ):
+                    stats["skipped"] += 1
+                    continue
+                todo.append((filepath, output))
+            if not todo:
+                continue
+            results = pool.get_thermal_results(
+                [filepath for filepath, _ in todo], retries, timeout
+            )
+            done = []
+            writes = []
+            for (filepath, output), result in zip(todo, results):
+                if not result.ok:
+                    print(
+                        f"Could not convert {filepath}: {result.error!r}",
+                        file=sys.stderr,
+                    )
+                    stats["failed"] += 1
+                    continue
+                thermal_data = result.unwrap()
+                if dtype is not None:
+                    thermal_data = thermal_data.astype(dtype, copy=False)
+                writes.append(
+                    writer.submit(
+                        _write_output, output, thermal_data, file_format
+                    )
+                )
+                done.append((filepath, output))
+                stats["input_bytes"] += filepath.stat().st_size
+            for write in writes:
+                write.result()
+            if manifest is not None:
+                manifest.add(done)
+            stats["converted"] += len(done)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def _per_second(amount: float, seconds: float) -> float:
+    """The rate of `amount` in `seconds`, or `0` if no time was measured,
+    e.g. when there was nothing to do, or the clock is too coarse."""
+    return amount / seconds if seconds > 0 else 0.0
+
+
+def _convert_command(args: argparse.Namespace) -> int:
+    from .pool import FlirExtractorPool
+
+    output_dir = pathlib.Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(output_dir / MANIFEST_NAME)
+    files = iter_inputs(args.inputs, args.pattern or DEFAULT_PATTERNS)
+    with FlirExtractorPool(
+        exiftoolpath=args.exiftool,
+        workers=args.workers,
+        engine=args.engine,
+        chunk_size=args.chunk_size,
+    ) as pool:
+        stats = convert(
+            pool,
+            files,
+            output_dir,
+            file_format=args.format,
+            dtype=args.dtype,
+            manifest=manifest,
+            retries=args.retries,
+            timeout=args.timeout,
+        )
+    seconds = stats["seconds"]
+    print(
+        f"Converted {stats['converted']} files "
+        f"(skipped {stats['skipped']} already converted, "
+        f"{stats['failed']} failed) "
+        f"in {seconds:.1f} s: "
+        f"{_per_second(stats['converted'], seconds):.1f} files/s, "
+        f"{_per_second(stats['input_bytes'], seconds) / 1e6:.1f} MB/s",
+        file=sys.stderr,
+    )
+    return 1 if stats["failed"] else 0
+
+
+def _thumbnails_command(args: argparse.Namespace) -> int:
+    from .pool import FlirExtractorPool
+    from .render import write_thumbnails
+
+    output_dir = pathlib.Path(args.output)
+    start = time.perf_counter()
+    stats = dict(rendered=0, failed=0)
+
+    def iter_files() -> typing.Iterator[_FileOutput]:
+        outputs: typing.Dict[str, pathlib.Path] = {}
+        for filepath, relative_path in iter_inputs(
+            args.inputs, args.pattern or DEFAULT_PATTERNS
+        ):
+            output = output_dir / relative_path.with_suffix(f".{args.format}")
+            try:
+                first = _claim_output(outputs, filepath, output)
+            except FileExistsError as e:
+                print(f"Could not render {filepath}: {e!r}", file=sys.stderr)
+                stats["failed"] += 1
+                continue
+            if first:
+                yield filepath, output
+
+    with FlirExtractorPool(
+        exiftoolpath=args.exiftool,
+        workers=args.workers,
+        engine=args.engine,
+        chunk_size=args.chunk_size,
+    ) as pool:
+        for result in write_thumbnails(
+            pool,
+            iter_files(),
+            palette=args.palette,
+            vmin=args.vmin,
+            vmax=args.vmax,
+            max_size=args.size,
+            workers=pool.workers,
+            retries=args.retries,
+            timeout=args.timeout,
+        ):
+            if result.error is not None:
+                print(
+                    f"Could not render {result.filepath}: {result.error!r}",
+                    file=sys.stderr,
+                )
+                stats["failed"] += 1
+                continue
+            stats["rendered"] += 1
+    seconds = time.perf_counter() - start
+    print(
+        f"Rendered {stats['rendered']} thumbnails "
+        f"({stats['failed']} failed) "
+        f"in {seconds:.1f} s: "
+        f"{_per_second(stats['rendered'], seconds):.1f} files/s",
+        file=sys.stderr,
+    )
+    return 1 if stats["failed"] else 0
+
+
+def _serve_command(args: argparse.Namespace) -> int:
+    from .server import serve
+
+    # clean up the socket when stopped by e.g. systemd, not just Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        serve(
+            args.socket,
+            exiftoolpath=args.exiftool,
+            workers=args.workers,
+            engine=args.engine,
+            chunk_size=args.chunk_size,
+        )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def make_parser() -> argparse.ArgumentParser:
+    """Creates the `flirextractor` argument parser."""
+    parser = argparse.ArgumentParser(
+        prog="flirextractor",
+        description="Extracts thermal data from FLIR images.",
+    )
+    parser.add_argument(
+        "--version", action="version", version=f"%(prog)s {__version__}"
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True  # required= argument needs Python 3.7
+
+    convert_parser = subparsers.add_parser(
+        "convert",
+        help="convert FLIR images into .npy/.npz files of Celcius",
+        description=(
+            "Converts FLIR images into .npy or .npz files of Celcius, "
+            "mirroring the input directory structure. "
+            f"Progress is recorded in {MANIFEST_NAME} in the output "
+            "directory, so an interrupted job resumes where it stopped."
+        ),
+    )
+    convert_parser.add_argument(
+        "inputs", nargs="+", help="FLIR files, directories, or glob patterns"
+    )
+    convert_parser.add_argument(
+        "-o", "--output", required=True, help="the output directory"
+    )
+    convert_parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="npy",
+        help="npy, or compressed npz (default: %(default)s)",
+    )
+    convert_parser.add_argument(
+        "--dtype",
+        choices=("float32", "float64"),
+        help="the output dtype (default: float64)",
+    )
+    _add_batch_arguments(convert_parser)
+    _add_extractor_arguments(convert_parser)
+    convert_parser.set_defaults(func=_convert_command)
+
+    thumbnails_parser = subparsers.add_parser(
+        "thumbnails",
+        help="render FLIR images as false-colour thumbnails",
+        description=(
+            "Renders FLIR images as false-colour thumbnails, "
+            "mirroring the input directory structure."
+        ),
+    )
+    thumbnails_parser.add_argument(
+        "inputs", nargs="+", help="FLIR files, directories, or glob patterns"
+    )
+    thumbnails_parser.add_argument(
+        "-o", "--output", required=True, help="the output directory"
+    )
+    thumbnails_parser.add_argument(
+        "--format",
+        choices=THUMBNAIL_FORMATS,
+        default="png",
+        help="the image format (default: %(default)s)",
+    )
+    thumbnails_parser.add_argument(
+        "--palette",
+        choices=PALETTES,
+        default="iron",
+        help="the false-colour palette (default: %(default)s)",
+    )
+    thumbnails_parser.add_argument(
+        "--vmin",
+        type=float,
+        help="the temperature of the coldest colour, in Celcius "
+        "(default: the 1st percentile of each image)",
+    )
+    thumbnails_parser.add_argument(
+        "--vmax",
+        type=float,
+        help="the temperature of the hottest colour, in Celcius "
+        "(default: the 99th percentile of each image)",
+    )
+    thumbnails_parser.add_argument(
+        "--size",
+        type=int,
+        default=DEFAULT_THUMBNAIL_SIZE,
+        help="the maximum width and height in pixels (default: %(default)s)",
+    )
+    _add_batch_arguments(thumbnails_parser)
+    _add_extractor_arguments(thumbnails_parser)
+    thumbnails_parser.set_defaults(func=_thumbnails_command)
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="run a daemon with warm ExifTool workers for FlirClient",
+        description=(
+            "Runs a daemon that keeps ExifTool workers running, so that "
+            "scripts can load FLIR images with flirextractor.FlirClient "
+            "without starting ExifTool each time."
+        ),
+    )
+    serve_parser.add_argument(
+        "--socket",
+        default=None,
+        help="the Unix domain socket to listen on "
+        f"(default: {default_socket_path()})",
+    )
+    _add_extractor_arguments(serve_parser)
+    serve_parser.set_defaults(func=_serve_command)
+    return parser
+
+
+def _add_batch_arguments(parser: argparse.ArgumentParser):
+    """Adds arguments used to find and load files in batches."""
+    parser.add_argument(
+        "--pattern",
+        action="append",
+        help=(
+            "filename pattern to look for in directories, can be repeated "
+            f"(default: {', '.join(DEFAULT_PATTERNS)})"
+        ),
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help="times to retry a file after ExifTool hangs or exits "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help="seconds to wait for each ExifTool call before restarting it "
+        "(default: %(default)s)",
+    )
+
+
+def _add_extractor_arguments(parser: argparse.ArgumentParser):
+    """Adds arguments used to create a `FlirExtractorPool`."""
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="number of ExifTool processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="exiftool",
+        help="how to load FLIR images (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="files loaded in each ExifTool call (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--exiftool",
+        default=exiftool_default_exe,
+        help="path to the ExifTool executable (default: %(default)s)",
+    )
+
+
+def main(argv: typing.Optional[typing.Sequence[str]] = None) -> int:
+    """Runs the `flirextractor` command line interface."""
+    args = make_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
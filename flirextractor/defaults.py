@@ -0,0 +1,49 @@
+"""Default options that the command line interface needs to build its parser.
+
+This module must not import NumPy, PIL or ExifTool, so that e.g.
+`flirextractor --help` stays fast. Each default is re-exported by the
+module that uses it, e.g. `flirextractor.get_thermal.DEFAULT_CHUNK_SIZE`.
+"""
+import os
+import tempfile
+
+DEFAULT_EXIFTOOL = "exiftool"
+"""Default ExifTool executable, the same as pyexiftool's default"""
+
+DEFAULT_CHUNK_SIZE = 32
+"""Default number of files loaded in a single ExifTool call"""
+DEFAULT_QUEUE_DEPTH = 2
+"""Default number of chunks that can be decoded/converted at the same time
+as ExifTool loads the next chunk, see `get_thermal_batch`"""
+
+ENGINES = ("exiftool", "native")
+"""Engines that can be used to load FLIR images.
+
+- `exiftool`: load everything using ExifTool.
+- `native`: parse FLIR images in Python, and use ExifTool only for
+  files that can not be parsed natively.
+"""
+
+DEFAULT_RETRIES = 2
+"""Default number of times each file is retried after a transient error"""
+DEFAULT_TIMEOUT = 60.0
+"""Default maximum time in seconds to wait for each ExifTool call"""
+
+PALETTES = ("iron", "rainbow", "grey")
+"""Palettes of `render`"""
+DEFAULT_THUMBNAIL_SIZE = 160
+"""Default maximum width/height in pixels of `write_thumbnails` images"""
+DEFAULT_PERCENTILES = (1.0, 99.0)
+"""Default percentiles of the data that the palette spans,
+if `vmin`/`vmax` are not given"""
+
+
+def default_socket_path() -> str:
+    """The socket of the current user's daemon, in `$XDG_RUNTIME_DIR`,
+    or else in a private directory in the temporary directory, as other
+    users could otherwise create a socket at the same path first."""
+    uid = os.getuid()
+    directory = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(
+        tempfile.gettempdir(), f"flirextractor-{uid}"
+    )
+    return os.path.join(directory, f"flirextractor-{uid}.sock")
@@ -0,0 +1,602 @@
+"""Reads FLIR thermal data natively, without calling ExifTool.
+
+FLIR JPGs store their radiometric data in a FLIR File Format (FFF) file,
+split over multiple JPEG APP1 segments.
+This module reassembles the FFF file, and parses the RawData and CameraInfo
+records into the same values that ExifTool returns for `exif_var_tags`,
+and the EmbeddedImage and PiP records into the embedded visual image and
+its alignment with the thermal image.
+
+References:
+    Phil Harvey's ExifTool FLIR tags documentation:
+    https://exiftool.org/TagNames/FLIR.html
+"""
+import io
+import mmap
+import struct
+import typing
+
+import numpy as np  # type: ignore
+
+from .pathutils import Path, get_str_filepath
+from .raw_temp_to_celcius import CELCIUS_KELVIN_DIFF
+
+
+class FFFParseError(ValueError):
+    """Raised when data can not be parsed as a FLIR FFF file."""
+
+
+FLIR_APP1_HEADER = b"FLIR\0"
+"""The start of every JPEG APP1 segment containing FFF data"""
+FFF_MAGICS = (b"FFF\0", b"AFF\0")
+"""Valid starts of an FFF file"""
+FFFBuffer = typing.Union[bytes, mmap.mmap]
+"""Data containing FFF files, e.g. a memory-mapped FLIR sequence"""
+JPEG_SOI = b"\xff\xd8"
+"""JPEG Start of Image marker"""
+
+RECORD_RAW_DATA = 0x01
+RECORD_EMBEDDED_IMAGE = 0x0E
+RECORD_CAMERA_INFO = 0x20
+RECORD_PIP = 0x2A
+
+_FFF_HEADER_SIZE = 0x40
+_RECORD_ENTRY_SIZE = 0x20
+_RAW_DATA_HEADER_SIZE = 0x20
+
+_camera_info_tags = dict(
+    Emissivity=(0x20, "f"),
+    # ExifTool calls this ObjectDistance, but it matches EXIF SubjectDistance
+    SubjectDistance=(0x24, "f"),
+    ReflectedApparentTemperature=(0x28, "f"),
+    AtmosphericTemperature=(0x2C, "f"),
+    IRWindowTemperature=(0x30, "f"),
+    IRWindowTransmission=(0x34, "f"),
+    RelativeHumidity=(0x3C, "f"),
+    PlanckR1=(0x58, "f"),
+    PlanckB=(0x5C, "f"),
+    PlanckF=(0x60, "f"),
+    AtmosphericTransAlpha1=(0x70, "f"),
+    AtmosphericTransAlpha2=(0x74, "f"),
+    AtmosphericTransBeta1=(0x78, "f"),
+    AtmosphericTransBeta2=(0x7C, "f"),
+    AtmosphericTransX=(0x80, "f"),
+    PlanckO=(0x308, "i"),
+    PlanckR2=(0x30C, "f"),
+)
+"""Map of ExifTool tag name to (offset, struct format) in a CameraInfo"""
+_kelvin_camera_info_tags = (
+    "ReflectedApparentTemperature",
+    "AtmosphericTemperature",
+    "IRWindowTemperature",
+)
+"""CameraInfo tags stored in Kelvin, that ExifTool returns in Celcius"""
+_pip_tags = dict(
+    Real2IR=(0x00, "f"),
+    OffsetX=(0x04, "h"),
+    OffsetY=(0x06, "h"),
+    PiPX1=(0x08, "h"),
+    PiPX2=(0x0A, "h"),
+    PiPY1=(0x0C, "h"),
+    PiPY2=(0x0E, "h"),
+)
+"""Map of ExifTool tag name to (offset, struct format) in a PiP record"""
+
+
+class FFFRecord(typing.NamedTuple):
+    """A single record from an FFF file's record directory."""
+
+    type: int
+    subtype: int
+    version: int
+    id: int
+    data: bytes
+
+
+class FFFMetadata(typing.NamedTuple):
+    """The calibration constants and image shape of a FLIR image.
+
+    Attributes:
+        metadata: Map of ExifTool tag names (see `exif_var_tags`) to values.
+        shape: The `(height, width)` of the raw thermal data.
+    """
+
+    metadata: typing.Dict[str, float]
+    shape: typing.Tuple[int, int]
+
+
+class FFFData(typing.NamedTuple):
+    """The thermal data and calibration constants of a FLIR image.
+
+    Attributes:
+        metadata: Map of ExifTool tag names (see `exif_var_tags`) to values.
+        raw: The raw thermal data as a 2-D numpy array.
+    """
+
+    metadata: typing.Dict[str, float]
+    raw: np.ndarray
+
+
+class FFFVisualData(typing.NamedTuple):
+    """The thermal data, embedded visual image and alignment of a FLIR image.
+
+    Attributes:
+        metadata: Map of ExifTool tag names (see `exif_var_tags`) to values.
+        raw: The raw thermal data as a 2-D numpy array.
+        embedded_image: The encoded embedded visual image (usually a JPEG),
+            or `None` if there is no EmbeddedImage record.
+        alignment: Map of ExifTool PiP tag names (e.g. `Real2IR`) to values,
+            which is empty if there is no PiP record.
+    """
+
+    metadata: typing.Dict[str, float]
+    raw: np.ndarray
+    embedded_image: typing.Optional[bytes]
+    alignment: typing.Dict[str, float]
+
+
+def _iter_flir_app1_segments(
+    jpeg: bytes,
+) -> typing.Iterator[typing.Tuple[int, int, bytes]]:
+    """Iterates over the FLIR APP1 segments in a JPEG.
+
+    Yields:
+        `index, last_index, payload` for each FLIR APP1 segment.
+    """
+    pos = len(JPEG_SOI)
+    while pos + 4 <= len(jpeg):
+        if jpeg[pos] != 0xFF:
+            raise FFFParseError(f"Invalid JPEG marker at byte {pos}.")
+        marker = jpeg[pos + 1]
+        if marker == 0xFF:  # fill bytes are allowed between markers
+            pos += 1
+            continue
+        if marker == 0xDA:  # Start of Scan, no more metadata segments
+            return
+        (length,) = struct.unpack_from(">H", jpeg, pos + 2)
+        start, end = pos + 4, pos + 2 + length
+        if length < 2 or end > len(jpeg):
+            raise FFFParseError(f"JPEG segment at byte {pos} is truncated.")
+        segment = jpeg[start:end]
+        if marker == 0xE1 and segment[:5] == FLIR_APP1_HEADER:
+            if len(segment) < 8:
+                raise FFFParseError(
+                    f"FLIR APP1 segment at byte {pos} is truncated."
+                )
+            yield segment[6], segment[7], segment[8:]
+        pos += 2 + length
+
+
+def read_fff(jpeg: bytes) -> bytes:
+    """Reassembles the FFF file embedded in a FLIR JPG.
+
+    Parameters:
+        jpeg: The contents of the FLIR JPG.
+
+    Returns:
+        The embedded FFF file.
+
+    Raises:
+        FFFParseError if the JPG has no, or incomplete, FLIR data.
+    """
+    if jpeg[:2] != JPEG_SOI:
+        raise FFFParseError("Data is not a JPEG.")
+    segments: typing.Dict[int, bytes] = {}
+    last_index = None
+    for index, last_index, payload in _iter_flir_app1_segments(jpeg):
+        segments[index] = payload
+    if last_index is None:
+        raise FFFParseError("JPEG does not contain any FLIR data.")
+    if sorted(segments) != list(range(last_index + 1)):
+        raise FFFParseError("JPEG has missing FLIR segments.")
+    return b"".join(segments[index] for index in range(last_index + 1))
+
+
+def _fff_byte_order(fff: FFFBuffer, start: int = 0) -> str:
+    """Finds the byte order of an FFF file from its version.
+
+    Raises:
+        FFFParseError if the data is not a valid FFF file.
+    """
+    magic_end, header_end = start + 4, start + _FFF_HEADER_SIZE
+    if fff[start:magic_end] not in FFF_MAGICS or len(fff) < header_end:
+        raise FFFParseError("Data is not an FFF file.")
+    for byte_order in (">", "<"):
+        (version,) = struct.unpack_from(f"{byte_order}I", fff, start + 0x14)
+        if 100 <= version < 200:  # have only seen 100 and 101 so far
+            return byte_order
+    raise FFFParseError(f"Unknown FFF version {version}.")
+
+
+def _parse_fff_directory(
+    fff: FFFBuffer, start: int = 0
+) -> typing.List[typing.Tuple[int, int, int, int, int, int]]:
+    """Parses the non-empty entries of an FFF file's record directory.
+
+    Parameters:
+        fff: The data containing the FFF file, e.g. a memory-mapped file.
+        start: The offset of the FFF file in `fff`.
+
+    Returns:
+        `type, subtype, version, id, offset, length` for each entry,
+        where `offset` is relative to `start`.
+
+    Raises:
+        FFFParseError if the data is not a valid FFF file.
+    """
+    byte_order = _fff_byte_order(fff, start)
+    dir_offset, dir_entries = struct.unpack_from(
+        f"{byte_order}II", fff, start + 0x18
+    )
+    dir_end = start + dir_offset + dir_entries * _RECORD_ENTRY_SIZE
+    if dir_end > len(fff):
+        raise FFFParseError("FFF record directory is truncated.")
+
+    entry_format = f"{byte_order}HHIIII"
+    entries = []
+    for entry in range(dir_entries):
+        entry_offset = start + dir_offset + entry * _RECORD_ENTRY_SIZE
+        entry_values = struct.unpack_from(entry_format, fff, entry_offset)
+        if entry_values[0] != 0:  # type 0 is an empty entry
+            entries.append(entry_values)
+    return entries
+
+
+def fff_length(fff: FFFBuffer, start: int = 0) -> int:
+    """Finds the length of an FFF file from its record directory.
+
+    Parameters:
+        fff: The data containing the FFF file, e.g. a memory-mapped file.
+        start: The offset of the FFF file in `fff`.
+
+    Returns:
+        The length of the FFF file, up to the end of its last record.
+
+    Raises:
+        FFFParseError if the data is not a valid FFF file.
+    """
+    length = _FFF_HEADER_SIZE
+    for *_, offset, record_length in _parse_fff_directory(fff, start):
+        length = max(length, offset + record_length)
+    return length
+
+
+def parse_fff_records(fff: bytes) -> typing.Dict[int, FFFRecord]:
+    """Parses the record directory of an FFF file.
+
+    Parameters:
+        fff: The FFF file.
+
+    Returns:
+        A map of record type to the first record of that type.
+
+    Raises:
+        FFFParseError if the data is not a valid FFF file.
+    """
+    records: typing.Dict[int, FFFRecord] = {}
+    for entry_values in _parse_fff_directory(fff):
+        rec_type, subtype, version, rec_id, offset, length = entry_values
+        if rec_type in records:
+            continue  # we already have one of these
+        end = offset + length
+        if end > len(fff):
+            raise FFFParseError(f"FFF record {rec_type} is truncated.")
+        records[rec_type] = FFFRecord(
+            type=rec_type,
+            subtype=subtype,
+            version=version,
+            id=rec_id,
+            data=fff[offset:end],
+        )
+    return records
+
+
+def _record_byte_order(record: bytes) -> str:
+    """Finds the byte order of a record, as FLIR mix them up.
+
+    The first int16u of RawData and CameraInfo records is always 2.
+    """
+    return "<" if record[:2] == b"\x02\x00" else ">"
+
+
+def parse_camera_info(record: bytes) -> typing.Dict[str, float]:
+    """Parses the calibration constants from a CameraInfo record.
+
+    `PeakSpectralSensitivity` is not stored in the CameraInfo record,
+    so the default in `raw_temp_to_celcius` is used instead.
+
+    Parameters:
+        record: The data of the CameraInfo record.
+
+    Returns:
+        A map of ExifTool tag names to values, in the same units that
+        ExifTool uses.
+    """
+    byte_order = _record_byte_order(record)
+    if len(record) < 0x310:
+        raise FFFParseError("FFF CameraInfo record is truncated.")
+    metadata = {
+        tag: float(struct.unpack_from(f"{byte_order}{fmt}", record, offset)[0])
+        for tag, (offset, fmt) in _camera_info_tags.items()
+    }
+    for tag in _kelvin_camera_info_tags:
+        metadata[tag] -= CELCIUS_KELVIN_DIFF
+    if metadata["RelativeHumidity"] > 2:  # sometimes stored as a percentage
+        metadata["RelativeHumidity"] /= 100
+    return metadata
+
+
+def parse_raw_data_shape(record: bytes) -> typing.Tuple[int, int]:
+    """Parses the shape of the raw thermal data from a RawData record.
+
+    Parameters:
+        record: The data of the RawData record.
+
+    Returns:
+        The `(height, width)` of the raw thermal data.
+    """
+    if len(record) < _RAW_DATA_HEADER_SIZE:
+        raise FFFParseError("FFF RawData record is truncated.")
+    byte_order = _record_byte_order(record)
+    width, height = struct.unpack_from(f"{byte_order}HH", record, 2)
+    return height, width
+
+
+def decode_flir_png(image_data: bytes) -> np.ndarray:
+    """Decodes a 16-bit FLIR raw thermal PNG.
+
+    FLIR cameras save these PNGs with the wrong byte order, so the bytes of
+    the decoded array are swapped in-place, without another copy.
+
+    Parameters:
+        image_data: The PNG file.
+
+    Returns:
+        The raw data as a 2-D `np.uint16` array.
+
+    Raises:
+        FFFParseError if the PNG could not be decoded.
+    """
+    from PIL import Image  # type: ignore  # slow to import
+
+    try:
+        as_array = np.array(Image.open(io.BytesIO(image_data)))
+    except Exception as e:
+        raise FFFParseError(f"Could not decode FLIR PNG: {e}") from e
+    if as_array.dtype != np.uint16:  # older Pillows decode I;16 as int32
+        as_array = as_array.astype(np.uint16)
+    return as_array.byteswap(inplace=True)
+
+
+def _decode_jpegls(image_data: bytes) -> np.ndarray:
+    """Decodes a JPEG-LS image, as used in CSQ files, with `imagecodecs`.
+
+    Pillow can not decode JPEG-LS, so the optional `imagecodecs` package
+    is needed.
+    """
+    try:
+        import imagecodecs  # type: ignore
+    except ImportError as e:
+        raise FFFParseError(
+            "Decoding JPEG-LS FFF RawData (e.g. in CSQ files) needs "
+            "imagecodecs, install it with `pip install imagecodecs`."
+        ) from e
+    try:
+        as_array = imagecodecs.jpegls_decode(bytes(image_data))
+    except Exception as e:
+        raise FFFParseError(f"Could not decode JPEG-LS image: {e}") from e
+    return as_array.astype("uint16")
+
+
+def parse_raw_data(record: bytes) -> np.ndarray:
+    """Decodes the raw thermal data from a RawData record.
+
+    Parameters:
+        record: The data of the RawData record.
+
+    Returns:
+        The raw data as a 2-D numpy array.
+    """
+    byte_order = _record_byte_order(record)
+    height, width = parse_raw_data_shape(record)
+    image_data = record[_RAW_DATA_HEADER_SIZE:]
+    if image_data[:4] == b"\x89PNG":
+        as_array = decode_flir_png(image_data)
+    elif image_data[:2] == JPEG_SOI:
+        as_array = _decode_jpegls(image_data)
+    else:
+        if len(image_data) < width * height * 2:
+            raise FFFParseError("FFF RawData image is truncated.")
+        as_array = np.frombuffer(
+            image_data, dtype=f"{byte_order}u2", count=width * height
+        ).reshape((height, width))
+    if as_array.shape != (height, width):
+        raise FFFParseError(
+            f"FFF RawData image has shape {as_array.shape}, "
+            f"expected {(height, width)}."
+        )
+    return as_array
+
+
+def parse_embedded_image(record: bytes) -> bytes:
+    """Gets the encoded visual image from an EmbeddedImage record.
+
+    EmbeddedImage records have the same header as RawData records.
+
+    Parameters:
+        record: The data of the EmbeddedImage record.
+
+    Returns:
+        The encoded image, usually a JPEG.
+    """
+    if len(record) < _RAW_DATA_HEADER_SIZE:
+        raise FFFParseError("FFF EmbeddedImage record is truncated.")
+    return record[_RAW_DATA_HEADER_SIZE:]
+
+
+def parse_pip(record: bytes, byte_order: str) -> typing.Dict[str, float]:
+    """Parses the alignment of the visual and thermal images from a
+    PiP (picture in picture) record.
+
+    Parameters:
+        record: The data of the PiP record.
+        byte_order: The byte order of the FFF file.
+
+    Returns:
+        A map of ExifTool tag names (`Real2IR`, `OffsetX`, `OffsetY`,
+        `PiPX1`, `PiPX2`, `PiPY1`, `PiPY2`) to values.
+    """
+    if len(record) < 0x10:
+        raise FFFParseError("FFF PiP record is truncated.")
+    return {
+        tag: float(struct.unpack_from(f"{byte_order}{fmt}", record, offset)[0])
+        for tag, (offset, fmt) in _pip_tags.items()
+    }
+
+
+def _get_records(data: bytes, *record_types: int) -> typing.List[FFFRecord]:
+    """Gets the given records from a FLIR JPG or bare FFF file.
+
+    Raises:
+        FFFParseError if the data could not be parsed, or is missing any
+        of the records.
+    """
+    fff = data if data[:4] in FFF_MAGICS else read_fff(data)
+    records = parse_fff_records(fff)
+    try:
+        return [records[record_type] for record_type in record_types]
+    except KeyError as e:
+        raise FFFParseError(f"FFF file is missing record {e}.") from e
+
+
+def read_flir_data(data: bytes) -> FFFData:
+    """Reads the raw thermal data and calibration constants of a FLIR image.
+
+    Parameters:
+        data: The contents of a FLIR JPG, or of a bare FFF file.
+
+    Returns:
+        The calibration constants and raw thermal data.
+
+    Raises:
+        FFFParseError if the data could not be parsed.
+    """
+    raw_record, camera_info_record = _get_records(
+        data, RECORD_RAW_DATA, RECORD_CAMERA_INFO
+    )
+    return FFFData(
+        metadata=parse_camera_info(camera_info_record.data),
+        raw=parse_raw_data(raw_record.data),
+    )
+
+
+def load_flir_file(filepath: Path) -> FFFData:
+    """Reads the raw thermal data and calibration constants of a FLIR file.
+
+    Parameters:
+        filepath: The path to the FLIR file.
+
+    Returns:
+        The calibration constants and raw thermal data.
+
+    Raises:
+        FFFParseError if the file could not be parsed.
+    """
+    with open(get_str_filepath(filepath), "rb") as flir_file:
+        return read_flir_data(flir_file.read())
+
+
+def read_flir_metadata(data: bytes) -> FFFMetadata:
+    """Reads the calibration constants of a FLIR image.
+
+    Unlike `read_flir_data`, the raw thermal data is not decoded.
+
+    Parameters:
+        data: The contents of a FLIR JPG, or of a bare FFF file.
+
+    Returns:
+        The calibration constants and the shape of the raw thermal data.
+
+    Raises:
+        FFFParseError if the data could not be parsed.
+    """
+    raw_record, camera_info_record = _get_records(
+        data, RECORD_RAW_DATA, RECORD_CAMERA_INFO
+    )
+    return FFFMetadata(
+        metadata=parse_camera_info(camera_info_record.data),
+        shape=parse_raw_data_shape(raw_record.data),
+    )
+
+
+def load_flir_metadata(filepath: Path) -> FFFMetadata:
+    """Reads the calibration constants of a FLIR file.
+
+    Parameters:
+        filepath: The path to the FLIR file.
+
+    Returns:
+        The calibration constants and the shape of the raw thermal data.
+
+    Raises:
+        FFFParseError if the file could not be parsed.
+    """
+    with open(get_str_filepath(filepath), "rb") as flir_file:
+        return read_flir_metadata(flir_file.read())
+
+
+def read_flir_visual_data(data: bytes) -> FFFVisualData:
+    """Reads the raw thermal data, calibration constants, embedded visual
+    image and alignment of a FLIR image, parsing the FFF file once.
+
+    Parameters:
+        data: The contents of a FLIR JPG, or of a bare FFF file.
+
+    Returns:
+        The calibration constants, raw thermal data, encoded visual image
+        and alignment.
+
+    Raises:
+        FFFParseError if the data could not be parsed.
+    """
+    fff = data if data[:4] in FFF_MAGICS else read_fff(data)
+    records = parse_fff_records(fff)
+    try:
+        raw_record = records[RECORD_RAW_DATA]
+        camera_info_record = records[RECORD_CAMERA_INFO]
+    except KeyError as e:
+        raise FFFParseError(f"FFF file is missing record {e}.") from e
+    embedded_image_record = records.get(RECORD_EMBEDDED_IMAGE)
+    pip_record = records.get(RECORD_PIP)
+    return FFFVisualData(
+        metadata=parse_camera_info(camera_info_record.data),
+        raw=parse_raw_data(raw_record.data),
+        embedded_image=(
+            None
+            if embedded_image_record is None
+            else parse_embedded_image(embedded_image_record.data)
+        ),
+        alignment=(
+            {}
+            if pip_record is None
+            else parse_pip(pip_record.data, _fff_byte_order(fff))
+        ),
+    )
+
+
+def load_flir_visual_data(filepath: Path) -> FFFVisualData:
+    """Reads the thermal data, embedded visual image and alignment of a FLIR
+    file, see `read_flir_visual_data`.
+
+    Parameters:
+        filepath: The path to the FLIR file.
+
+    Returns:
+        The calibration constants, raw thermal data, encoded visual image
+        and alignment.
+
+    Raises:
+        FFFParseError if the file could not be parsed.
+    """
+    with open(get_str_filepath(filepath), "rb") as flir_file:
+        return read_flir_visual_data(flir_file.read())
@@ -1,13 +1,87 @@
-from typing import TYPE_CHECKING, Iterable, Optional
+import concurrent.futures
+import functools
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
-from exiftool import ExifTool  # type: ignore
-from exiftool import executable as exiftool_default_exe  # type: ignore
-
-from .get_thermal import get_thermal, get_thermal_batch
+from .defaults import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_EXIFTOOL,
+    DEFAULT_PERCENTILES,
+    DEFAULT_QUEUE_DEPTH,
+    DEFAULT_RETRIES,
+    DEFAULT_THUMBNAIL_SIZE,
+    DEFAULT_TIMEOUT,
+    ENGINES,
+)
+from .instrument import Instrumentation, StageStats, iterate
 from .pathutils import Path
+from .utils import chunked
 
 if TYPE_CHECKING:
+    # NumPy, PIL and ExifTool are slow to import, so every module that
+    # imports them is only imported by the methods that use it
     import numpy as np  # type: ignore
+    from exiftool import ExifTool  # type: ignore
+
+    from .aggregate import ThermalAggregator
+    from .cache import ThermalCache
+    from .get_thermal import Buffer
+    from .metadata import ThermalMetadata
+    from .radiometric import RadiometricImage
+    from .render import ThumbnailResult
+    from .results import ThermalResult
+    from .roi import ROI, ROIStats
+    from .visual import ThermalVisualImage
+
+DEFAULT_PIPELINE_WORKERS = 2
+"""Default number of threads decoding and converting thermal data"""
+
+EXIFTOOL_STARTS = ("lazy", "background", "eager")
+"""When `FlirExtractor` starts its ExifTool process.
+
+- `lazy`: when ExifTool is first needed, so never if the `native` engine
+  can parse every file.
+- `background`: in a background thread when the extractor is opened,
+  so ExifTool starts up while the caller does other work.
+- `eager`: in `FlirExtractor.open`.
+"""
+
+F = TypeVar("F", bound=Callable)
+
+
+def _instrumented(method: F) -> F:
+    """Activates the extractor's `instrumentation` while `method` runs."""
+
+    @functools.wraps(method)
+    def instrumented_method(self, *args, **kwargs):
+        if self.instrumentation is None:
+            return method(self, *args, **kwargs)
+        with self.instrumentation.activate():
+            return method(self, *args, **kwargs)
+
+    return instrumented_method  # type: ignore
+
+
+def _check_aggregate_args(
+    histogram_bins: Optional[Sequence[float]], raw: bool
+):
+    """Checks that a temperature histogram is not used with raw data."""
+    if raw and histogram_bins is not None:
+        raise ValueError(
+            "histogram_bins are temperatures, so can not be used with "
+            "raw=True."
+        )
 
 
 class FlirExtractor:
@@ -15,6 +89,24 @@ class FlirExtractor:
 
     Attributes:
         exiftoolpath: The path to the ExifTool executable.
+        engine: How to load FLIR images, either `"exiftool"`, or
+            `"native"` to parse FLIR images in Python and only use ExifTool
+            for files that can not be parsed natively.
+        chunk_size: The number of files to load in each ExifTool call
+            in `get_thermal_batch`.
+        cache: An on-disk cache of raw and converted thermal data in
+            `cache_dir`, limited to `cache_max_size` bytes, if given.
+            Loading unmodified files again is then mostly just loading
+            memory-mapped `.npy` files.
+        pipeline_workers: The number of threads that decode and convert
+            thermal data in `get_thermal_batch` and `iter_thermal`, while
+            ExifTool loads the next chunk, or `0` to not pipeline loading.
+        queue_depth: The number of chunks that can be waiting to be
+            converted before ExifTool stops loading new chunks.
+        instrumentation: If given, times each stage of loading files,
+            see `stats()` and `flirextractor.instrument`.
+        exiftool_start: When to start the ExifTool process,
+            see `EXIFTOOL_STARTS`.
 
     Example:
         with FlirExtractor(exiftoolpath="/usr/bin/exiftool") as extractor:
@@ -24,46 +116,159 @@ class FlirExtractor:
             thermal_d_list = extractor.get_thermal_batch(
                 ["./FLIR1.jpg", "./FLIR2.jpg"]
             )
+            # lazily get thermal data from a huge number of files
+            for path, thermal_data in extractor.iter_thermal(
+                pathlib.Path("./archive").glob("**/*.jpg")
+            ):
+                pass
     """
 
     exiftoolpath: Optional[Path]
-    _exiftool: Optional[ExifTool]
+    engine: str
+    chunk_size: int
+    cache: Optional["ThermalCache"]
+    pipeline_workers: int
+    queue_depth: int
+    instrumentation: Optional[Instrumentation]
+    exiftool_start: str
+    _opened: bool
+    _exiftool: Optional["ExifTool"]
+    _exiftool_lock: threading.Lock
+    _exiftool_starter: Optional[threading.Thread]
+    _executor: Optional[concurrent.futures.ThreadPoolExecutor]
 
-    def __init__(self, exiftoolpath: Path = exiftool_default_exe):
+    def __init__(
+        self,
+        exiftoolpath: Path = DEFAULT_EXIFTOOL,
+        engine: str = "exiftool",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        cache_dir: Optional[Path] = None,
+        cache_max_size: Optional[int] = None,
+        pipeline_workers: int = DEFAULT_PIPELINE_WORKERS,
+        queue_depth: int = DEFAULT_QUEUE_DEPTH,
+        instrumentation: Optional[Instrumentation] = None,
+        exiftool_start: str = "lazy",
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine}, must be in {ENGINES}.")
+        if exiftool_start not in EXIFTOOL_STARTS:
+            raise ValueError(
+                f"Unknown exiftool_start {exiftool_start}, "
+                f"must be in {EXIFTOOL_STARTS}."
+            )
+        if pipeline_workers < 0:
+            raise ValueError(
+                "pipeline_workers must not be negative, "
+                f"not {pipeline_workers}."
+            )
         self.exiftoolpath = exiftoolpath
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.cache = None
+        if cache_dir is not None:
+            from .cache import ThermalCache
+
+            self.cache = ThermalCache(cache_dir, max_size=cache_max_size)
+        self.pipeline_workers = pipeline_workers
+        self.queue_depth = queue_depth
+        self.instrumentation = instrumentation
+        self.exiftool_start = exiftool_start
+        self._opened = False
         self._exiftool = None
+        self._exiftool_lock = threading.Lock()
+        self._exiftool_starter = None
+        self._executor = None
 
-    @property
-    def exiftool(self) -> ExifTool:
-        _exiftool = self._exiftool
-        if _exiftool is None:
+    def _check_opened(self):
+        if not self._opened:
             raise AttributeError(
                 "ExifTool was not initialized. "
                 "Use FlirExtractor in a context manager, e.g. \n"
                 "with FlirExtractor() as e:\n"
                 "    e.do_magic()"
             )
+
+    @property
+    def exiftool(self) -> "ExifTool":
+        """The ExifTool process, which is started if it isn't already."""
+        self._check_opened()
+        _exiftool = self._exiftool
+        if _exiftool is None:
+            with self._exiftool_lock:  # waits for any background start
+                if self._exiftool is None:
+                    from exiftool import ExifTool  # type: ignore
+
+                    exiftool = ExifTool(executable_=str(self.exiftoolpath))
+                    exiftool.start()
+                    self._exiftool = exiftool
+                _exiftool = self._exiftool
         return _exiftool
 
+    @property
+    def _lazy_exiftool(self) -> "ExifTool":
+        """An ExifTool that is only started when it is first used."""
+        self._check_opened()
+        if self._exiftool is not None:
+            return self._exiftool
+        return _LazyExifTool(self)
+
+    def _restart_exiftool(self):
+        """Kills ExifTool, e.g. if it hangs, so that it starts again when
+        it is next used."""
+        from .get_thermal import _kill_exiftool
+
+        with self._exiftool_lock:
+            if self._exiftool is not None:
+                _kill_exiftool(self._exiftool)
+                self._exiftool = None
+
+    def _start_exiftool_in_background(self):
+        try:
+            self.exiftool
+        except Exception:
+            pass  # raised again when ExifTool is first used
+
     def open(self):
-        """Creates an Exiftool process.
+        """Opens the extractor, and starts ExifTool, see `exiftool_start`.
 
         Not recommended, use `with:` context manager instead.
         """
-        if self._exiftool is not None:
+        if self._opened:
             raise Exception("ExifTool was already initialized.")
-        self._exiftool = ExifTool(executable_=str(self.exiftoolpath))
-        self._exiftool.start()
+        self._opened = True
+        try:
+            if self.exiftool_start == "eager":
+                self.exiftool
+            elif self.exiftool_start == "background":
+                self._exiftool_starter = threading.Thread(
+                    target=self._start_exiftool_in_background, daemon=True
+                )
+                self._exiftool_starter.start()
+            if self.pipeline_workers:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.pipeline_workers
+                )
+        except BaseException:
+            self.close()
+            raise
 
     def close(self):
-        """Closes the Exiftool process.
+        """Closes the Exiftool process, if it was started.
 
         Not recommended, use `with:` context manager instead.
         """
-        if self._exiftool is None:
+        if not self._opened:
             return  # already closed, do nothing
-        self._exiftool.terminate()
-        self._exiftool = None
+        if self._exiftool_starter is not None:
+            self._exiftool_starter.join()
+            self._exiftool_starter = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._exiftool is not None:
+            self._exiftool.terminate()
+            self._exiftool = None
+        self._opened = False
 
     def __enter__(self):
         self.open()
@@ -72,6 +277,18 @@ class FlirExtractor:
     def __exit__(self, exception_type, exception_value, traceback):
         self.close()
 
+    def stats(self) -> Dict[str, StageStats]:
+        """Gets the timing statistics of each stage of loading files.
+
+        Returns:
+            The `StageStats` of each stage that ran, e.g. `"exiftool"` or
+            `"convert"`, or an empty dict if there is no `instrumentation`.
+        """
+        if self.instrumentation is None:
+            return {}
+        return self.instrumentation.stats()
+
+    @_instrumented
     def get_thermal(self, filepath: Path) -> "np.ndarray":
         """Gets a thermal image from a FLIR file.
 
@@ -81,8 +298,13 @@ class FlirExtractor:
         Returns:
             The thermal data in Celcius as a 2-D numpy array.
         """
-        return get_thermal(self.exiftool, filepath)
+        from .get_thermal import get_thermal
+
+        return get_thermal(
+            self._lazy_exiftool, filepath, engine=self.engine, cache=self.cache
+        )
 
+    @_instrumented
     def get_thermal_batch(
         self, filepaths: Iterable[Path]
     ) -> Iterable["np.ndarray"]:
@@ -94,4 +316,438 @@ class FlirExtractor:
         Returns:
             A list of the thermal data in Celcius as 2-D numpy arrays.
         """
-        return get_thermal_batch(self.exiftool, filepaths)
+        from .get_thermal import get_thermal_batch
+
+        return get_thermal_batch(
+            self._lazy_exiftool,
+            filepaths,
+            engine=self.engine,
+            chunk_size=self.chunk_size,
+            cache=self.cache,
+            executor=self._executor,
+            queue_depth=self.queue_depth,
+        )
+
+    @_instrumented
+    def get_thermal_from_bytes(self, buffer: "Buffer") -> "np.ndarray":
+        """Gets a thermal image from an in-memory FLIR image.
+
+        The image is always parsed natively, whatever the `engine`, and is
+        only written to a temporary file if it can only be loaded with
+        ExifTool.
+
+        Parameters:
+            buffer: The contents of the FLIR image, e.g. `bytes` or
+                `memoryview`, or a binary file object opened with `"rb"`.
+
+        Returns:
+            The thermal data in Celcius as a 2-D numpy array.
+        """
+        from .get_thermal import get_thermal_from_bytes
+
+        return get_thermal_from_bytes(self._lazy_exiftool, buffer)
+
+    @_instrumented
+    def get_thermal_batch_from_buffers(
+        self, buffers: Iterable["Buffer"]
+    ) -> List["np.ndarray"]:
+        """Gets thermal images from a list of in-memory FLIR images.
+
+        Parameters:
+            buffers: The contents of the FLIR images, or binary file objects,
+                see `get_thermal_from_bytes`.
+
+        Returns:
+            A list of the thermal data in Celcius as 2-D numpy arrays.
+        """
+        from .get_thermal import get_thermal_batch_from_buffers
+
+        return get_thermal_batch_from_buffers(
+            self._lazy_exiftool, buffers, chunk_size=self.chunk_size
+        )
+
+    @_instrumented
+    def get_thermal_stack(
+        self,
+        filepaths: Iterable[Path],
+        out: Optional["np.ndarray"] = None,
+        dtype: Optional["np.dtype"] = None,
+    ) -> "np.ndarray":
+        """Gets thermal images from a list of same-sized FLIR files.
+
+        Parameters:
+            filepaths: The paths to the FLIR files.
+            out: A preallocated `(N, H, W)` array to store the data in.
+            dtype: The floating point type of the output if `out` is not
+                given, e.g. `np.float32` (default: `np.float64`).
+
+        Returns:
+            The thermal data in Celcius as a `(N, H, W)` numpy array.
+        """
+        from .get_thermal import get_thermal_stack
+
+        return get_thermal_stack(
+            self._lazy_exiftool,
+            filepaths,
+            engine=self.engine,
+            chunk_size=self.chunk_size,
+            out=out,
+            dtype=dtype,
+            cache=self.cache,
+        )
+
+    def iter_thermal(
+        self, filepaths: Iterable[Path], chunk_size: Optional[int] = None
+    ) -> Iterator[Tuple[Path, "np.ndarray"]]:
+        """Lazily gets thermal images from an iterable of FLIR files.
+
+        Only `chunk_size` files are loaded into memory at a time,
+        so `filepaths` can be very large, or even unbounded.
+
+        Parameters:
+            filepaths: The paths to the FLIR files.
+            chunk_size: The number of files to load at a time
+                (default: `self.chunk_size`).
+
+        Yields:
+            `filepath, thermal_data` for each file, in order, where
+            `thermal_data` is in Celcius as a 2-D numpy array.
+        """
+        from .get_thermal import iter_thermal
+
+        return iterate(
+            self.instrumentation,
+            iter_thermal(
+                self._lazy_exiftool,
+                filepaths,
+                engine=self.engine,
+                chunk_size=(
+                    self.chunk_size if chunk_size is None else chunk_size
+                ),
+                cache=self.cache,
+                executor=self._executor,
+                queue_depth=self.queue_depth,
+            ),
+        )
+
+    @_instrumented
+    def get_thermal_results(
+        self,
+        filepaths: Iterable[Path],
+        retries: int = DEFAULT_RETRIES,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+    ) -> List["ThermalResult"]:
+        """Gets thermal images from a list of FLIR files, without raising.
+
+        Unlike `get_thermal_batch`, one bad file doesn't fail the batch.
+        Instead, each file has a `ThermalResult` with either its thermal
+        data or its error, and if ExifTool hangs or exits, it is restarted,
+        see `flirextractor.results`.
+
+        Parameters:
+            filepaths: The paths to the FLIR files.
+            retries: The number of times to retry each file after a
+                transient error, e.g. an ExifTool timeout.
+            timeout: The maximum time in seconds to wait for each ExifTool
+                call, or `None` to wait forever.
+
+        Returns:
+            A `ThermalResult` for each file, in order.
+        """
+        return list(self.iter_thermal_results(filepaths, retries, timeout))
+
+    def iter_thermal_results(
+        self,
+        filepaths: Iterable[Path],
+        retries: int = DEFAULT_RETRIES,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+    ) -> Iterator["ThermalResult"]:
+        """Lazily gets thermal images from FLIR files, without raising.
+
+        Like `get_thermal_results`, but only `chunk_size` files are loaded
+        into memory at a time, like `iter_thermal`.
+
+        Yields:
+            A `ThermalResult` for each file, in order.
+        """
+        from .results import iter_thermal_results
+
+        self._check_opened()
+        return iterate(
+            self.instrumentation,
+            iter_thermal_results(
+                _LazyExifTool(self),  # so that restarts start a new ExifTool
+                filepaths,
+                engine=self.engine,
+                chunk_size=self.chunk_size,
+                retries=retries,
+                timeout=timeout,
+                cache=self.cache,
+                executor=self._executor,
+                restart_exiftool=self._restart_exiftool,
+            ),
+        )
+
+    def iter_frames(self, filepath: Path) -> Iterator["np.ndarray"]:
+        """Lazily gets each frame of a FLIR sequence (SEQ or CSQ file).
+
+        Sequences are parsed natively, so ExifTool is never used.
+        See `flirextractor.seq` for more options.
+
+        Parameters:
+            filepath: The path to the FLIR sequence.
+
+        Yields:
+            The thermal data in Celcius of each frame as a 2-D numpy array.
+        """
+        from .seq import iter_frames
+
+        return iter_frames(filepath)
+
+    def aggregate(
+        self,
+        filepaths: Iterable[Path],
+        histogram_bins: Optional[Sequence[float]] = None,
+        raw: bool = False,
+    ) -> "ThermalAggregator":
+        """Aggregates per-pixel statistics over many same-shaped FLIR files.
+
+        Files are streamed through `iter_thermal`, so only a few chunks of
+        thermal data are ever in memory.
+
+        Parameters:
+            filepaths: The paths to the FLIR files.
+            histogram_bins: The edges of the bins of a temperature histogram
+                to calculate.
+            raw: If `True`, aggregate the raw thermal data instead, which
+                skips converting every file into Celcius.
+
+        Returns:
+            A `ThermalAggregator`, with the per-pixel mean, variance,
+            min and max.
+
+        Raises:
+            ValueError if both `histogram_bins` and `raw` are given, as raw
+            values are not temperatures, and files with different
+            calibrations would be binned inconsistently.
+        """
+        from .aggregate import ThermalAggregator
+
+        _check_aggregate_args(histogram_bins, raw)
+        aggregator = ThermalAggregator(histogram_bins)
+        if not raw:
+            return aggregator.update_iter(self.iter_thermal(filepaths))
+        for chunk in chunked(filepaths, self.chunk_size):
+            for image in self.get_radiometric_batch(chunk):
+                aggregator.update(image.raw)
+        return aggregator
+
+    def get_radiometric(self, filepath: Path) -> "RadiometricImage":
+        """Gets the raw thermal data and metadata from a FLIR file.
+
+        Use this to convert the same FLIR file with many different
+        parameters, e.g. emissivities, without loading it again.
+
+        Parameters:
+            filepath: The path to the FLIR file.
+
+        Returns:
+            A `RadiometricImage`, which lazily converts to Celcius.
+        """
+        return self.get_radiometric_batch((filepath,))[0]
+
+    @_instrumented
+    def get_radiometric_batch(
+        self, filepaths: Iterable[Path]
+    ) -> List["RadiometricImage"]:
+        """Gets the raw thermal data and metadata from a list of FLIR files.
+
+        Parameters:
+            filepaths: The paths to the FLIR files.
+
+        Returns:
+            A list of `RadiometricImage`s, which lazily convert to Celcius.
+        """
+        from .radiometric import get_radiometric_batch
+
+        return get_radiometric_batch(
+            self._lazy_exiftool,
+            filepaths,
+            engine=self.engine,
+            chunk_size=self.chunk_size,
+            cache=self.cache,
+        )
+
+    def get_thermal_visual(self, filepath: Path) -> "ThermalVisualImage":
+        """Gets the thermal data, embedded visual image and alignment of a
+        FLIR file, loading the file once.
+
+        Parameters:
+            filepath: The path to the FLIR file.
+
+        Returns:
+            A `ThermalVisualImage`, whose visual image can be registered to
+            the thermal image with `ThermalVisualImage.register()`.
+        """
+        return self.get_thermal_visual_batch((filepath,))[0]
+
+    @_instrumented
+    def get_thermal_visual_batch(
+        self, filepaths: Iterable[Path]
+    ) -> List["ThermalVisualImage"]:
+        """Gets the thermal data, embedded visual image and alignment of a
+        list of FLIR files, with a single ExifTool call per chunk.
+
+        Parameters:
+            filepaths: The paths to the FLIR files.
+
+        Returns:
+            A list of `ThermalVisualImage`s.
+        """
+        from .visual import get_thermal_visual_batch
+
+        return get_thermal_visual_batch(
+            self._lazy_exiftool,
+            filepaths,
+            engine=self.engine,
+            chunk_size=self.chunk_size,
+        )
+
+    def write_thumbnails(
+        self,
+        files: Iterable[Tuple[Path, Path]],
+        palette: str = "iron",
+        vmin: Optional[float] = None,
+        vmax: Optional[float] = None,
+        percentiles: Tuple[float, float] = DEFAULT_PERCENTILES,
+        max_size: Optional[int] = DEFAULT_THUMBNAIL_SIZE,
+        workers: Optional[int] = None,
+    ) -> Iterator["ThumbnailResult"]:
+        """Lazily renders FLIR files as false-colour thumbnails, rendering
+        and writing them in a pool of threads.
+
+        Parameters:
+            files: `filepath, output` of each file, where the format of the
+                thumbnail is taken from the suffix of `output`, e.g. `.png`.
+            palette, vmin, vmax, percentiles, max_size: How to render each
+                thumbnail, see `flirextractor.render.render`.
+            workers: The number of threads rendering thumbnails
+                (default: the number of CPUs).
+
+        Yields:
+            A `ThumbnailResult` for each file, in order, holding its error
+            if it could not be loaded, rendered or written.
+        """
+        from .render import write_thumbnails
+
+        self._check_opened()
+        return iterate(
+            self.instrumentation,
+            write_thumbnails(
+                self,
+                files,
+                palette=palette,
+                vmin=vmin,
+                vmax=vmax,
+                percentiles=percentiles,
+                max_size=max_size,
+                workers=workers,
+            ),
+        )
+
+    def get_roi_stats(
+        self,
+        filepath: Path,
+        rois: Sequence["ROI"],
+        percentiles: Sequence[float] = (),
+    ) -> List["ROIStats"]:
+        """Gets temperature statistics inside regions of interest.
+
+        Only the pixels inside the ROIs are converted to Celcius.
+
+        Parameters:
+            filepath: The path to the FLIR file.
+            rois: The regions of interest, each either a
+                `flirextractor.roi.Box`, a `flirextractor.roi.Polygon`,
+                or a boolean mask.
+            percentiles: The percentiles to calculate, between 0 and 100.
+
+        Returns:
+            The `ROIStats` of each ROI, in order.
+        """
+        return self.get_roi_stats_batch((filepath,), rois, percentiles)[0]
+
+    @_instrumented
+    def get_roi_stats_batch(
+        self,
+        filepaths: Iterable[Path],
+        rois: Sequence["ROI"],
+        percentiles: Sequence[float] = (),
+    ) -> List[List["ROIStats"]]:
+        """Gets temperature statistics inside ROIs of a list of FLIR files.
+
+        Parameters:
+            filepaths: The paths to the FLIR files.
+            rois: The regions of interest, used for every file,
+                see `get_roi_stats`.
+            percentiles: The percentiles to calculate, between 0 and 100.
+
+        Returns:
+            For each FLIR file, the `ROIStats` of each ROI.
+        """
+        from .roi import get_roi_stats_batch
+
+        return get_roi_stats_batch(
+            self._lazy_exiftool,
+            filepaths,
+            rois,
+            percentiles,
+            engine=self.engine,
+            chunk_size=self.chunk_size,
+            cache=self.cache,
+        )
+
+    def get_metadata(self, filepath: Path) -> "ThermalMetadata":
+        """Gets only the calibration metadata and shape of a FLIR file.
+
+        Much faster than `get_thermal`, as no thermal data is decoded.
+
+        Parameters:
+            filepath: The path to the FLIR file.
+
+        Returns:
+            The `ThermalMetadata` of the FLIR file.
+        """
+        return self.get_metadata_batch((filepath,))[0]
+
+    @_instrumented
+    def get_metadata_batch(
+        self, filepaths: Iterable[Path]
+    ) -> List["ThermalMetadata"]:
+        """Gets only the calibration metadata and shape of FLIR files.
+
+        Parameters:
+            filepaths: The paths to the FLIR files.
+
+        Returns:
+            A list of the `ThermalMetadata` of each FLIR file.
+        """
+        from .metadata import get_metadata_batch
+
+        return get_metadata_batch(
+            self._lazy_exiftool,
+            filepaths,
+            engine=self.engine,
+            chunk_size=self.chunk_size,
+        )
+
+
+class _LazyExifTool:
+    """Starts a `FlirExtractor`'s ExifTool when any of its methods are used.
+    """
+
+    def __init__(self, extractor: FlirExtractor):
+        self._extractor = extractor
+
+    def __getattr__(self, name: str):
+        return getattr(self._extractor.exiftool, name)
@@ -2,68 +2,162 @@
 
 Calls exiftool to extract the embedded image and metadata from the FLIR file.
 """
+import base64
+import collections
+import concurrent.futures
+import inspect
 import io
+import json
+import os
+import select
+import struct
+import tempfile
+import time
 import typing
 
 import numpy as np  # type: ignore
-from exiftool import ExifTool, fsencode  # type: ignore
-from PIL import Image  # type: ignore
+from exiftool import ExifTool  # type: ignore
 
+from .cache import ThermalCache
+from .defaults import DEFAULT_CHUNK_SIZE, DEFAULT_QUEUE_DEPTH, ENGINES
+from .fff import (
+    FFFParseError,
+    decode_flir_png,
+    load_flir_file,
+    read_flir_data,
+)
+from .instrument import bind, stage
 from .pathutils import Path, get_str_filepath
 from .raw_temp_to_celcius import (
     AtmosphericTransConsts,
     CameraPlanckConsts,
     raw_temp_to_celcius,
+    raw_temp_to_celcius_lut,
+    raw_temp_to_celcius_stack,
 )
-from .utils import split_dict
+from .utils import chunked, split_dict
 
+RAW_THERMAL_IMAGE_TAG = "RawThermalImage"
+"""The EXIF metadata tag name of the raw thermal image"""
+_BASE64_PREFIX = "base64:"
+"""ExifTool's prefix for base64-encoded binary tags in JSON output"""
 
-def _get_tag_bytes(
-    exiftool: ExifTool, tag: typing.Text, filepath: Path
-) -> bytes:
-    """Gets the data of a tag in a file in bytes using exiftool.
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+"""Maximum total size of the files loaded in a single ExifTool call.
+
+ExifTool's JSON reply holds the base64-encoded raw thermal image of each
+file, so it is about 4/3 of the size of the files, see `_split_by_size`.
+"""
+
+
+_TIFF_BYTE_ORDERS = {b"II*\0": "<", b"MM\0*": ">"}
+"""TIFF headers, and the byte order they mark"""
+_TIFF_TAG_FORMATS = {3: "H", 4: "I"}
+"""struct formats of TIFF SHORT and LONG field types"""
+_tiff_tags = dict(
+    width=256,
+    height=257,
+    bits_per_sample=258,
+    compression=259,
+    strip_offsets=273,
+    samples_per_pixel=277,
+)
 
-    No batch version is possible, as there is no way to seperate the bytes
-    output by exiftool.
+
+def _decode_raw_tiff(raw_image_bytes: bytes) -> typing.Optional[np.ndarray]:
+    """Views the pixels of an uncompressed 16-bit TIFF without copying.
+
+    ExifTool wraps uncompressed FLIR raw data in a minimal TIFF, so the
+    pixels are just a single strip after the header.
 
     Parameters:
-        exiftool: The ExifTool process to use.
-        tag: The metadata tag to load.
-        filepath: The path to the file to load.
+        raw_image_bytes: The TIFF file.
 
     Returns:
-        The loaded metadata for the tag in `bytes`.
+        A read-only 2-D `np.uint16` view of `raw_image_bytes`, or `None` if
+        the TIFF is not a single uncompressed strip of 16-bit pixels.
     """
-    params = ["-b", f"-{tag}", str(filepath)]
-    params_as_bytes = map(fsencode, params)
-    return exiftool.execute(*params_as_bytes)
+    byte_order = _TIFF_BYTE_ORDERS.get(raw_image_bytes[:4])
+    if byte_order is None:
+        return None
+    try:
+        (ifd_offset,) = struct.unpack_from(
+            f"{byte_order}I", raw_image_bytes, 4
+        )
+        (entries,) = struct.unpack_from(
+            f"{byte_order}H", raw_image_bytes, ifd_offset
+        )
+        fields = {}
+        for entry in range(entries):
+            entry_offset = ifd_offset + 2 + entry * 12
+            tag, field_type, count = struct.unpack_from(
+                f"{byte_order}HHI", raw_image_bytes, entry_offset
+            )
+            if field_type in _TIFF_TAG_FORMATS and count == 1:
+                (fields[tag],) = struct.unpack_from(
+                    f"{byte_order}{_TIFF_TAG_FORMATS[field_type]}",
+                    raw_image_bytes,
+                    entry_offset + 8,
+                )
+        tags = {name: fields.get(tag) for name, tag in _tiff_tags.items()}
+    except struct.error:
+        return None  # truncated, let PIL handle it
+    if (
+        tags["bits_per_sample"] != 16
+        or tags["compression"] not in (None, 1)
+        or tags["samples_per_pixel"] not in (None, 1)
+        or tags["strip_offsets"] is None  # or multiple strips
+        or tags["width"] is None
+        or tags["height"] is None
+    ):
+        return None
+    width, height = tags["width"], tags["height"]
+    offset = tags["strip_offsets"]
+    if offset + width * height * 2 > len(raw_image_bytes):
+        return None
+    return np.frombuffer(
+        raw_image_bytes,
+        dtype=f"{byte_order}u2",
+        count=width * height,
+        offset=offset,
+    ).reshape((height, width))
 
 
-def _get_raw_np(exiftool: ExifTool, filepath: Path) -> np.ndarray:
-    """Gets the raw thermal data from a FLIR image.
+def _decode_raw_np(raw_image_bytes: bytes) -> np.ndarray:
+    """Decodes the raw thermal data of a FLIR image.
 
     These needed to be converted using the calibration constants into a
     useable form.
 
+    Uncompressed TIFFs are viewed directly with `np.frombuffer`, and PNGs
+    are decoded with only a single copy. Anything else is decoded by PIL.
+
     Parameters:
-        exiftool: The ExifTool process to use.
-        filepath: The path to the file to load.
+        raw_image_bytes: The RawThermalImage tag, as output by ExifTool.
 
     Returns:
         The raw data as a 2-D numpy array.
     """
-    raw_image_bytes = _get_tag_bytes(exiftool, "RawThermalImage", filepath)
-    # we can't use Image.frombytes(), since bytes is not just the pixel data
-    fp = io.BytesIO(raw_image_bytes)
-    image = Image.open(fp)
-    as_array = np.array(image)
-    if image.format == "PNG":
-        # bug in FLIR cameras -> they sometimes save in little-endian format
-        as_array = as_array.astype("uint16").newbyteorder()
-    return as_array
+    with stage("decode") as decode_stage:
+        decode_stage.add_bytes(len(raw_image_bytes))
+        if raw_image_bytes[:4] == b"\x89PNG":
+            # bug in FLIR cameras -> they sometimes save in little-endian
+            return decode_flir_png(raw_image_bytes)
+        as_array = _decode_raw_tiff(raw_image_bytes)
+        if as_array is not None:
+            return as_array
+        from PIL import Image  # type: ignore  # slow to import
+
+        # can't use Image.frombytes(), since bytes is not just the pixel data
+        return np.array(Image.open(io.BytesIO(raw_image_bytes)))
 
 
-def get_thermal(exiftool: ExifTool, filepath: Path) -> np.ndarray:
+def get_thermal(
+    exiftool: ExifTool,
+    filepath: Path,
+    engine: str = "exiftool",
+    cache: typing.Optional[ThermalCache] = None,
+) -> np.ndarray:
     """Loads the thermal image from a single FLIR image.
 
     Please use `get_thermal_batch` for efficiency if you are loading
@@ -72,13 +166,18 @@ def get_thermal(exiftool: ExifTool, filepath: Path) -> np.ndarray:
     Parameters:
         exiftool: The ExifTool process to use.
         filepath: The path to the file to load.
+        engine: The engine to use, see `ENGINES`.
+        cache: A cache to load thermal data from, and store it in.
 
     Returns:
         The thermal data in Celcius as a 2-D numpy array.
     """
     filepaths = (filepath,)
     # get first result from get_thermal_batch
-    return next(iter(get_thermal_batch(exiftool, filepaths)))
+    thermal_images = get_thermal_batch(
+        exiftool, filepaths, engine=engine, cache=cache
+    )
+    return next(iter(thermal_images))
 
 
 atmos_exif_var_tags = dict(
@@ -146,17 +245,16 @@ def convert_exif_tag_to_py(full_exif_tag: str) -> str:
     )
 
 
-def convert_image(
-    metadata: typing.Mapping[typing.Text, typing.Any], raw_np: np.ndarray
-) -> np.ndarray:
-    """Converts raw FLIR thermal data into Celcius using metadata.
+def _get_conversion_kwargs(
+    metadata: typing.Mapping[typing.Text, typing.Any]
+) -> typing.Dict[str, typing.Any]:
+    """Converts metadata into keyword arguments for `raw_temp_to_celcius`.
 
     Parameters:
         metadata: A list of metadata tags with calibration values.
-        raw_np: The raw thermal data as a 2-D numpy array.
 
     Returns:
-        The thermal data in Celcius as a 2-D numpy array.
+        The conversion parameters that were found in the metadata.
     """
     converted_metadata = {
         # convert {EXIFNAME: val} to {python_name: val}
@@ -167,27 +265,773 @@ def convert_image(
     planck_consts, atmos_consts, remainder = _extract_metadata_constants(
         converted_metadata
     )
-    return raw_temp_to_celcius(
-        raw_np, planck=planck_consts, atmos_consts=atmos_consts, **remainder
+    return dict(planck=planck_consts, atmos_consts=atmos_consts, **remainder)
+
+
+def _get_converter(raw_np: np.ndarray) -> typing.Callable[..., np.ndarray]:
+    """Picks `raw_temp_to_celcius_lut` for raw data that it can convert."""
+    if raw_np.dtype.kind == "u" and raw_np.dtype.itemsize <= 2:
+        return raw_temp_to_celcius_lut
+    return raw_temp_to_celcius
+
+
+def convert_image(
+    metadata: typing.Mapping[typing.Text, typing.Any],
+    raw_np: np.ndarray,
+    out: typing.Optional[np.ndarray] = None,
+    dtype: typing.Optional[np.dtype] = None,
+    params: typing.Optional[typing.Mapping[str, typing.Any]] = None,
+) -> np.ndarray:
+    """Converts raw FLIR thermal data into Celcius using metadata.
+
+    Unsigned 16-bit raw data is converted using a cached lookup table,
+    see `raw_temp_to_celcius_lut`.
+
+    Parameters:
+        metadata: A list of metadata tags with calibration values.
+        raw_np: The raw thermal data as a 2-D numpy array.
+        out: A 2-D array to store the output in.
+        dtype: The floating point type of the output if `out` is not given
+            (default: `np.float64`).
+        params: `raw_temp_to_celcius` parameters that override the values
+            in the metadata, e.g. `{"emissivity": 0.9}`.
+
+    Returns:
+        The thermal data in Celcius as a 2-D numpy array.
+    """
+    with stage("convert") as convert_stage:
+        kwargs = _get_conversion_kwargs(metadata)
+        if params:
+            kwargs.update(params)
+        convert = _get_converter(raw_np)
+        thermal_data = convert(raw_np, out=out, dtype=dtype, **kwargs)
+        convert_stage.add_bytes(thermal_data.nbytes)
+    return thermal_data
+
+
+_conversion_defaults = {
+    name: parameter.default
+    for name, parameter in inspect.signature(
+        raw_temp_to_celcius
+    ).parameters.items()
+    if name not in ("raw", "out", "dtype")
+}
+"""The default values of each `raw_temp_to_celcius` conversion parameter"""
+
+
+def convert_image_stack(
+    metadata_list: typing.Sequence[typing.Mapping[typing.Text, typing.Any]],
+    raw_stack: np.ndarray,
+    out: typing.Optional[np.ndarray] = None,
+    dtype: typing.Optional[np.dtype] = None,
+) -> np.ndarray:
+    """Converts a stack of same-sized raw FLIR images into Celcius.
+
+    If every image has the same calibration values, the stack is converted
+    with a single lookup table (see `raw_temp_to_celcius_lut`), otherwise
+    the per-image values are broadcast over the stack
+    (see `raw_temp_to_celcius_stack`).
+
+    Parameters:
+        metadata_list: The metadata tags with calibration values of
+            each image.
+        raw_stack: The raw thermal data as a `(N, H, W)` numpy array.
+        out: A `(N, H, W)` array to store the output in.
+        dtype: The floating point type of the output if `out` is not given
+            (default: `np.float64`).
+
+    Returns:
+        The thermal data in Celcius as a `(N, H, W)` numpy array.
+    """
+    if len(metadata_list) != len(raw_stack):
+        raise ValueError(
+            f"Got metadata for {len(metadata_list)} images, "
+            f"but {len(raw_stack)} raw images."
+        )
+    kwargs_list = []
+    for metadata in metadata_list:
+        kwargs = {**_conversion_defaults, **_get_conversion_kwargs(metadata)}
+        for optional_temp in ("atmospheric_temp", "ir_window_temp"):
+            if kwargs[optional_temp] is None:
+                kwargs[optional_temp] = kwargs["reflected_temp"]
+        kwargs_list.append(kwargs)
+
+    is_16_bit = raw_stack.dtype.kind == "u" and raw_stack.dtype.itemsize <= 2
+    if is_16_bit and kwargs_list and all(
+        kwargs == kwargs_list[0] for kwargs in kwargs_list
+    ):
+        return raw_temp_to_celcius_lut(
+            raw_stack, out=out, dtype=dtype, **kwargs_list[0]
+        )
+
+    per_image_kwargs: typing.Dict[str, np.ndarray] = {
+        name: np.array([kwargs[name] for kwargs in kwargs_list])
+        for name in _conversion_defaults
+        if name not in ("planck", "atmos_consts")
+    }
+    # each field of the constants has the value of every image
+    planck = CameraPlanckConsts(
+        *map(np.array, zip(*(kwargs["planck"] for kwargs in kwargs_list)))
+    )
+    atmos_consts = AtmosphericTransConsts(
+        *map(
+            np.array, zip(*(kwargs["atmos_consts"] for kwargs in kwargs_list))
+        )
+    )
+    return raw_temp_to_celcius_stack(
+        raw_stack,
+        planck=planck,
+        atmos_consts=atmos_consts,
+        out=out,
+        dtype=dtype,
+        **per_image_kwargs,
+    )
+
+
+def _raw_batch_params(
+    str_paths: typing.Sequence[str], extra_tags: typing.Sequence[str] = ()
+) -> typing.List[str]:
+    """Creates the ExifTool params to get the metadata and raw images.
+
+    ExifTool base64-encodes binary tags when outputting JSON with `-b`,
+    so the output can be parsed by `_parse_raw_batch`.
+    Any `extra_tags` are loaded in the same call.
+    """
+    tags = (RAW_THERMAL_IMAGE_TAG, *exif_var_tags.values(), *extra_tags)
+    return ["-b", *(f"-{tag}" for tag in tags), *str_paths]
+
+
+def _parse_raw_batch(
+    str_paths: typing.Sequence[str],
+    json_output: typing.Sequence[typing.Mapping[str, typing.Any]],
+) -> typing.List[typing.Tuple[typing.Dict[str, typing.Any], bytes]]:
+    """Parses the ExifTool JSON output for `_raw_batch_params`.
+
+    Parameters:
+        str_paths: A list of absolute paths to the loaded files.
+        json_output: The parsed JSON output of ExifTool.
+
+    Returns:
+        A list of `metadata, raw_image_bytes` for each file.
+
+    Raises:
+        ValueError if ExifTool could not read a file, or a file does not
+        have a RawThermalImage.
+    """
+    # ExifTool skips files it can't read, so match files by name
+    tags_by_path = {tags.get("SourceFile"): tags for tags in json_output}
+    results = []
+    for str_path in str_paths:
+        file_tags = tags_by_path.get(str_path)
+        if file_tags is None:
+            raise ValueError(f"ExifTool could not read {str_path}.")
+        metadata = {}
+        raw_image_bytes = None
+        for tag, value in file_tags.items():
+            if RAW_THERMAL_IMAGE_TAG in tag:  # tag might have a group prefix
+                if not str(value).startswith(_BASE64_PREFIX):
+                    raise ValueError(
+                        f"Could not load {RAW_THERMAL_IMAGE_TAG} of "
+                        f"{str_path}: {value}"
+                    )
+                _, _, encoded = value.partition(_BASE64_PREFIX)
+                raw_image_bytes = base64.b64decode(encoded)
+            else:
+                metadata[tag] = value
+        if raw_image_bytes is None:
+            raise ValueError(
+                f"{str_path} does not have a {RAW_THERMAL_IMAGE_TAG}."
+            )
+        results.append((metadata, raw_image_bytes))
+    return results
+
+
+class ExifToolTimeoutError(TimeoutError):
+    """Raised when ExifTool does not reply in time, e.g. if it hangs."""
+
+
+_EXIFTOOL_SENTINEL = b"{ready}"
+"""What ExifTool prints after each reply, when using `-stay_open`"""
+
+
+_READ_SIZE = 1024 * 1024
+"""Number of bytes to read from ExifTool at a time"""
+
+
+def _read_reply(
+    exiftool: ExifTool, timeout: typing.Optional[float] = None
+) -> bytes:
+    """Reads ExifTool's reply up to the `{ready}` sentinel.
+
+    Unlike `ExifTool.execute`, which reads 4 KiB at a time into a `bytes`
+    object (copying the whole reply on every read), this reads large blocks
+    into a `bytearray`, so reading multi-MB replies takes linear time.
+
+    Parameters:
+        exiftool: The ExifTool process to read from.
+        timeout: The maximum time to wait for the whole reply in seconds,
+            or `None` to wait forever.
+
+    Raises:
+        ExifToolTimeoutError: If ExifTool does not reply in time.
+        EOFError: If ExifTool exits.
+    """
+    fd = exiftool._process.stdout.fileno()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    output = bytearray()
+    # the sentinel can only be in the last block, so only check the tail
+    while not output[-32:].strip().endswith(_EXIFTOOL_SENTINEL):
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if (
+                remaining <= 0
+                or not select.select([fd], [], [], remaining)[0]
+            ):
+                raise ExifToolTimeoutError(
+                    f"ExifTool did not reply within {timeout} seconds."
+                )
+        block = os.read(fd, _READ_SIZE)
+        if not block:
+            raise EOFError("ExifTool exited unexpectedly.")
+        output += block
+    return bytes(output.strip()[: -len(_EXIFTOOL_SENTINEL)])
+
+
+def _execute_json(
+    exiftool: ExifTool,
+    params: typing.Sequence[str],
+    timeout: typing.Optional[float] = None,
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Runs ExifTool with the given params, parsing the JSON output.
+
+    Like `ExifTool.execute_json`, but reads large replies quickly, and can
+    time out, see `_read_reply`.
+
+    Parameters:
+        exiftool: The ExifTool process to use.
+        params: The ExifTool params, without `-j`.
+        timeout: The maximum time to wait for the whole reply in seconds,
+            or `None` to wait forever.
+
+    Returns:
+        The parsed JSON output, with an item for each file ExifTool could
+        read, or an empty list if it could not read any.
+
+    Raises:
+        ExifToolTimeoutError: If ExifTool does not reply in time.
+            ExifTool is left part-way through a reply, so it must be
+            restarted, see `_kill_exiftool`.
+        EOFError: If ExifTool exits.
+    """
+    if not exiftool.running:
+        raise ValueError("ExifTool instance not running.")
+    process = exiftool._process
+    process.stdin.write(
+        b"\n".join([b"-j", *map(os.fsencode, params), b"-execute\n"])
     )
+    process.stdin.flush()
+    encoded = _read_reply(exiftool, timeout)
+    if not encoded.strip():
+        return []  # ExifTool prints nothing if it can't read any files
+    return json.loads(encoded.decode("utf-8"))
+
+
+def _kill_exiftool(exiftool: ExifTool):
+    """Kills an ExifTool process, e.g. if it hangs or is part-way through
+    a reply. It can then be started again with `exiftool.start()`."""
+    process = exiftool._process
+    process.kill()
+    process.wait()
+    process.stdin.close()
+    process.stdout.close()
+    exiftool.running = False  # so terminate() does nothing
+
+
+def _split_by_size(
+    str_paths: typing.Sequence[str], max_bytes: int = MAX_BATCH_BYTES
+) -> typing.Iterator[typing.List[str]]:
+    """Splits files into batches with a total size of at most `max_bytes`.
+
+    Every batch has at least one file, even if it is larger than
+    `max_bytes`.
+
+    Parameters:
+        str_paths: A list of absolute paths to the files.
+        max_bytes: The maximum total size of each batch.
+
+    Yields:
+        Lists of paths, in order.
+    """
+    batch: typing.List[str] = []
+    batch_bytes = 0
+    for str_path in str_paths:
+        try:
+            size = os.path.getsize(str_path)
+        except OSError:
+            size = 0  # ExifTool reports the error instead
+        if batch and batch_bytes + size > max_bytes:
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(str_path)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def _get_raw_batch(
+    exiftool: ExifTool,
+    str_paths: typing.Sequence[str],
+    timeout: typing.Optional[float] = None,
+) -> typing.List[typing.Tuple[typing.Dict[str, typing.Any], bytes]]:
+    """Gets the metadata and raw thermal image of multiple FLIR images.
+
+    Uses a single ExifTool call for every `MAX_BATCH_BYTES` of files,
+    as ExifTool base64-encodes binary tags when outputting JSON with `-b`.
+
+    Parameters:
+        exiftool: The ExifTool process to use.
+        str_paths: A list of absolute paths to the files to load.
+        timeout: The maximum time to wait for ExifTool, see `_execute_json`.
+
+    Returns:
+        A list of `metadata, raw_image_bytes` for each file.
+
+    Raises:
+        ValueError if a file does not have a RawThermalImage.
+    """
+    raw_batch = []
+    for batch in _split_by_size(str_paths):
+        with stage("exiftool", files=len(batch)):
+            json_output = _execute_json(
+                exiftool, _raw_batch_params(batch), timeout
+            )
+        with stage("parse", files=len(batch)) as parse_stage:
+            parsed = _parse_raw_batch(batch, json_output)
+            parse_stage.add_bytes(sum(len(raw) for _, raw in parsed))
+        raw_batch.extend(parsed)
+    return raw_batch
+
+
+RawData = typing.Tuple[typing.Mapping[str, typing.Any], np.ndarray]
+"""The metadata and the raw thermal data of a FLIR image"""
+
+
+def _get_raw_chunk(
+    exiftool: ExifTool,
+    str_paths: typing.Sequence[str],
+    engine: str,
+    cache: typing.Optional[ThermalCache] = None,
+) -> typing.List[RawData]:
+    """Loads the metadata and raw thermal data of a chunk of FLIR images.
+
+    Parameters:
+        exiftool: The ExifTool process to use.
+        str_paths: A list of absolute paths to the files to load.
+        engine: The engine to use, see `ENGINES`.
+        cache: A cache to load raw data from, and store loaded raw data in.
+
+    Returns:
+        A list of `metadata, raw_np` for each file, in order.
+    """
+    raw_data: typing.List[typing.Optional[RawData]] = [None] * len(str_paths)
+    if cache is not None:
+        raw_data = [cache.get_raw(filepath, engine) for filepath in str_paths]
+        uncached_indexes = [
+            index for index, data in enumerate(raw_data) if data is None
+        ]
+        uncached_raw = _get_raw_chunk(
+            exiftool,
+            [str_paths[index] for index in uncached_indexes],
+            engine,
+        )
+        for index, (metadata, raw_np) in zip(uncached_indexes, uncached_raw):
+            cache.put_raw(str_paths[index], metadata, raw_np, engine)
+            raw_data[index] = metadata, raw_np
+        return typing.cast(typing.List[RawData], raw_data)
+
+    if engine == "native":
+        for index, filepath in enumerate(str_paths):
+            raw_data[index] = _try_load_flir_file(filepath)
+
+    fallback_indexes = [
+        index for index, data in enumerate(raw_data) if data is None
+    ]
+    if fallback_indexes:
+        fallback_raw = _get_raw_batch(
+            exiftool, [str_paths[index] for index in fallback_indexes]
+        )
+        for index, (metadata, raw_image_bytes) in zip(
+            fallback_indexes, fallback_raw
+        ):
+            raw_data[index] = metadata, _decode_raw_np(raw_image_bytes)
+    return typing.cast(typing.List[RawData], raw_data)
+
+
+def _check_batch_args(engine: str, chunk_size: int, queue_depth: int = 1):
+    """Raises a ValueError if the batch arguments are invalid."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine}, must be in {ENGINES}.")
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive, not {chunk_size}.")
+    if queue_depth < 1:
+        raise ValueError(f"queue_depth must be positive, not {queue_depth}.")
+
+
+def _try_load_flir_file(str_path: str) -> typing.Optional[RawData]:
+    """Loads a FLIR file natively, or returns `None` if it can't be parsed."""
+    try:
+        with stage("native") as native_stage:
+            raw_data = load_flir_file(str_path)
+            native_stage.add_bytes(raw_data[1].nbytes)
+            return raw_data
+    except FFFParseError:
+        return None  # load using ExifTool instead
+
+
+def _decode_and_convert(
+    metadata: typing.Mapping[str, typing.Any],
+    raw: typing.Union[bytes, np.ndarray],
+) -> np.ndarray:
+    """Decodes raw thermal data (if it is still encoded) into Celcius."""
+    if isinstance(raw, bytes):
+        raw = _decode_raw_np(raw)
+    return convert_image(metadata, raw)
+
+
+def _submit_chunk(
+    exiftool: ExifTool,
+    str_paths: typing.Sequence[str],
+    engine: str,
+    executor: concurrent.futures.Executor,
+) -> typing.List["concurrent.futures.Future[np.ndarray]"]:
+    """Loads a chunk of FLIR images, submitting their conversion.
+
+    ExifTool is only ever called from the calling thread, while native
+    parsing, decoding and conversion are done by the executor.
+
+    Returns:
+        A future of the thermal data in Celcius of each file, in order.
+    """
+    raw_data: typing.List[typing.Optional[typing.Tuple[typing.Any, ...]]]
+    raw_data = [None] * len(str_paths)
+    if engine == "native":
+        raw_data = list(executor.map(bind(_try_load_flir_file), str_paths))
+
+    fallback_indexes = [
+        index for index, data in enumerate(raw_data) if data is None
+    ]
+    if fallback_indexes:
+        fallback_raw = _get_raw_batch(
+            exiftool, [str_paths[index] for index in fallback_indexes]
+        )
+        for index, data in zip(fallback_indexes, fallback_raw):
+            raw_data[index] = data
+    decode_and_convert = bind(_decode_and_convert)
+    return [
+        executor.submit(decode_and_convert, metadata, raw)
+        for metadata, raw in typing.cast(typing.List[RawData], raw_data)
+    ]
+
+
+def _iter_thermal_pipelined(
+    exiftool: ExifTool,
+    filepaths: typing.Iterable[Path],
+    engine: str,
+    chunk_size: int,
+    executor: concurrent.futures.Executor,
+    queue_depth: int,
+) -> typing.Iterator[typing.Tuple[Path, np.ndarray]]:
+    """Loads FLIR images, overlapping ExifTool calls and conversion.
+
+    While the executor decodes and converts up to `queue_depth` chunks,
+    ExifTool loads the next chunk.
+
+    Yields:
+        `filepath, thermal_data` for each file, in order.
+    """
+    pending: typing.Deque[
+        typing.Tuple[typing.List[Path], typing.List[concurrent.futures.Future]]
+    ] = collections.deque()
+    try:
+        for chunk in chunked(filepaths, chunk_size):
+            str_paths = [get_str_filepath(filepath) for filepath in chunk]
+            pending.append(
+                (chunk, _submit_chunk(exiftool, str_paths, engine, executor))
+            )
+            while len(pending) > queue_depth:
+                chunk, futures = pending.popleft()
+                yield from zip(chunk, (future.result() for future in futures))
+        while pending:
+            chunk, futures = pending.popleft()
+            yield from zip(chunk, (future.result() for future in futures))
+    finally:
+        for _, futures in pending:
+            for future in futures:
+                future.cancel()
 
 
 def get_thermal_batch(
-    exiftool: ExifTool, filepaths: typing.Iterable[Path]
+    exiftool: ExifTool,
+    filepaths: typing.Iterable[Path],
+    engine: str = "exiftool",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: typing.Optional[ThermalCache] = None,
+    executor: typing.Optional[concurrent.futures.Executor] = None,
+    queue_depth: int = DEFAULT_QUEUE_DEPTH,
 ) -> typing.Iterable[np.ndarray]:
     """Loads the thermal images from multiple FLIR images.
 
+    If an `executor` is given, and no `cache`, loading is pipelined:
+    ExifTool loads the next chunk of files while the executor's threads
+    decode and convert the previous chunks, as PIL and NumPy release the GIL.
+
     Parameters:
         exiftool: The ExifTool process to use.
         filepaths: A list of paths to the files to load.
+        engine: The engine to use, see `ENGINES`.
+        chunk_size: The number of files to load in each ExifTool call.
+        cache: A cache to load thermal data from, and store it in.
+            Cached thermal data is returned as read-only memory-maps.
+        executor: A thread pool to decode and convert thermal data in.
+        queue_depth: The number of chunks that can be waiting for the
+            executor before ExifTool stops loading new chunks.
 
     Returns:
         A list of thermal data in Celcius as 2-D numpy arrays.
     """
+    _check_batch_args(engine, chunk_size, queue_depth)
+    if executor is not None and cache is None:
+        return [
+            thermal_image
+            for _, thermal_image in _iter_thermal_pipelined(
+                exiftool, filepaths, engine, chunk_size, executor, queue_depth
+            )
+        ]
     str_paths = [get_str_filepath(filepath) for filepath in filepaths]
-    metadata = exiftool.get_tags_batch(exif_var_tags.values(), str_paths)
-    raw_images = [_get_raw_np(exiftool, filepath) for filepath in str_paths]
+    if cache is None:
+        return [
+            convert_image(metadata, raw_np)
+            for chunk in chunked(str_paths, chunk_size)
+            for metadata, raw_np in _get_raw_chunk(exiftool, chunk, engine)
+        ]
+
+    thermal_images = [
+        cache.get_thermal(filepath, engine=engine) for filepath in str_paths
+    ]
+    uncached_indexes = [
+        index for index, image in enumerate(thermal_images) if image is None
+    ]
+    for chunk_indexes in chunked(uncached_indexes, chunk_size):
+        chunk = [str_paths[index] for index in chunk_indexes]
+        raw_chunk = _get_raw_chunk(exiftool, chunk, engine, cache)
+        for index, (metadata, raw_np) in zip(chunk_indexes, raw_chunk):
+            thermal_image = convert_image(metadata, raw_np)
+            cache.put_thermal(str_paths[index], thermal_image, engine=engine)
+            thermal_images[index] = thermal_image
+    return typing.cast(typing.List[np.ndarray], thermal_images)
+
+
+def get_thermal_stack(
+    exiftool: ExifTool,
+    filepaths: typing.Iterable[Path],
+    engine: str = "exiftool",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    out: typing.Optional[np.ndarray] = None,
+    dtype: typing.Optional[np.dtype] = None,
+    cache: typing.Optional[ThermalCache] = None,
+) -> np.ndarray:
+    """Loads the thermal images from multiple same-sized FLIR images.
+
+    Each chunk of images is converted straight into a single 3-D array
+    (see `convert_image_stack`), so no per-image arrays are allocated.
+
+    Parameters:
+        exiftool: The ExifTool process to use.
+        filepaths: A list of paths to the files to load.
+        engine: The engine to use, see `ENGINES`.
+        chunk_size: The number of files to load in each ExifTool call.
+        out: A `(N, H, W)` array to store the thermal data in.
+        dtype: The floating point type of the output if `out` is not given,
+            e.g. `np.float32` to halve memory use (default: `np.float64`).
+        cache: A cache to load raw data from, and store loaded raw data in.
+
+    Returns:
+        The thermal data in Celcius as a `(N, H, W)` numpy array.
+        This is `out`, if given.
+
+    Raises:
+        ValueError if the images have different shapes, or `out` doesn't
+        have a row for each image.
+    """
+    _check_batch_args(engine, chunk_size)
+    str_paths = [get_str_filepath(filepath) for filepath in filepaths]
+    if out is not None and len(out) != len(str_paths):
+        raise ValueError(
+            f"out has {len(out)} images, expected {len(str_paths)}."
+        )
+    if dtype is None:
+        dtype = np.float64
+    chunk_start = 0
+    for chunk in chunked(str_paths, chunk_size):
+        metadata_list, raw_list = zip(
+            *_get_raw_chunk(exiftool, chunk, engine, cache)
+        )
+        if out is None:
+            image_shape = raw_list[0].shape
+            out = np.empty((len(str_paths), *image_shape), dtype=dtype)
+        for str_path, raw_np in zip(chunk, raw_list):
+            if out.shape[1:] != raw_np.shape:
+                raise ValueError(
+                    f"{str_path} has shape {raw_np.shape}, "
+                    f"expected {out.shape[1:]}."
+                )
+        chunk_end = chunk_start + len(chunk)
+        with stage("convert", files=len(chunk)) as convert_stage:
+            convert_image_stack(
+                metadata_list,
+                np.stack(raw_list),
+                out=out[chunk_start:chunk_end],
+            )
+            convert_stage.add_bytes(out[chunk_start:chunk_end].nbytes)
+        chunk_start = chunk_end
+    if out is None:  # no files, so we don't know the image shape
+        out = np.empty((0, 0, 0), dtype=dtype)
+    return out
+
+
+def iter_thermal(
+    exiftool: ExifTool,
+    filepaths: typing.Iterable[Path],
+    engine: str = "exiftool",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: typing.Optional[ThermalCache] = None,
+    executor: typing.Optional[concurrent.futures.Executor] = None,
+    queue_depth: int = DEFAULT_QUEUE_DEPTH,
+) -> typing.Iterator[typing.Tuple[Path, np.ndarray]]:
+    """Lazily loads the thermal images from multiple FLIR images.
+
+    `filepaths` is consumed `chunk_size` files at a time, so memory use is
+    bounded by `chunk_size`, even for very large or unbounded iterables.
+
+    Parameters:
+        exiftool: The ExifTool process to use.
+        filepaths: An iterable of paths to the files to load.
+        engine: The engine to use, see `ENGINES`.
+        chunk_size: The number of files to load in each ExifTool call.
+        cache: A cache to load thermal data from, and store it in.
+        executor, queue_depth: Pipeline loading and conversion,
+            see `get_thermal_batch`. At most `queue_depth + 1` chunks are
+            in memory at a time.
+
+    Yields:
+        `filepath, thermal_data` for each file, in order, where
+        `thermal_data` is in Celcius as a 2-D numpy array.
+    """
+    if executor is not None and cache is None:
+        _check_batch_args(engine, chunk_size, queue_depth)
+        yield from _iter_thermal_pipelined(
+            exiftool, filepaths, engine, chunk_size, executor, queue_depth
+        )
+        return
+    for chunk in chunked(filepaths, chunk_size):
+        thermal_images = get_thermal_batch(
+            exiftool, chunk, engine=engine, chunk_size=chunk_size, cache=cache
+        )
+        yield from zip(chunk, thermal_images)
+
+
+Buffer = typing.Union[bytes, bytearray, memoryview, typing.BinaryIO]
+"""The contents of a FLIR image, or a binary file object to read them from"""
+
+
+def _read_buffer(buffer: Buffer) -> bytes:
+    """Gets the contents of a buffer, or reads a binary file object."""
+    if hasattr(buffer, "read"):
+        return typing.cast(typing.BinaryIO, buffer).read()
+    return bytes(buffer)  # type: ignore
+
+
+def _get_raw_chunk_from_buffers(
+    exiftool: ExifTool, datas: typing.Sequence[bytes]
+) -> typing.List[RawData]:
+    """Loads the metadata and raw thermal data of a chunk of FLIR images.
+
+    Images are parsed natively, and only those that can not be are written
+    to a temporary directory, to be loaded using ExifTool.
+
+    Parameters:
+        exiftool: The ExifTool process to use.
+        datas: The contents of the FLIR images.
+
+    Returns:
+        A list of `metadata, raw_np` for each image, in order.
+    """
+    raw_data: typing.List[typing.Optional[RawData]] = []
+    for data in datas:
+        try:
+            with stage("native") as native_stage:
+                raw_data.append(read_flir_data(data))
+                native_stage.add_bytes(raw_data[-1][1].nbytes)
+        except FFFParseError:
+            raw_data.append(None)  # load using ExifTool instead
+
+    fallback_indexes = [
+        index for index, data in enumerate(raw_data) if data is None
+    ]
+    if fallback_indexes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_paths = []
+            for index in fallback_indexes:
+                tmp_path = os.path.join(tmp_dir, f"{index}.jpg")
+                with open(tmp_path, "wb") as tmp_file:
+                    tmp_file.write(datas[index])
+                tmp_paths.append(tmp_path)
+            fallback_raw = _get_raw_batch(exiftool, tmp_paths)
+        for index, (metadata, raw_image_bytes) in zip(
+            fallback_indexes, fallback_raw
+        ):
+            raw_data[index] = metadata, _decode_raw_np(raw_image_bytes)
+    return typing.cast(typing.List[RawData], raw_data)
+
+
+def get_thermal_batch_from_buffers(
+    exiftool: ExifTool,
+    buffers: typing.Iterable[Buffer],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> typing.List[np.ndarray]:
+    """Loads the thermal images from multiple in-memory FLIR images.
+
+    Images are parsed natively (see `flirextractor.fff`), so they are
+    never written to disk, unless they can only be loaded with ExifTool.
+
+    Parameters:
+        exiftool: The ExifTool process to use for any fallbacks.
+        buffers: The contents of the FLIR images, e.g. `bytes`,
+            `memoryview`, or binary file objects opened with `"rb"`.
+        chunk_size: The number of images to load at a time.
+
+    Returns:
+        A list of thermal data in Celcius as 2-D numpy arrays.
+    """
+    _check_batch_args("native", chunk_size)
     return [
-        convert_image(image_metadata, raw_image)
-        for image_metadata, raw_image in zip(metadata, raw_images)
+        convert_image(metadata, raw_np)
+        for chunk in chunked(buffers, chunk_size)
+        for metadata, raw_np in _get_raw_chunk_from_buffers(
+            exiftool, [_read_buffer(buffer) for buffer in chunk]
+        )
     ]
+
+
+def get_thermal_from_bytes(exiftool: ExifTool, buffer: Buffer) -> np.ndarray:
+    """Loads the thermal image from a single in-memory FLIR image.
+
+    Parameters:
+        exiftool: The ExifTool process to use for any fallbacks.
+        buffer: The contents of the FLIR image, or a binary file object.
+
+    Returns:
+        The thermal data in Celcius as a 2-D numpy array.
+    """
+    return get_thermal_batch_from_buffers(exiftool, (buffer,))[0]
@@ -0,0 +1,340 @@
+"""Indexes the calibration metadata of FLIR files in an SQLite database.
+
+The index can be incrementally updated, as unchanged files are skipped,
+and can be used to group files by their calibration constants.
+"""
+import os
+import sqlite3
+import typing
+
+from .metadata import ThermalMetadata
+from .pathutils import DEFAULT_PATTERNS, Path, get_str_filepath, iter_inputs
+from .raw_temp_to_celcius import AtmosphericTransConsts, CameraPlanckConsts
+from .utils import chunked
+
+if typing.TYPE_CHECKING:
+    from .flirextractor import FlirExtractor  # noqa: F401
+
+_scalar_param_columns = (
+    "emissivity",
+    "subject_distance",
+    "reflected_temp",
+    "atmospheric_temp",
+    "ir_window_temp",
+    "ir_window_transmission",
+    "humidity",
+    "peak_spectral_sensitivity",
+)
+_planck_columns = tuple(f"planck_{f}" for f in CameraPlanckConsts._fields)
+_atmos_columns = tuple(f"atmos_{f}" for f in AtmosphericTransConsts._fields)
+CALIBRATION_COLUMNS = _planck_columns + _atmos_columns
+"""The columns with the camera's calibration constants"""
+PARAM_COLUMNS = _scalar_param_columns + CALIBRATION_COLUMNS
+"""The columns with `raw_temp_to_celcius` parameters"""
+COLUMNS = ("path", "mtime_ns", "size", "height", "width") + PARAM_COLUMNS
+"""Every column in the index"""
+
+
+class IndexUpdate(typing.NamedTuple):
+    """The result of `ThermalIndex.update`.
+
+    Attributes:
+        updated: The number of files that were (re)indexed.
+        errors: The error of each file that could not be indexed, by path.
+    """
+
+    updated: int
+    errors: typing.Dict[str, Exception]
+
+
+def _metadata_to_row(
+    metadata: ThermalMetadata,
+) -> typing.Dict[str, typing.Any]:
+    """Flattens metadata into `PARAM_COLUMNS`, with `None` if missing."""
+    row: typing.Dict[str, typing.Any] = {
+        column: None for column in PARAM_COLUMNS
+    }
+    for name, value in metadata.params.items():
+        if name == "planck":
+            row.update(zip(_planck_columns, value))
+        elif name == "atmos_consts":
+            row.update(zip(_atmos_columns, value))
+        else:
+            row[name] = value
+    height, width = metadata.shape
+    return dict(row, height=height, width=width)
+
+
+def _load_metadata(
+    extractor: "FlirExtractor", str_paths: typing.Sequence[str]
+) -> typing.List[typing.Union[ThermalMetadata, Exception]]:
+    """Loads the metadata of each file, or the error raised loading it.
+
+    If the whole batch fails, each file is loaded on its own, so that only
+    the bad files are lost, like `iter_thermal_results`.
+    """
+    try:
+        return list(extractor.get_metadata_batch(str_paths))
+    except Exception as e:
+        if len(str_paths) == 1:
+            return [e]
+    loaded: typing.List[typing.Union[ThermalMetadata, Exception]] = []
+    for str_path in str_paths:
+        try:
+            loaded.append(extractor.get_metadata(str_path))
+        except Exception as e:
+            loaded.append(e)
+    return loaded
+
+
+def _row_to_metadata(row: sqlite3.Row) -> ThermalMetadata:
+    """Converts an index row back into `ThermalMetadata`."""
+    params: typing.Dict[str, typing.Any] = {
+        column: row[column]
+        for column in _scalar_param_columns
+        if row[column] is not None
+    }
+    if all(row[column] is not None for column in _planck_columns):
+        params["planck"] = CameraPlanckConsts(
+            *(row[column] for column in _planck_columns)
+        )
+    if all(row[column] is not None for column in _atmos_columns):
+        params["atmos_consts"] = AtmosphericTransConsts(
+            *(row[column] for column in _atmos_columns)
+        )
+    return ThermalMetadata(shape=(row["height"], row["width"]), params=params)
+
+
+class ThermalIndex:
+    """An SQLite index of the calibration metadata of FLIR files.
+
+    Attributes:
+        db_path: The path to the SQLite database.
+
+    Example:
+        with FlirExtractor() as extractor, ThermalIndex("index.db") as index:
+            index.update(extractor, ["archive"])
+            for calibration, paths in index.group_by().items():
+                thermal_d_list = extractor.get_thermal_batch(paths)
+    """
+
+    db_path: Path
+    _connection: typing.Optional[sqlite3.Connection]
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        _connection = self._connection
+        if _connection is None:
+            raise AttributeError(
+                "ThermalIndex was not opened. "
+                "Use ThermalIndex in a context manager, e.g. \n"
+                "with ThermalIndex('index.db') as index:\n"
+                "    index.do_magic()"
+            )
+        return _connection
+
+    def open(self):
+        """Opens the SQLite database, creating it if it does not exist.
+
+        Not recommended, use `with:` context manager instead.
+        """
+        if self._connection is not None:
+            raise Exception("ThermalIndex was already opened.")
+        self._connection = sqlite3.connect(str(self.db_path))
+        self._connection.row_factory = sqlite3.Row
+        column_defs = ", ".join(
+            ["path TEXT PRIMARY KEY", "mtime_ns INTEGER", "size INTEGER"]
+            + ["height INTEGER", "width INTEGER"]
+            + [f"{column} REAL" for column in PARAM_COLUMNS]
+        )
+        with self._connection:
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS images ({column_defs})"
+            )
+
+    def close(self):
+        """Closes the SQLite database.
+
+        Not recommended, use `with:` context manager instead.
+        """
+        if self._connection is None:
+            return  # already closed, do nothing
+        self._connection.close()
+        self._connection = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        query = "SELECT COUNT(*) FROM images"
+        return self.connection.execute(query).fetchone()[0]
+
+    def _get_row(self, str_path: str) -> typing.Optional[sqlite3.Row]:
+        query = "SELECT * FROM images WHERE path = ?"
+        return self.connection.execute(query, (str_path,)).fetchone()
+
+    def is_current(self, filepath: Path) -> bool:
+        """Checks whether a file is indexed, and unmodified since then.
+
+        Parameters:
+            filepath: The path to the FLIR file.
+        """
+        str_path = get_str_filepath(filepath)
+        row = self._get_row(str_path)
+        if row is None:
+            return False
+        stat = os.stat(str_path)
+        return (row["mtime_ns"], row["size"]) == (
+            stat.st_mtime_ns,
+            stat.st_size,
+        )
+
+    def get(self, filepath: Path) -> typing.Optional[ThermalMetadata]:
+        """Gets the indexed metadata of a file.
+
+        Parameters:
+            filepath: The path to the FLIR file.
+
+        Returns:
+            The indexed metadata, or `None` if the file is not indexed.
+        """
+        row = self._get_row(get_str_filepath(filepath))
+        return None if row is None else _row_to_metadata(row)
+
+    def update(
+        self,
+        extractor: "FlirExtractor",
+        inputs: typing.Iterable[Path],
+        patterns: typing.Sequence[str] = DEFAULT_PATTERNS,
+    ) -> IndexUpdate:
+        """Indexes any new or modified files.
+
+        Progress is committed after every chunk of files, so an interrupted
+        update does not lose any work. Files that can not be loaded, e.g.
+        corrupt or non-radiometric files, are skipped and reported, so that
+        one bad file does not stop indexing an archive.
+
+        Parameters:
+            extractor: An open extractor, used to load the metadata.
+            inputs: The FLIR files, directories (walked recursively for
+                files that match `patterns`), or glob patterns
+                (e.g. `"archive/**/IR_*.jpg"`), like `flirextractor convert`.
+            patterns: Filename patterns to look for in directories.
+
+        Returns:
+            An `IndexUpdate`, with the number of files that were (re)indexed,
+            and the error of each file that was skipped.
+
+        Raises:
+            FileNotFoundError if an input does not exist.
+        """
+        updated = 0
+        errors: typing.Dict[str, Exception] = {}
+        for chunk in chunked(
+            self._iter_stale(inputs, patterns, errors), extractor.chunk_size
+        ):
+            # stat before loading, so that a file modified while it is
+            # loaded is indexed as stale, not with its new mtime
+            stats: typing.Dict[str, os.stat_result] = {}
+            for str_path in chunk:
+                try:
+                    stats[str_path] = os.stat(str_path)
+                except OSError as e:
+                    errors[str_path] = e
+            str_paths = list(stats)
+            rows = []
+            for str_path, metadata in zip(
+                str_paths, _load_metadata(extractor, str_paths)
+            ):
+                if isinstance(metadata, Exception):
+                    errors[str_path] = metadata
+                    continue
+                stat = stats[str_path]
+                row = _metadata_to_row(metadata)
+                row.update(
+                    path=str_path, mtime_ns=stat.st_mtime_ns, size=stat.st_size
+                )
+                rows.append(tuple(row[column] for column in COLUMNS))
+            placeholders = ", ".join("?" for _ in COLUMNS)
+            with self.connection:
+                self.connection.executemany(
+                    f"INSERT OR REPLACE INTO images ({', '.join(COLUMNS)}) "
+                    f"VALUES ({placeholders})",
+                    rows,
+                )
+            updated += len(rows)
+        return IndexUpdate(updated, errors)
+
+    def _iter_stale(
+        self,
+        inputs: typing.Iterable[Path],
+        patterns: typing.Sequence[str],
+        errors: typing.Dict[str, Exception],
+    ) -> typing.Iterator[str]:
+        """Finds the files in `inputs` that are new or modified."""
+        for input_path in inputs:
+            str_input = os.fspath(input_path)
+            if os.path.isfile(str_input):
+                # even if its name looks like a glob pattern, e.g. `[1].jpg`
+                filepaths: typing.Iterable[Path] = (str_input,)
+            else:
+                filepaths = (
+                    filepath
+                    for filepath, _ in iter_inputs((str_input,), patterns)
+                )
+            for filepath in filepaths:
+                try:
+                    str_path = get_str_filepath(filepath)
+                    current = self.is_current(str_path)
+                except OSError as e:
+                    errors[os.fspath(filepath)] = e
+                    continue
+                if not current:
+                    yield str_path
+
+    def prune(self) -> int:
+        """Removes any indexed files that no longer exist.
+
+        Returns:
+            The number of files that were removed from the index.
+        """
+        paths = [
+            row["path"]
+            for row in self.connection.execute("SELECT path FROM images")
+        ]
+        missing = [(path,) for path in paths if not os.path.isfile(path)]
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM images WHERE path = ?", missing
+            )
+        return len(missing)
+
+    def group_by(
+        self, columns: typing.Sequence[str] = CALIBRATION_COLUMNS
+    ) -> typing.Dict[typing.Tuple, typing.List[str]]:
+        """Groups indexed files that share the same values.
+
+        Parameters:
+            columns: The columns to group by, see `COLUMNS`
+                (default: the camera calibration constants).
+
+        Returns:
+            A map of the column values to the paths of the files with them.
+        """
+        unknown_columns = set(columns) - set(COLUMNS)
+        if unknown_columns:
+            raise ValueError(f"Unknown columns {unknown_columns}.")
+        query = f"SELECT path, {', '.join(columns)} FROM images ORDER BY path"
+        groups: typing.Dict[typing.Tuple, typing.List[str]] = {}
+        for row in self.connection.execute(query):
+            key = tuple(row[column] for column in columns)
+            groups.setdefault(key, []).append(row["path"])
+        return groups
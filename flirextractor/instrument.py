@@ -0,0 +1,303 @@
+"""Opt-in timing instrumentation of each stage of loading FLIR images.
+
+Stages are timed only while an `Instrumentation` is active in the current
+thread, e.g. while a `FlirExtractor(instrumentation=...)` method runs.
+Otherwise, each stage only costs a thread-local lookup.
+
+Stages:
+    - `exiftool`: Waiting for ExifTool to load a chunk of files.
+    - `parse`: Parsing ExifTool's JSON output, e.g. base64-decoding the
+      RawThermalImage tags. `bytes` is the size of the decoded tags.
+    - `native`: Parsing FLIR files in Python, see `flirextractor.fff`,
+      including decoding the raw thermal data. `bytes` is the size of the
+      raw thermal data.
+    - `decode`: Decoding RawThermalImage tags (TIFF/PNG) into raw thermal
+      data. `bytes` is the size of the encoded tags.
+    - `convert`: Converting raw thermal data into Celcius, including
+      reading the calibration metadata. `bytes` is the size of the output.
+    - `visual`: Decoding embedded visual images, see `flirextractor.visual`.
+      `bytes` is the size of the encoded images.
+    - `render`: Rendering false-colour thumbnails, see
+      `flirextractor.render`. `bytes` is the size of the RGB images.
+
+Example:
+    instrumentation = Instrumentation(callbacks=[print])
+    with FlirExtractor(instrumentation=instrumentation) as extractor:
+        extractor.get_thermal_batch(filepaths)
+    for stage, stats in extractor.stats().items():
+        print(stage, stats.files / stats.seconds, "files/s")
+"""
+import bisect
+import functools
+import threading
+import time
+import typing
+
+LATENCY_BUCKETS = tuple(10 ** (exponent / 2) for exponent in range(-10, 5))
+"""Upper bounds in seconds of the per-file latency histogram buckets,
+from 10 µs to 100 s. The last histogram bucket counts anything slower."""
+
+T = typing.TypeVar("T")
+
+
+class StageEvent(typing.NamedTuple):
+    """A single timed run of a stage, as passed to callbacks.
+
+    Attributes:
+        stage: The name of the stage, e.g. `"exiftool"`.
+        seconds: The wall time of the stage.
+        bytes: The number of bytes processed by the stage.
+        files: The number of files processed by the stage.
+    """
+
+    stage: str
+    seconds: float
+    bytes: int
+    files: int
+
+
+class StageStats(typing.NamedTuple):
+    """The accumulated statistics of a stage.
+
+    Attributes:
+        calls: The number of times the stage ran.
+        files: The number of files processed.
+        seconds: The total wall time. Stages that run in multiple threads
+            at once can add up to more than the elapsed time.
+        bytes: The number of bytes processed, see `flirextractor.instrument`.
+        latency_histogram: The number of files whose per-file latency was
+            below each of `LATENCY_BUCKETS`, with an extra final bucket.
+            Batch stages count `seconds / files` for each of their files.
+    """
+
+    calls: int
+    files: int
+    seconds: float
+    bytes: int
+    latency_histogram: typing.Tuple[int, ...]
+
+
+Callback = typing.Callable[[StageEvent], typing.Any]
+"""Called with each `StageEvent`, after the stage finishes"""
+Tracer = typing.Callable[[str], typing.ContextManager]
+"""Called with the name of a stage, returning a context manager that is
+entered while the stage runs, e.g. to create an OpenTelemetry span"""
+
+
+class Instrumentation:
+    """Accumulates per-stage counters, wall times and latency histograms.
+
+    Thread-safe, so it can be shared between threads and extractors,
+    e.g. every worker of a `FlirExtractorPool`.
+
+    Attributes:
+        callbacks: Called with a `StageEvent` after each stage runs,
+            e.g. to export timings to a metrics system.
+        tracer: Called with the stage name before each stage runs, and the
+            returned context manager is entered while the stage runs.
+    """
+
+    callbacks: typing.List[Callback]
+    tracer: typing.Optional[Tracer]
+    _stages: typing.Dict[str, typing.List[typing.Any]]
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        callbacks: typing.Iterable[Callback] = (),
+        tracer: typing.Optional[Tracer] = None,
+    ):
+        self.callbacks = list(callbacks)
+        self.tracer = tracer
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, event: StageEvent):
+        """Records a timed run of a stage, and calls every callback."""
+        files = event.files
+        latency = event.seconds / files if files else event.seconds
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, latency)
+        with self._lock:
+            stage = self._stages.get(event.stage)
+            if stage is None:
+                stage = [0, 0, 0.0, 0, [0] * (len(LATENCY_BUCKETS) + 1)]
+                self._stages[event.stage] = stage
+            stage[0] += 1
+            stage[1] += files
+            stage[2] += event.seconds
+            stage[3] += event.bytes
+            stage[4][bucket] += max(files, 1)
+        for callback in self.callbacks:
+            callback(event)
+
+    def stats(self) -> typing.Dict[str, StageStats]:
+        """Gets a snapshot of the `StageStats` of each stage that ran."""
+        with self._lock:
+            return {
+                name: StageStats(
+                    calls, files, seconds, nbytes, tuple(latency_histogram)
+                )
+                for name, (
+                    calls,
+                    files,
+                    seconds,
+                    nbytes,
+                    latency_histogram,
+                ) in self._stages.items()
+            }
+
+    def reset(self):
+        """Clears every accumulated statistic."""
+        with self._lock:
+            self._stages = {}
+
+    def activate(self) -> "_Activation":
+        """Activates this instrumentation in the current thread.
+
+        Use it as a context manager, e.g. `with instrumentation.activate():`
+        """
+        return _Activation(self)
+
+
+_local = threading.local()
+
+
+def current() -> typing.Optional[Instrumentation]:
+    """Gets the active `Instrumentation` of the current thread, if any."""
+    return getattr(_local, "instrumentation", None)
+
+
+class _Activation:
+    """Sets the active `Instrumentation` of the current thread."""
+
+    def __init__(self, instrumentation: typing.Optional[Instrumentation]):
+        self.instrumentation = instrumentation
+
+    def __enter__(self):
+        self.previous = current()
+        _local.instrumentation = self.instrumentation
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        _local.instrumentation = self.previous
+
+
+class _Stage:
+    """Times a stage, see `stage`."""
+
+    _trace: typing.Optional[typing.ContextManager]
+
+    def __init__(
+        self, instrumentation: Instrumentation, name: str, files: int
+    ):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.files = files
+        self.bytes = 0
+        self._trace = None
+
+    def add_bytes(self, nbytes: int):
+        """Adds to the number of bytes processed by this stage."""
+        self.bytes += nbytes
+
+    def __enter__(self) -> "_Stage":
+        tracer = self.instrumentation.tracer
+        if tracer is not None:
+            self._trace = tracer(self.name)
+            self._trace.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        seconds = time.perf_counter() - self._start
+        if self._trace is not None:
+            self._trace.__exit__(exception_type, exception_value, traceback)
+        if exception_type is None:
+            self.instrumentation.record(
+                StageEvent(self.name, seconds, self.bytes, self.files)
+            )
+
+
+class _NullStage:
+    """A stage that does nothing, used when instrumentation is disabled."""
+
+    def add_bytes(self, nbytes: int):
+        pass
+
+    def __enter__(self) -> "_NullStage":
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(
+    name: str, files: int = 1
+) -> typing.Union[_Stage, _NullStage]:
+    """Times a stage, if an `Instrumentation` is active in this thread.
+
+    Parameters:
+        name: The name of the stage.
+        files: The number of files the stage processes.
+
+    Returns:
+        A context manager, whose `add_bytes()` method records the number of
+        bytes processed.
+    """
+    instrumentation = getattr(_local, "instrumentation", None)
+    if instrumentation is None:
+        return _NULL_STAGE
+    return _Stage(instrumentation, name, files)
+
+
+def bind(function: typing.Callable[..., T]) -> typing.Callable[..., T]:
+    """Binds the current thread's `Instrumentation` to a function.
+
+    Use this to keep timing stages of work submitted to other threads.
+
+    Parameters:
+        function: The function to run in another thread.
+
+    Returns:
+        `function`, or if an `Instrumentation` is active, a wrapper that
+        activates it while `function` runs.
+    """
+    instrumentation = current()
+    if instrumentation is None:
+        return function
+
+    @functools.wraps(function)
+    def bound(*args, **kwargs):
+        with _Activation(instrumentation):
+            return function(*args, **kwargs)
+
+    return bound
+
+
+def iterate(
+    instrumentation: typing.Optional[Instrumentation],
+    iterator: typing.Iterator[T],
+) -> typing.Iterator[T]:
+    """Activates an `Instrumentation` whenever an iterator is resumed.
+
+    Unlike a `with` block around a generator, this doesn't leak the
+    activation into the caller's code between items.
+    """
+    if instrumentation is None:
+        yield from iterator
+        return
+    try:
+        while True:
+            with _Activation(instrumentation):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            with _Activation(instrumentation):
+                close()
@@ -0,0 +1,145 @@
+"""Loads only the calibration metadata of FLIR images.
+
+Much faster than loading the thermal data, as the raw thermal image is
+never decoded.
+"""
+import typing
+
+from exiftool import ExifTool  # type: ignore
+
+from .fff import FFFParseError, load_flir_metadata
+from .get_thermal import (
+    DEFAULT_CHUNK_SIZE,
+    _check_batch_args,
+    _execute_json,
+    _get_conversion_kwargs,
+    exif_var_tags,
+)
+from .pathutils import Path, get_str_filepath
+from .utils import chunked
+
+_shape_exif_tags = ("RawThermalImageHeight", "RawThermalImageWidth")
+"""The EXIF metadata tag names of the raw thermal image shape"""
+
+
+class ThermalMetadata(typing.NamedTuple):
+    """The calibration metadata of a FLIR image.
+
+    Attributes:
+        shape: The `(height, width)` of the thermal data.
+        params: The `raw_temp_to_celcius` parameters found in the metadata,
+            e.g. `planck`, `atmos_consts` and `emissivity`.
+    """
+
+    shape: typing.Tuple[int, int]
+    params: typing.Dict[str, typing.Any]
+
+
+def _parse_metadata_batch(
+    str_paths: typing.Sequence[str],
+    json_output: typing.Sequence[typing.Mapping[str, typing.Any]],
+) -> typing.List[ThermalMetadata]:
+    """Parses the ExifTool JSON output of the calibration metadata.
+
+    Parameters:
+        str_paths: A list of absolute paths to the loaded files.
+        json_output: The parsed JSON output of ExifTool.
+
+    Returns:
+        The calibration metadata of each file, in order.
+
+    Raises:
+        ValueError if ExifTool could not read a file, or a file does not
+        have a shape.
+    """
+    # ExifTool skips files it can't read, so match files by name
+    tags_by_path = {tags.get("SourceFile"): tags for tags in json_output}
+    all_metadata = []
+    for str_path in str_paths:
+        file_tags = tags_by_path.get(str_path)
+        if file_tags is None:
+            raise ValueError(f"ExifTool could not read {str_path}.")
+        metadata = dict(file_tags)
+        shape = []
+        for shape_tag in _shape_exif_tags:
+            # tags might have a group prefix
+            matching = [tag for tag in metadata if tag.endswith(shape_tag)]
+            if not matching:
+                raise ValueError(f"{str_path} does not have a {shape_tag}.")
+            shape.append(int(metadata.pop(matching[0])))
+        all_metadata.append(
+            ThermalMetadata(
+                shape=(shape[0], shape[1]),
+                params=_get_conversion_kwargs(metadata),
+            )
+        )
+    return all_metadata
+
+
+def _get_metadata_chunk_exiftool(
+    exiftool: ExifTool, str_paths: typing.Sequence[str]
+) -> typing.List[ThermalMetadata]:
+    """Loads the calibration metadata of multiple FLIR images with ExifTool.
+
+    Parameters:
+        exiftool: The ExifTool process to use.
+        str_paths: A list of absolute paths to the files to load.
+
+    Returns:
+        The calibration metadata of each file, in order.
+
+    Raises:
+        ValueError if ExifTool could not read a file, or a file does not
+        have a shape.
+    """
+    if not str_paths:
+        return []
+    tags = (*exif_var_tags.values(), *_shape_exif_tags)
+    json_output = _execute_json(
+        exiftool, [*(f"-{tag}" for tag in tags), *str_paths]
+    )
+    return _parse_metadata_batch(str_paths, json_output)
+
+
+def get_metadata_batch(
+    exiftool: ExifTool,
+    filepaths: typing.Iterable[Path],
+    engine: str = "exiftool",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> typing.List[ThermalMetadata]:
+    """Loads the calibration metadata of multiple FLIR images.
+
+    Parameters:
+        exiftool: The ExifTool process to use.
+        filepaths: A list of paths to the files to load.
+        engine: The engine to use, see `ENGINES`.
+        chunk_size: The number of files to load in each ExifTool call.
+
+    Returns:
+        The calibration metadata of each file, in order.
+    """
+    _check_batch_args(engine, chunk_size)
+    str_paths = [get_str_filepath(filepath) for filepath in filepaths]
+    all_metadata: typing.List[typing.Optional[ThermalMetadata]]
+    all_metadata = [None] * len(str_paths)
+    if engine == "native":
+        for index, str_path in enumerate(str_paths):
+            try:
+                fff_metadata = load_flir_metadata(str_path)
+            except FFFParseError:
+                continue  # load using ExifTool instead
+            all_metadata[index] = ThermalMetadata(
+                shape=fff_metadata.shape,
+                params=_get_conversion_kwargs(fff_metadata.metadata),
+            )
+
+    fallback_indexes = [
+        index for index, data in enumerate(all_metadata) if data is None
+    ]
+    for chunk_indexes in chunked(fallback_indexes, chunk_size):
+        chunk = [str_paths[index] for index in chunk_indexes]
+        for index, metadata in zip(
+            chunk_indexes, _get_metadata_chunk_exiftool(exiftool, chunk)
+        ):
+            all_metadata[index] = metadata
+    return typing.cast(typing.List[ThermalMetadata], all_metadata)
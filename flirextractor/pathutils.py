@@ -1,3 +1,4 @@
+import glob
 import pathlib
 import typing
 
@@ -6,6 +7,9 @@ if typing.TYPE_CHECKING:
 
 Path = typing.Union["os.PathLike", typing.Text]
 
+DEFAULT_PATTERNS = ("*.jpg", "*.jpeg", "*.JPG", "*.JPEG")
+"""Default filename patterns of FLIR images when walking directories"""
+
 
 def get_str_filepath(filepath: Path) -> str:
     """Returns the input filepath as a string.
@@ -20,3 +24,47 @@ def get_str_filepath(filepath: Path) -> str:
     if abs_path.is_dir():
         raise IsADirectoryError(f"Give filepath '{path}' is a directory.")
     return str(abs_path)
+
+
+def iter_inputs(
+    inputs: typing.Iterable[str], patterns: typing.Sequence[str]
+) -> typing.Iterator[typing.Tuple[pathlib.Path, pathlib.PurePath]]:
+    """Finds FLIR files in files, directories or glob patterns.
+
+    Parameters:
+        inputs: Files, directories (walked recursively for files that match
+            `patterns`), or glob patterns (e.g. `"archive/**/IR_*.jpg"`).
+        patterns: Filename patterns to look for in directories.
+
+    Yields:
+        `filepath, relative_path` for each file, where `relative_path` is
+        the path relative to the input directory, or glob base directory.
+    """
+    for input_path in inputs:
+        path = pathlib.Path(input_path)
+        if path.is_dir():
+            filepaths = sorted(
+                {
+                    filepath
+                    for pattern in patterns
+                    for filepath in path.rglob(pattern)
+                    if filepath.is_file()
+                }
+            )
+            for filepath in filepaths:
+                yield filepath, filepath.relative_to(path)
+        elif glob.has_magic(input_path):
+            base_parts = []
+            for part in path.parts:
+                if glob.has_magic(part):
+                    break
+                base_parts.append(part)
+            base = pathlib.Path(*base_parts)
+            for filename in sorted(glob.iglob(input_path, recursive=True)):
+                filepath = pathlib.Path(filename)
+                if filepath.is_file():
+                    yield filepath, filepath.relative_to(base)
+        elif path.is_file():
+            yield path, pathlib.PurePath(path.name)
+        else:
+            raise FileNotFoundError(f"No such file or directory: {path}")
@@ -0,0 +1,325 @@
+"""Extracts thermal data from FLIR images using multiple ExifTool processes.
+"""
+import concurrent.futures
+import itertools
+import os
+import queue
+import typing
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from exiftool import executable as exiftool_default_exe  # type: ignore
+
+from .aggregate import ThermalAggregator
+from .flirextractor import (
+    EXIFTOOL_STARTS,
+    FlirExtractor,
+    _check_aggregate_args,
+)
+from .get_thermal import DEFAULT_CHUNK_SIZE, ENGINES
+from .instrument import Instrumentation, StageStats
+from .pathutils import Path
+from .results import DEFAULT_RETRIES, DEFAULT_TIMEOUT, ThermalResult
+from .utils import chunked
+
+if typing.TYPE_CHECKING:
+    import numpy as np  # type: ignore
+
+
+class FlirExtractorPool:
+    """Extracts thermal data from FLIR images using a pool of ExifTools.
+
+    Each worker thread owns a `FlirExtractor`, and so an ExifTool process.
+    Batches are split into chunks of `chunk_size` files, which are loaded
+    and converted by the workers in parallel.
+
+    Attributes:
+        exiftoolpath: The path to the ExifTool executable.
+        workers: The number of workers/ExifTool processes to use.
+        engine: How to load FLIR images, see `FlirExtractor`.
+        chunk_size: The number of files each worker loads at a time.
+        cache_dir, cache_max_size: An on-disk cache shared by all workers,
+            see `FlirExtractor`.
+        instrumentation: Times each stage of loading files in every worker,
+            see `FlirExtractor`.
+        exiftool_start: When each worker starts its ExifTool process,
+            see `EXIFTOOL_STARTS`. With `background`, every process starts
+            up at the same time.
+
+    Example:
+        with FlirExtractorPool(workers=4) as extractor:
+            thermal_d_list = extractor.get_thermal_batch(
+                ["./FLIR1.jpg", "./FLIR2.jpg"]
+            )
+    """
+
+    exiftoolpath: Optional[Path]
+    workers: int
+    engine: str
+    chunk_size: int
+    cache_dir: Optional[Path]
+    cache_max_size: Optional[int]
+    instrumentation: Optional[Instrumentation]
+    exiftool_start: str
+    _extractors: Optional[List[FlirExtractor]]
+    _idle_extractors: "queue.Queue[FlirExtractor]"
+    _executor: Optional[concurrent.futures.ThreadPoolExecutor]
+
+    def __init__(
+        self,
+        exiftoolpath: Path = exiftool_default_exe,
+        workers: Optional[int] = None,
+        engine: str = "exiftool",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        cache_dir: Optional[Path] = None,
+        cache_max_size: Optional[int] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        exiftool_start: str = "lazy",
+    ):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError(f"workers must be positive, not {workers}.")
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine}, must be in {ENGINES}.")
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be positive, not {chunk_size}.")
+        if exiftool_start not in EXIFTOOL_STARTS:
+            raise ValueError(
+                f"Unknown exiftool_start {exiftool_start}, "
+                f"must be in {EXIFTOOL_STARTS}."
+            )
+        self.exiftoolpath = exiftoolpath
+        self.workers = workers
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.cache_dir = cache_dir
+        self.cache_max_size = cache_max_size
+        self.instrumentation = instrumentation
+        self.exiftool_start = exiftool_start
+        self._extractors = None
+        self._idle_extractors = queue.Queue()
+        self._executor = None
+
+    @property
+    def executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        _executor = self._executor
+        if _executor is None:
+            raise AttributeError(
+                "FlirExtractorPool was not initialized. "
+                "Use FlirExtractorPool in a context manager, e.g. \n"
+                "with FlirExtractorPool() as e:\n"
+                "    e.do_magic()"
+            )
+        return _executor
+
+    def open(self):
+        """Creates the ExifTool processes.
+
+        Not recommended, use `with:` context manager instead.
+        """
+        if self._extractors is not None:
+            raise Exception("FlirExtractorPool was already initialized.")
+        self._extractors = []
+        try:
+            for _ in range(self.workers):
+                extractor = FlirExtractor(
+                    self.exiftoolpath,
+                    engine=self.engine,
+                    chunk_size=self.chunk_size,
+                    cache_dir=self.cache_dir,
+                    cache_max_size=self.cache_max_size,
+                    instrumentation=self.instrumentation,
+                    exiftool_start=self.exiftool_start,
+                    # workers already overlap ExifTool calls and conversion
+                    pipeline_workers=0,
+                )
+                extractor.open()
+                self._extractors.append(extractor)
+                self._idle_extractors.put(extractor)
+        except BaseException:
+            self.close()
+            raise
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers
+        )
+
+    def close(self):
+        """Closes the ExifTool processes.
+
+        Waits for any running work to finish first.
+        Not recommended, use `with:` context manager instead.
+        """
+        if self._extractors is None:
+            return  # already closed, do nothing
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        for extractor in self._extractors:
+            extractor.close()
+        self._extractors = None
+        self._idle_extractors = queue.Queue()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+    def stats(self) -> Dict[str, StageStats]:
+        """Gets the timing statistics of every worker, see `FlirExtractor`.
+
+        Returns:
+            The `StageStats` of each stage that ran, or an empty dict if
+            there is no `instrumentation`.
+        """
+        if self.instrumentation is None:
+            return {}
+        return self.instrumentation.stats()
+
+    def _get_thermal_chunk(
+        self, filepaths: typing.Sequence[Path]
+    ) -> List["np.ndarray"]:
+        """Loads a chunk of files on any idle `FlirExtractor`."""
+        extractor = self._idle_extractors.get()
+        try:
+            return list(extractor.get_thermal_batch(filepaths))
+        finally:
+            self._idle_extractors.put(extractor)
+
+    def get_thermal(self, filepath: Path) -> "np.ndarray":
+        """Gets a thermal image from a FLIR file.
+
+        Parameters:
+            filepath: The path to the FLIR file.
+
+        Returns:
+            The thermal data in Celcius as a 2-D numpy array.
+        """
+        return self.get_thermal_batch((filepath,))[0]
+
+    def get_thermal_batch(
+        self, filepaths: Iterable[Path]
+    ) -> List["np.ndarray"]:
+        """Gets thermal images from a list of FLIR files.
+
+        Parameters:
+            filepaths: The paths to the FLIR files.
+
+        Returns:
+            A list of the thermal data in Celcius as 2-D numpy arrays,
+            in the same order as `filepaths`.
+        """
+        filepaths = list(filepaths)
+        # use smaller chunks for small batches, so that every worker is busy
+        chunk_size = min(self.chunk_size, -(-len(filepaths) // self.workers))
+        chunks = chunked(filepaths, max(chunk_size, 1))
+        thermal_images: List["np.ndarray"] = []
+        for chunk_results in self.executor.map(
+            self._get_thermal_chunk, chunks
+        ):
+            thermal_images.extend(chunk_results)
+        return thermal_images
+
+    def _get_thermal_results_chunk(
+        self,
+        filepaths: typing.Sequence[Path],
+        retries: int,
+        timeout: Optional[float],
+    ) -> List[ThermalResult]:
+        """Loads a chunk of files on any idle `FlirExtractor`, without
+        raising."""
+        extractor = self._idle_extractors.get()
+        try:
+            return extractor.get_thermal_results(filepaths, retries, timeout)
+        finally:
+            self._idle_extractors.put(extractor)
+
+    def get_thermal_results(
+        self,
+        filepaths: Iterable[Path],
+        retries: int = DEFAULT_RETRIES,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+    ) -> List[ThermalResult]:
+        """Gets thermal images from a list of FLIR files, without raising.
+
+        See `FlirExtractor.get_thermal_results`. A worker whose ExifTool
+        hangs restarts it, while the other workers carry on.
+
+        Parameters:
+            filepaths: The paths to the FLIR files.
+            retries: The number of times to retry each file after a
+                transient error, e.g. an ExifTool timeout.
+            timeout: The maximum time in seconds to wait for each ExifTool
+                call, or `None` to wait forever.
+
+        Returns:
+            A `ThermalResult` for each file, in the same order as
+            `filepaths`.
+        """
+        filepaths = list(filepaths)
+        chunk_size = min(self.chunk_size, -(-len(filepaths) // self.workers))
+        results: List[ThermalResult] = []
+        for chunk_results in self.executor.map(
+            self._get_thermal_results_chunk,
+            chunked(filepaths, max(chunk_size, 1)),
+            itertools.repeat(retries),
+            itertools.repeat(timeout),
+        ):
+            results.extend(chunk_results)
+        return results
+
+    def _aggregate_chunk(
+        self,
+        filepaths: typing.Sequence[Path],
+        histogram_bins: Optional[Sequence[float]],
+        raw: bool,
+    ) -> ThermalAggregator:
+        """Aggregates a chunk of files on any idle `FlirExtractor`."""
+        extractor = self._idle_extractors.get()
+        try:
+            return extractor.aggregate(filepaths, histogram_bins, raw=raw)
+        finally:
+            self._idle_extractors.put(extractor)
+
+    def aggregate(
+        self,
+        filepaths: Iterable[Path],
+        histogram_bins: Optional[Sequence[float]] = None,
+        raw: bool = False,
+    ) -> ThermalAggregator:
+        """Aggregates per-pixel statistics over many same-shaped FLIR files.
+
+        Each chunk of files is aggregated by a worker, and the results are
+        then merged, see `FlirExtractor.aggregate`.
+
+        Parameters:
+            filepaths: The paths to the FLIR files.
+            histogram_bins: The edges of the bins of a temperature histogram.
+            raw: If `True`, aggregate the raw thermal data instead.
+
+        Returns:
+            A `ThermalAggregator` of every file.
+
+        Raises:
+            ValueError if both `histogram_bins` and `raw` are given.
+        """
+        _check_aggregate_args(histogram_bins, raw)
+        merged = ThermalAggregator(histogram_bins)
+        pending: typing.Set[concurrent.futures.Future] = set()
+        for chunk in chunked(filepaths, self.chunk_size):
+            if len(pending) >= 2 * self.workers:
+                # merge finished chunks, to keep memory use bounded
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    merged.merge(future.result())
+            pending.add(
+                self.executor.submit(
+                    self._aggregate_chunk, chunk, histogram_bins, raw
+                )
+            )
+        for future in concurrent.futures.as_completed(pending):
+            merged.merge(future.result())
+        return merged
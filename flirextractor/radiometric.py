@@ -0,0 +1,143 @@
+"""Lazily converts raw FLIR thermal data, keeping the raw data in memory.
+"""
+import typing
+
+import numpy as np  # type: ignore
+from exiftool import ExifTool  # type: ignore
+
+from .cache import ThermalCache
+from .get_thermal import (
+    DEFAULT_CHUNK_SIZE,
+    _check_batch_args,
+    _conversion_defaults,
+    _get_raw_chunk,
+    convert_image,
+)
+from .pathutils import Path, get_str_filepath
+from .roi import ROI, ROIStats, roi_stats
+from .utils import chunked
+
+
+class RadiometricImage:
+    """The raw thermal data and metadata of a FLIR image.
+
+    The thermal data in Celcius is only calculated when `celcius` is first
+    used. Use `with_params` to convert the same raw data with different
+    parameters, without loading the FLIR image again.
+
+    Attributes:
+        raw: The raw thermal data as a 2-D numpy array.
+        metadata: The metadata tags with calibration values.
+        params: `raw_temp_to_celcius` parameters that override the values
+            in `metadata`.
+
+    Example:
+        with FlirExtractor() as extractor:
+            image = extractor.get_radiometric("./path/to/FLIR.jpg")
+            for emissivity in (0.9, 0.95, 1.0):
+                thermal_data = image.with_params(emissivity=emissivity).celcius
+    """
+
+    raw: np.ndarray
+    metadata: typing.Mapping[str, typing.Any]
+    params: typing.Mapping[str, typing.Any]
+    _celcius: typing.Optional[np.ndarray]
+
+    def __init__(
+        self,
+        raw: np.ndarray,
+        metadata: typing.Mapping[str, typing.Any],
+        **params: typing.Any,
+    ):
+        unknown_params = set(params) - set(_conversion_defaults)
+        if unknown_params:
+            raise TypeError(f"Unknown conversion parameters {unknown_params}.")
+        self.raw = raw
+        self.metadata = metadata
+        self.params = params
+        self._celcius = None
+
+    @property
+    def shape(self) -> typing.Tuple[int, ...]:
+        """The shape of the thermal data."""
+        return self.raw.shape
+
+    @property
+    def celcius(self) -> np.ndarray:
+        """The thermal data in Celcius as a 2-D numpy array.
+
+        Calculated on first use, and then memoised.
+        """
+        if self._celcius is None:
+            self._celcius = convert_image(
+                self.metadata, self.raw, params=self.params
+            )
+        return self._celcius
+
+    def roi_stats(
+        self,
+        rois: typing.Sequence[ROI],
+        percentiles: typing.Sequence[float] = (),
+    ) -> typing.List[ROIStats]:
+        """Calculates temperature statistics inside regions of interest.
+
+        Only the pixels inside the ROIs are converted, so this is much faster
+        than using `celcius`, if it has not been calculated already.
+
+        Parameters:
+            rois: The regions of interest, see `flirextractor.roi.ROI`.
+            percentiles: The percentiles to calculate, between 0 and 100.
+
+        Returns:
+            The statistics of each ROI, in order.
+        """
+        return roi_stats(
+            self.metadata, self.raw, rois, percentiles, params=self.params
+        )
+
+    def with_params(self, **params: typing.Any) -> "RadiometricImage":
+        """Creates a copy of this image with different conversion parameters.
+
+        The raw data is shared, so no data is loaded or copied.
+
+        Parameters:
+            **params: `raw_temp_to_celcius` parameters to override,
+                e.g. `emissivity=0.9, subject_distance=2.0`.
+
+        Returns:
+            A new `RadiometricImage`.
+        """
+        return RadiometricImage(
+            self.raw, self.metadata, **{**self.params, **params}
+        )
+
+    def __repr__(self) -> str:
+        return f"RadiometricImage(shape={self.shape}, params={self.params})"
+
+
+def get_radiometric_batch(
+    exiftool: ExifTool,
+    filepaths: typing.Iterable[Path],
+    engine: str = "exiftool",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: typing.Optional[ThermalCache] = None,
+) -> typing.List[RadiometricImage]:
+    """Loads the raw thermal data and metadata from multiple FLIR images.
+
+    Parameters:
+        exiftool: The ExifTool process to use.
+        filepaths: A list of paths to the files to load.
+        engine: The engine to use, see `ENGINES`.
+        chunk_size: The number of files to load in each ExifTool call.
+        cache: A cache to load raw data from, and store loaded raw data in.
+
+    Returns:
+        A list of `RadiometricImage`s, one for each file.
+    """
+    _check_batch_args(engine, chunk_size)
+    str_paths = [get_str_filepath(filepath) for filepath in filepaths]
+    return [
+        RadiometricImage(raw_np, metadata)
+        for chunk in chunked(str_paths, chunk_size)
+        for metadata, raw_np in _get_raw_chunk(exiftool, chunk, engine, cache)
+    ]
@@ -31,7 +31,7 @@ References:
     R package, <URL: https://CRAN.R-project.org/package=Thermimage>.
 """
 
-import math
+import functools
 import typing
 
 import numpy as np  # type: ignore
@@ -40,7 +40,11 @@ CELCIUS_KELVIN_DIFF = 273.15
 """Offset between 0 Celcius and 0 Kelvin"""
 
 
-def water_vapor_pressure(temp: float) -> float:
+FloatOrArray = typing.Union[float, np.ndarray]
+"""A float, or a numpy array of floats to calculate element-wise"""
+
+
+def water_vapor_pressure(temp: FloatOrArray) -> FloatOrArray:
     """Calculates the saturated vapour pressure for a given temperature.
 
     Parameters:
@@ -52,15 +56,11 @@ def water_vapor_pressure(temp: float) -> float:
     # seems to pretty inaccurate, switch to Goff-Gratch?
     # shouldn't we be using one of these?
     # https://en.wikipedia.org/wiki/Vapour_pressure_of_water
-    return math.exp(
-        math.fsum(
-            (
-                1.5587,
-                0.06939 * temp,
-                -0.00027816 * (temp ** 2),
-                0.00000068455 * (temp ** 3),
-            )
-        )
+    return np.exp(
+        1.5587
+        + 0.06939 * temp
+        - 0.00027816 * (temp ** 2)
+        + 0.00000068455 * (temp ** 3)
     )
 
 
@@ -90,15 +90,18 @@ class CameraPlanckConsts(typing.NamedTuple):
 
 
 def atmosphere_attenuation(
-    relative_humidity: float,
-    temperature: float,
-    altitude: float,
-    distance: float,
-    peak_spectral_wavelength: float,
+    relative_humidity: FloatOrArray,
+    temperature: FloatOrArray,
+    altitude: FloatOrArray,
+    distance: FloatOrArray,
+    peak_spectral_wavelength: FloatOrArray,
     atmos_consts: AtmosphericTransConsts = AtmosphericTransConsts(),
-) -> float:
+) -> FloatOrArray:
     """Calculates the transmittance of the IR signal in the atmosphere.
 
+    All parameters can also be arrays, to calculate many transmittances
+    at once.
+
     Parameters:
         relative_humidity: The relative humidity between 0 and 1.
         temperature: The temperature of the atmosphere in Celcius.
@@ -115,7 +118,7 @@ def atmosphere_attenuation(
         Sebastian Dudzik and Waldemar Minkina's
         Infrared Thermography: Errors and Uncertainties
     """
-    if not 0 <= relative_humidity <= 1:
+    if not np.all((0 <= relative_humidity) & (relative_humidity <= 1)):
         raise ValueError("Relative humidity should be between 0 and 1")
 
     # TODO: Replace this mystery code with something from
@@ -125,8 +128,8 @@ def atmosphere_attenuation(
     water_partial_pressure = relative_humidity * water_saturated_pressure
 
     def exponential_term(alpha, beta):
-        sqrt_water_pressure = math.sqrt(water_partial_pressure)
-        return -math.sqrt(distance) * (alpha + beta * sqrt_water_pressure)
+        sqrt_water_pressure = np.sqrt(water_partial_pressure)
+        return -np.sqrt(distance) * (alpha + beta * sqrt_water_pressure)
 
     exponential_1 = exponential_term(
         alpha=atmos_consts.alpha_1, beta=atmos_consts.beta_1,
@@ -134,53 +137,32 @@ def atmosphere_attenuation(
     exponential_2 = exponential_term(
         alpha=atmos_consts.alpha_2, beta=atmos_consts.beta_2,
     )
-    part_1 = atmos_consts.x * math.exp(exponential_1)
-    part_2 = (1 - atmos_consts.x) * math.exp(exponential_2)
+    part_1 = atmos_consts.x * np.exp(exponential_1)
+    part_2 = (1 - atmos_consts.x) * np.exp(exponential_2)
     return part_1 + part_2
 
 
-def raw_temp_to_celcius(
-    raw: np.ndarray,
-    emissivity: float = 1,
-    subject_distance: float = 1,
-    reflected_temp: float = 20,
-    atmospheric_temp: float = None,
-    ir_window_temp: float = None,
-    ir_window_transmission: float = 1,
-    humidity: float = 0.5,
-    planck: CameraPlanckConsts = CameraPlanckConsts(),
-    atmos_consts: AtmosphericTransConsts = AtmosphericTransConsts(),
-    *,  # kwargs only from now on
-    peak_spectral_sensitivity: float = 9.8,  # default is 9.8 μm
-) -> np.ndarray:
-    """Loads temperature data from raw FLIR ADC data into Celcius.
+def _radiance_terms(
+    emissivity: FloatOrArray,
+    subject_distance: FloatOrArray,
+    reflected_temp: FloatOrArray,
+    atmospheric_temp: FloatOrArray,
+    ir_window_temp: FloatOrArray,
+    ir_window_transmission: FloatOrArray,
+    humidity: FloatOrArray,
+    planck: CameraPlanckConsts,
+    atmos_consts: AtmosphericTransConsts,
+    peak_spectral_sensitivity: FloatOrArray,
+) -> typing.Tuple[FloatOrArray, FloatOrArray]:
+    """Calculates the per-image terms needed to convert raw data.
 
-    Parameters:
-        raw: The raw ADC FLIR data.
-        emissivity: ratio between 0 and 1, depends on subject material
-        subject_distance: distance from camera to subject in meters
-        reflected_temp: temperature reflected by the subject in Celcius
-        atmospheric_temp:
-          temperature of the atmosphere (default: reflected_temperature)
-        ir_window_temp:
-          the temperature of the IR window in Celcius
-          (default: reflected_temperature)
-        ir_window_transmission:
-          the ratio of IR transmitted throught the window
-        humidity: relative_humidity
-        planck: calibration constants
-        atmos_trans_consts: atmospheric transmission constants from metadata
-        peak_spectral_sensitivity:
-            wavelength of highest sensitivity in micrometers
+    Parameters are the same as `raw_temp_to_celcius`, and can be arrays
+    to calculate the terms of many images at once.
 
     Returns:
-        A 2D array of the image, with each pixel showing the temperature
-        in Celcius.
+        `divisor, non_object_radiance`, where the radiance of the object is
+        `raw / divisor - non_object_radiance`.
     """
-    if atmospheric_temp is None:
-        atmospheric_temp = reflected_temp
-    if ir_window_temp is None:
-        ir_window_temp = reflected_temp
     # Equations to convert to temperature
     # See http://130.15.24.88/exiftool/forum/index.php/topic,4898.60.html
     # Standard equation: temperature<-PB/log(PR1/(PR2*(raw+PO))+PF)-273.15
@@ -214,9 +196,9 @@ def raw_temp_to_celcius(
         atmos_consts=atmos_consts,
     )
 
-    def radiance(temperature: float) -> float:
+    def radiance(temperature: FloatOrArray) -> FloatOrArray:
         kelvin = temperature + CELCIUS_KELVIN_DIFF
-        denominator = planck.r2 * (math.exp(planck.b / kelvin) - planck.f)
+        denominator = planck.r2 * (np.exp(planck.b / kelvin) - planck.f)
         return planck.r1 / denominator - planck.zero
 
     divisor = 1.0
@@ -244,20 +226,254 @@ def raw_temp_to_celcius(
         (1 - antenuation_after_window) / divisor * radiance(atmospheric_temp)
     )
 
-    non_object_radiance = math.fsum(
-        (
-            reflected_b4_window,
-            atmosphere_b4_window,
-            radiance_window,
-            reflected_after_window,
-            atmosphere_after_window,
-        )
+    non_object_radiance = (
+        reflected_b4_window
+        + atmosphere_b4_window
+        + radiance_window
+        + reflected_after_window
+        + atmosphere_after_window
+    )
+    return divisor, non_object_radiance
+
+
+def _raw_obj_radiance_to_celcius(
+    raw: np.ndarray,
+    divisor: FloatOrArray,
+    non_object_radiance: FloatOrArray,
+    planck: CameraPlanckConsts,
+    out: np.ndarray,
+) -> np.ndarray:
+    """Converts raw data to Celcius in-place in `out`.
+
+    Parameters:
+        raw: The raw ADC FLIR data.
+        divisor, non_object_radiance: see `_radiance_terms`.
+        planck: calibration constants.
+        out: The array to store the output in.
+
+    Returns:
+        `out`
+    """
+    # raw_obj_radiance = raw / divisor - non_object_radiance
+    raw_obj_radiance = np.divide(raw, divisor, out=out)
+    raw_obj_radiance -= non_object_radiance
+
+    # temp_k = planck.b / np.log(r1 / r2 / (raw_obj_radiance + zero) + f)
+    raw_obj_radiance += planck.zero
+    log_term = np.divide(planck.r1 / planck.r2, raw_obj_radiance, out=out)
+    log_term += planck.f
+    np.log(log_term, out=out)
+    raw_object_temperature_k = np.divide(planck.b, log_term, out=out)
+
+    raw_object_temperature_k -= CELCIUS_KELVIN_DIFF
+    return raw_object_temperature_k
+
+
+def raw_temp_to_celcius(
+    raw: np.ndarray,
+    emissivity: float = 1,
+    subject_distance: float = 1,
+    reflected_temp: float = 20,
+    atmospheric_temp: float = None,
+    ir_window_temp: float = None,
+    ir_window_transmission: float = 1,
+    humidity: float = 0.5,
+    planck: CameraPlanckConsts = CameraPlanckConsts(),
+    atmos_consts: AtmosphericTransConsts = AtmosphericTransConsts(),
+    *,  # kwargs only from now on
+    peak_spectral_sensitivity: float = 9.8,  # default is 9.8 μm
+    out: typing.Optional[np.ndarray] = None,
+    dtype: typing.Optional[np.dtype] = None,
+) -> np.ndarray:
+    """Loads temperature data from raw FLIR ADC data into Celcius.
+
+    The conversion is done in-place in the output array, so no full-size
+    temporary arrays are allocated.
+
+    Parameters:
+        raw: The raw ADC FLIR data.
+        emissivity: ratio between 0 and 1, depends on subject material
+        subject_distance: distance from camera to subject in meters
+        reflected_temp: temperature reflected by the subject in Celcius
+        atmospheric_temp:
+          temperature of the atmosphere (default: reflected_temperature)
+        ir_window_temp:
+          the temperature of the IR window in Celcius
+          (default: reflected_temperature)
+        ir_window_transmission:
+          the ratio of IR transmitted throught the window
+        humidity: relative_humidity
+        planck: calibration constants
+        atmos_trans_consts: atmospheric transmission constants from metadata
+        peak_spectral_sensitivity:
+            wavelength of highest sensitivity in micrometers
+        out: an array with the same shape as `raw` to store the output in,
+            e.g. a slice of a preallocated stack of images.
+        dtype: the floating point type of the output if `out` is not given,
+            e.g. `np.float32` to halve memory use (default: `np.float64`).
+
+    Returns:
+        A 2D array of the image, with each pixel showing the temperature
+        in Celcius. This is `out`, if given.
+    """
+    if out is None:
+        if dtype is None:
+            dtype = np.float64
+        out = np.empty(np.shape(raw), dtype=dtype)
+    if atmospheric_temp is None:
+        atmospheric_temp = reflected_temp
+    if ir_window_temp is None:
+        ir_window_temp = reflected_temp
+    divisor, non_object_radiance = _radiance_terms(
+        emissivity=emissivity,
+        subject_distance=subject_distance,
+        reflected_temp=reflected_temp,
+        atmospheric_temp=atmospheric_temp,
+        ir_window_temp=ir_window_temp,
+        ir_window_transmission=ir_window_transmission,
+        humidity=humidity,
+        planck=planck,
+        atmos_consts=atmos_consts,
+        peak_spectral_sensitivity=peak_spectral_sensitivity,
+    )
+    return _raw_obj_radiance_to_celcius(
+        raw, divisor, non_object_radiance, planck, out=out
+    )
+
+
+def raw_temp_to_celcius_stack(
+    raw: np.ndarray,
+    emissivity: FloatOrArray = 1,
+    subject_distance: FloatOrArray = 1,
+    reflected_temp: FloatOrArray = 20,
+    atmospheric_temp: typing.Optional[FloatOrArray] = None,
+    ir_window_temp: typing.Optional[FloatOrArray] = None,
+    ir_window_transmission: FloatOrArray = 1,
+    humidity: FloatOrArray = 0.5,
+    planck: CameraPlanckConsts = CameraPlanckConsts(),
+    atmos_consts: AtmosphericTransConsts = AtmosphericTransConsts(),
+    *,  # kwargs only from now on
+    peak_spectral_sensitivity: FloatOrArray = 9.8,  # default is 9.8 μm
+    out: typing.Optional[np.ndarray] = None,
+    dtype: typing.Optional[np.dtype] = None,
+) -> np.ndarray:
+    """Loads temperature data from a stack of raw FLIR images into Celcius.
+
+    Each parameter can either be a single value used for every image, or
+    an array with a value for each image. The fields of `planck` and
+    `atmos_consts` can be arrays too.
+    Every per-image term is calculated at once, and the whole stack is
+    then converted in a single pass.
+
+    Parameters:
+        raw: The raw ADC FLIR data as a `(N, H, W)` array.
+        out: A `(N, H, W)` array to store the output in.
+        dtype: The floating point type of the output if `out` is not given
+            (default: `np.float64`).
+        All other parameters are the same as in `raw_temp_to_celcius`.
+
+    Returns:
+        A `(N, H, W)` array of the images, with each pixel showing the
+        temperature in Celcius. This is `out`, if given.
+    """
+    if out is None:
+        if dtype is None:
+            dtype = np.float64
+        out = np.empty(np.shape(raw), dtype=dtype)
+    if atmospheric_temp is None:
+        atmospheric_temp = reflected_temp
+    if ir_window_temp is None:
+        ir_window_temp = reflected_temp
+    n_images = np.shape(raw)[0]
+
+    def per_image(value: FloatOrArray) -> np.ndarray:
+        return np.broadcast_to(np.asarray(value, dtype=np.float64), n_images)
+
+    planck = CameraPlanckConsts(*(per_image(value) for value in planck))
+    divisor, non_object_radiance = _radiance_terms(
+        emissivity=per_image(emissivity),
+        subject_distance=per_image(subject_distance),
+        reflected_temp=per_image(reflected_temp),
+        atmospheric_temp=per_image(atmospheric_temp),
+        ir_window_temp=per_image(ir_window_temp),
+        ir_window_transmission=per_image(ir_window_transmission),
+        humidity=per_image(humidity),
+        planck=planck,
+        atmos_consts=AtmosphericTransConsts(
+            *(per_image(value) for value in atmos_consts)
+        ),
+        peak_spectral_sensitivity=per_image(peak_spectral_sensitivity),
     )
 
-    raw_obj_radiance = raw / divisor - non_object_radiance
+    def broadcast_per_pixel(value: np.ndarray) -> np.ndarray:
+        """Reshapes a per-image array to `(N, 1, 1)`."""
+        return value.reshape((n_images,) + (1,) * (np.ndim(raw) - 1))
 
-    raw_object_temperature_k = planck.b / np.log(
-        planck.r1 / planck.r2 / (raw_obj_radiance + planck.zero) + planck.f
+    return _raw_obj_radiance_to_celcius(
+        raw,
+        broadcast_per_pixel(divisor),
+        broadcast_per_pixel(non_object_radiance),
+        CameraPlanckConsts(*(broadcast_per_pixel(value) for value in planck)),
+        out=out,
     )
-    raw_object_temperature_c = raw_object_temperature_k - CELCIUS_KELVIN_DIFF
-    return raw_object_temperature_c
+
+
+RAW_LUT_SIZE = 2 ** 16
+"""Number of possible raw values, as FLIR raw data is 16-bit"""
+LUT_CACHE_SIZE = 16
+"""Number of lookup tables `raw_temp_to_celcius_lut` keeps in memory"""
+
+
+@functools.lru_cache(maxsize=LUT_CACHE_SIZE)
+def _celcius_lut(*args, **kwargs) -> np.ndarray:
+    """Calculates the temperature in Celcius of every possible raw value.
+
+    Parameters are the same as `raw_temp_to_celcius`, without `raw`.
+
+    Returns:
+        A read-only array of the temperatures in Celcius, indexed by raw value.
+    """
+    all_raw_values = np.arange(RAW_LUT_SIZE, dtype=np.uint16)
+    # not every raw value is a valid temperature, but those aren't used
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lut = raw_temp_to_celcius(all_raw_values, *args, **kwargs)
+    lut.flags.writeable = False
+    return lut
+
+
+def raw_temp_to_celcius_lut(
+    raw: np.ndarray,
+    *args,
+    out: typing.Optional[np.ndarray] = None,
+    dtype: typing.Optional[np.dtype] = None,
+    **kwargs,
+) -> np.ndarray:
+    """Loads temperature data from raw FLIR ADC data using a lookup table.
+
+    Gives the same results as `raw_temp_to_celcius`, but as raw data is
+    16-bit, the conversion is calculated once for all 65536 raw values,
+    and then each pixel is looked up.
+    The lookup tables of the last `LUT_CACHE_SIZE` parameter sets are
+    cached, so converting many images with the same parameters only
+    calculates the conversion once.
+
+    Parameters:
+        raw: The raw ADC FLIR data as an unsigned 16-bit (or less) array.
+        *args, **kwargs: The other parameters of `raw_temp_to_celcius`.
+            They must be hashable.
+        out: an array with the same shape as `raw` to store the output in.
+        dtype: the floating point type of the output if `out` is not given
+            (default: `np.float64`).
+
+    Returns:
+        A 2D array of the image, with each pixel showing the temperature
+        in Celcius. This is `out`, if given.
+    """
+    if raw.dtype.kind != "u" or raw.dtype.itemsize > 2:
+        raise TypeError(f"raw must have dtype uint16, not {raw.dtype}.")
+    if out is not None:
+        dtype = out.dtype
+    elif dtype is None:
+        dtype = np.float64
+    lut = _celcius_lut(*args, dtype=np.dtype(dtype), **kwargs)
+    return np.take(lut, raw, out=out)
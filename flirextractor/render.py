@@ -0,0 +1,330 @@
+"""Fast false-colour rendering of thermal data, and thumbnail writing.
+
+Temperatures are mapped to RGB through a precomputed lookup table (LUT)
+of each palette, so rendering an image is a scale, a clip, and a single
+gather, instead of going through PIL's `Image.fromarray` or matplotlib.
+Raw `np.uint16` thermal data is mapped directly, through a LUT of every
+possible raw value, without converting it to floats first.
+
+Example:
+    with FlirExtractor() as extractor:
+        thermal_data = extractor.get_thermal("path/to/FLIR.jpg")
+    rgb = render(thermal_data, palette="iron", max_size=160)
+    # or, to render a whole archive in parallel
+    with FlirExtractor() as extractor:
+        for result in write_thumbnails(extractor, files, workers=8):
+            if result.error is not None:
+                print(result.filepath, result.error)
+"""
+import concurrent.futures
+import functools
+import math
+import os
+import pathlib
+import typing
+import warnings
+
+import numpy as np  # type: ignore
+
+from .defaults import DEFAULT_PERCENTILES, DEFAULT_THUMBNAIL_SIZE, PALETTES
+from .instrument import bind, stage
+from .pathutils import Path
+from .results import DEFAULT_RETRIES, DEFAULT_TIMEOUT
+from .utils import chunked
+
+if typing.TYPE_CHECKING:
+    from .flirextractor import FlirExtractor  # noqa: F401
+    from .pool import FlirExtractorPool  # noqa: F401
+
+LUT_SIZE = 256
+"""The number of colours in each palette's LUT"""
+
+_palette_stops = dict(
+    iron=(
+        (0.0, (0, 0, 0)),
+        (0.15, (32, 0, 140)),
+        (0.35, (204, 0, 119)),
+        (0.6, (255, 140, 0)),
+        (0.8, (255, 220, 0)),
+        (1.0, (255, 255, 255)),
+    ),
+    rainbow=(
+        (0.0, (0, 0, 128)),
+        (0.15, (0, 0, 255)),
+        (0.35, (0, 255, 255)),
+        (0.5, (0, 255, 0)),
+        (0.65, (255, 255, 0)),
+        (0.85, (255, 0, 0)),
+        (1.0, (128, 0, 0)),
+    ),
+    grey=((0.0, (0, 0, 0)), (1.0, (255, 255, 255))),
+)
+"""Map of palette name to `(position, (red, green, blue))` colour stops,
+which are linearly interpolated between"""
+_AUTO_RANGE_SAMPLES = 1 << 16
+"""Maximum number of pixels sampled to find the percentiles of an image"""
+
+
+@functools.lru_cache(maxsize=None)
+def get_lut(palette: str) -> np.ndarray:
+    """Gets the LUT of a palette.
+
+    Parameters:
+        palette: The name of the palette, see `PALETTES`.
+
+    Returns:
+        A read-only `(LUT_SIZE, 3)` `np.uint8` array of RGB colours,
+        from coldest to hottest.
+    """
+    if palette not in PALETTES:
+        raise ValueError(f"Unknown palette {palette}, must be in {PALETTES}.")
+    positions, colours = zip(*_palette_stops[palette])
+    colours = np.array(colours, dtype=np.float64)
+    steps = np.linspace(0, 1, LUT_SIZE)
+    lut = np.stack(
+        [np.interp(steps, positions, channel) for channel in colours.T],
+        axis=-1,
+    )
+    lut = np.rint(lut).astype(np.uint8)
+    lut.flags.writeable = False  # shared by every caller
+    return lut
+
+
+def downscale(data: np.ndarray, max_size: int) -> np.ndarray:
+    """Shrinks an image by an integer factor, by averaging blocks of pixels.
+
+    Any block containing a NaN is NaN. Integer images are rounded back to
+    their dtype, so raw thermal data can still be rendered directly.
+
+    Parameters:
+        data: The 2-D image.
+        max_size: The maximum width and height of the output.
+
+    Returns:
+        The downscaled image, or `data` itself if it is already small
+        enough. Any rows/columns left over by the factor are cropped.
+    """
+    if max_size < 1:
+        raise ValueError(f"max_size must be positive, not {max_size}.")
+    height, width = data.shape
+    factor = math.ceil(max(height, width) / max_size)
+    if factor <= 1:
+        return data
+    height, width = height // factor, width // factor
+    cropped = data[:height * factor, :width * factor]
+    blocks = cropped.reshape(height, factor, width, factor)
+    if np.issubdtype(data.dtype, np.integer):
+        return np.rint(blocks.mean(axis=(1, 3))).astype(data.dtype)
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+
+def auto_range(
+    data: np.ndarray,
+    percentiles: typing.Tuple[float, float] = DEFAULT_PERCENTILES,
+) -> typing.Tuple[float, float]:
+    """Finds the range of an image to render, ignoring outliers.
+
+    Large images are sampled on a regular grid, so this takes about the
+    same time whatever the size of the image.
+
+    Parameters:
+        data: The 2-D image.
+        percentiles: The low and high percentiles, from 0 to 100.
+
+    Returns:
+        `vmin, vmax`, which are `0.0, 0.0` if every pixel is NaN.
+    """
+    step = max(1, math.ceil(math.sqrt(data.size / _AUTO_RANGE_SAMPLES)))
+    sample = data[::step, ::step]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN
+        vmin, vmax = np.nanpercentile(sample, percentiles)
+    if not (math.isfinite(vmin) and math.isfinite(vmax)):
+        return 0.0, 0.0
+    return float(vmin), float(vmax)
+
+
+def _lut_indexes(
+    data: np.ndarray, vmin: float, vmax: float
+) -> np.ndarray:
+    """Scales data into float32 LUT indexes, with NaN left as NaN."""
+    scale = (LUT_SIZE - 1) / (vmax - vmin) if vmax > vmin else 0.0
+    indexes = np.subtract(data, vmin, dtype=np.float32)
+    indexes *= scale
+    indexes += 0.5  # round to the nearest colour when truncated
+    np.clip(indexes, 0, LUT_SIZE - 1, out=indexes)
+    return indexes
+
+
+def render(
+    data: np.ndarray,
+    palette: str = "iron",
+    vmin: typing.Optional[float] = None,
+    vmax: typing.Optional[float] = None,
+    percentiles: typing.Tuple[float, float] = DEFAULT_PERCENTILES,
+    max_size: typing.Optional[int] = None,
+    nan_colour: typing.Tuple[int, int, int] = (0, 0, 0),
+) -> np.ndarray:
+    """Renders thermal data as a false-colour RGB image.
+
+    Parameters:
+        data: The thermal data in Celcius as a 2-D array, or the raw
+            thermal data as a 2-D `np.uint16` (or `np.uint8`) array,
+            which is mapped directly, without converting it to floats.
+        palette: The palette to render with, see `PALETTES`.
+        vmin: The value of the coldest colour. Colder values are clipped
+            (default: the low `percentiles` of the data).
+        vmax: The value of the hottest colour, like `vmin`.
+        percentiles: The low and high percentiles of the data to use if
+            `vmin` or `vmax` are not given, see `auto_range`.
+        max_size: If given, the image is first shrunk to at most this width
+            and height, see `downscale`.
+        nan_colour: The RGB colour of NaN pixels.
+
+    Returns:
+        A `(H, W, 3)` `np.uint8` RGB image, e.g. for `PIL.Image.fromarray`.
+    """
+    lut = get_lut(palette)
+    if max_size is not None:
+        data = downscale(data, max_size)
+    if vmin is None or vmax is None:
+        auto_vmin, auto_vmax = auto_range(data, percentiles)
+        vmin = auto_vmin if vmin is None else vmin
+        vmax = auto_vmax if vmax is None else vmax
+    if data.dtype in (np.uint8, np.uint16):
+        # map every possible value at once, then gather straight from it
+        value_lut = lut.take(
+            _lut_indexes(
+                np.arange(np.iinfo(data.dtype).max + 1), vmin, vmax
+            ).astype(np.uint8),
+            axis=0,
+        )
+        return value_lut.take(data, axis=0)
+    indexes = _lut_indexes(data, vmin, vmax)
+    nan = np.isnan(indexes)
+    has_nan = nan.any()
+    if has_nan:
+        indexes[nan] = 0
+    rgb = lut.take(indexes.astype(np.uint8), axis=0)
+    if has_nan:
+        rgb[nan] = nan_colour
+    return rgb
+
+
+class ThumbnailResult(typing.NamedTuple):
+    """The result of writing a single thumbnail with `write_thumbnails`.
+
+    Attributes:
+        filepath: The path to the FLIR file, as passed in.
+        output: The path to the thumbnail.
+        error: The exception raised when loading the file, or rendering or
+            writing its thumbnail, or `None`.
+    """
+
+    filepath: Path
+    output: pathlib.Path
+    error: typing.Optional[BaseException]
+
+
+def _write_thumbnail(
+    output: pathlib.Path,
+    thermal_data: np.ndarray,
+    render_kwargs: typing.Mapping[str, typing.Any],
+):
+    """Renders and writes a thumbnail atomically."""
+    from PIL import Image  # type: ignore  # slow to import
+
+    image_format = Image.registered_extensions().get(output.suffix.lower())
+    if image_format is None:
+        raise ValueError(f"Unknown image format of {output}.")
+    with stage("render") as render_stage:
+        rgb = render(thermal_data, **render_kwargs)
+        render_stage.add_bytes(rgb.nbytes)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_output = output.with_name(f".{output.name}.tmp")
+    Image.fromarray(rgb).save(tmp_output, image_format)
+    os.replace(tmp_output, output)
+
+
+def write_thumbnails(
+    extractor: typing.Union["FlirExtractor", "FlirExtractorPool"],
+    files: typing.Iterable[typing.Tuple[Path, Path]],
+    palette: str = "iron",
+    vmin: typing.Optional[float] = None,
+    vmax: typing.Optional[float] = None,
+    percentiles: typing.Tuple[float, float] = DEFAULT_PERCENTILES,
+    max_size: typing.Optional[int] = DEFAULT_THUMBNAIL_SIZE,
+    workers: typing.Optional[int] = None,
+    retries: int = DEFAULT_RETRIES,
+    timeout: typing.Optional[float] = DEFAULT_TIMEOUT,
+) -> typing.Iterator[ThumbnailResult]:
+    """Renders FLIR files as false-colour thumbnails, in parallel.
+
+    Files are loaded in batches with `extractor.get_thermal_results`, while
+    the previous batch is rendered and written by a pool of threads.
+    Files that fail to load, render or write don't stop the rest.
+
+    Parameters:
+        extractor: An open `FlirExtractor` or `FlirExtractorPool`.
+        files: `filepath, output` of each file, where the format of the
+            thumbnail is taken from the suffix of `output`, e.g. `.png`.
+        palette, vmin, vmax, percentiles, max_size: See `render`.
+            By default, thumbnails are at most `DEFAULT_THUMBNAIL_SIZE`
+            pixels wide and high, and each is scaled to its own range.
+        workers: The number of threads rendering thumbnails
+            (default: the number of CPUs).
+        retries, timeout: See `FlirExtractor.get_thermal_results`.
+
+    Yields:
+        A `ThumbnailResult` for each file, in order.
+    """
+    render_kwargs = dict(
+        palette=palette,
+        vmin=vmin,
+        vmax=vmax,
+        percentiles=percentiles,
+        max_size=max_size,
+    )
+    get_lut(palette)  # raise any ValueError before loading anything
+    batch_size = extractor.chunk_size * getattr(extractor, "workers", 1)
+    write_thumbnail = bind(_write_thumbnail)
+    with concurrent.futures.ThreadPoolExecutor(
+        workers or os.cpu_count()
+    ) as executor:
+        pending: typing.List[
+            typing.Tuple[Path, pathlib.Path, typing.Any]
+        ] = []
+        for batch in chunked(files, batch_size):
+            results = extractor.get_thermal_results(
+                [filepath for filepath, _ in batch], retries, timeout
+            )
+            # yield the previous batch once this one is loaded, so that
+            # loading and rendering overlap
+            yield from _finish(pending)
+            pending = []
+            for (filepath, output), result in zip(batch, results):
+                output = pathlib.Path(output)
+                if not result.ok:
+                    pending.append((filepath, output, result.error))
+                    continue
+                write = executor.submit(
+                    write_thumbnail, output, result.unwrap(), render_kwargs
+                )
+                pending.append((filepath, output, write))
+        yield from _finish(pending)
+
+
+def _finish(
+    pending: typing.Iterable[typing.Tuple[Path, pathlib.Path, typing.Any]]
+) -> typing.Iterator[ThumbnailResult]:
+    """Waits for pending thumbnails, see `write_thumbnails`."""
+    for filepath, output, write_or_error in pending:
+        if not isinstance(write_or_error, concurrent.futures.Future):
+            yield ThumbnailResult(filepath, output, write_or_error)
+            continue
+        try:
+            write_or_error.result()
+        except Exception as e:
+            yield ThumbnailResult(filepath, output, e)
+            continue
+        yield ThumbnailResult(filepath, output, None)
@@ -0,0 +1,293 @@
+"""Fault-tolerant loading of large batches, with a result for each file.
+
+`get_thermal_batch` raises the first error of any file, so one missing,
+non-radiometric or corrupt file aborts the whole batch. Instead,
+`iter_thermal_results` yields a `ThermalResult` for every file, holding
+either its thermal data or its error.
+
+Transient errors (see `TRANSIENT_ERRORS`), such as ExifTool hanging past
+its `timeout` or exiting, are retried after restarting ExifTool.
+If a whole chunk fails, each of its files is retried on its own,
+so that only the bad files are lost.
+"""
+import concurrent.futures
+import functools
+import typing
+
+import numpy as np  # type: ignore
+from exiftool import ExifTool  # type: ignore
+
+from .cache import ThermalCache
+from .defaults import DEFAULT_RETRIES, DEFAULT_TIMEOUT
+from .get_thermal import (
+    DEFAULT_CHUNK_SIZE,
+    _check_batch_args,
+    _decode_and_convert,
+    _execute_json,
+    _kill_exiftool,
+    _parse_raw_batch,
+    _raw_batch_params,
+    _split_by_size,
+    _try_load_flir_file,
+)
+from .instrument import bind, stage
+from .pathutils import Path, get_str_filepath
+from .utils import chunked
+
+TRANSIENT_ERRORS = (TimeoutError, ConnectionError, EOFError)
+"""Errors that are retried, after restarting ExifTool.
+
+Includes `ExifToolTimeoutError` (ExifTool hangs), `EOFError` (ExifTool
+exits), and `BrokenPipeError` (writing to an ExifTool that has exited).
+"""
+
+_Loaded = typing.Union[
+    typing.Tuple[typing.Dict[str, typing.Any], bytes], Exception
+]
+"""`metadata, raw_image_bytes` of a file loaded by ExifTool, or its error"""
+
+
+class ThermalResult(typing.NamedTuple):
+    """The result of loading a single file with `iter_thermal_results`.
+
+    Attributes:
+        filepath: The path to the file, as passed in.
+        thermal: The thermal data in Celcius as a 2-D numpy array,
+            or `None` if loading the file failed.
+        error: The exception raised when loading the file, or `None`.
+        attempts: The number of times loading the file was attempted.
+    """
+
+    filepath: Path
+    thermal: typing.Optional[np.ndarray]
+    error: typing.Optional[BaseException]
+    attempts: int
+
+    @property
+    def ok(self) -> bool:
+        """`True` if the file was loaded."""
+        return self.error is None
+
+    def unwrap(self) -> np.ndarray:
+        """Gets the thermal data, raising the error if loading failed."""
+        if self.error is not None:
+            raise self.error
+        return typing.cast(np.ndarray, self.thermal)
+
+
+def _restart(exiftool: ExifTool):
+    """Kills and starts again an ExifTool process, in place."""
+    _kill_exiftool(exiftool)
+    exiftool.start()
+
+
+class _ChunkLoader:
+    """Loads chunks of files with ExifTool, restarting it when needed."""
+
+    def __init__(
+        self,
+        exiftool: ExifTool,
+        retries: int,
+        timeout: typing.Optional[float],
+        restart_exiftool: typing.Callable[[], typing.Any],
+    ):
+        self.exiftool = exiftool
+        self.retries = retries
+        self.timeout = timeout
+        self.restart_exiftool = restart_exiftool
+
+    def _call(
+        self, str_paths: typing.Sequence[str]
+    ) -> typing.List[_Loaded]:
+        """Loads files in a single ExifTool call.
+
+        Returns:
+            `metadata, raw_image_bytes` or the error of each file.
+
+        Raises:
+            An error in `TRANSIENT_ERRORS`, after restarting ExifTool.
+        """
+        try:
+            with stage("exiftool", files=len(str_paths)):
+                json_output = _execute_json(
+                    self.exiftool, _raw_batch_params(str_paths), self.timeout
+                )
+        except TRANSIENT_ERRORS:
+            self.restart_exiftool()
+            raise
+        # ExifTool skips files it can't read, so match files by name
+        file_tags = {tags.get("SourceFile"): tags for tags in json_output}
+        results: typing.List[_Loaded] = []
+        with stage("parse", files=len(str_paths)) as parse_stage:
+            for str_path in str_paths:
+                tags = file_tags.get(str_path)
+                if tags is None:
+                    results.append(
+                        ValueError(f"ExifTool could not read {str_path}.")
+                    )
+                    continue
+                try:
+                    ((metadata, raw),) = _parse_raw_batch([str_path], [tags])
+                except Exception as e:
+                    results.append(e)
+                    continue
+                parse_stage.add_bytes(len(raw))
+                results.append((metadata, raw))
+        return results
+
+    def load(
+        self, str_paths: typing.Sequence[str]
+    ) -> typing.List[typing.Tuple[_Loaded, int]]:
+        """Loads files with ExifTool, retrying transient errors.
+
+        Files are loaded in batches of at most `MAX_BATCH_BYTES`, so a retry
+        never repeats reading a huge reply.
+
+        Returns:
+            `metadata, raw_image_bytes` or the error of each file,
+            and the number of attempts for each file.
+        """
+        return [
+            result
+            for batch in _split_by_size(str_paths)
+            for result in self._load_batch(batch)
+        ]
+
+    def _load_batch(
+        self, str_paths: typing.Sequence[str]
+    ) -> typing.List[typing.Tuple[_Loaded, int]]:
+        """Loads files in a single ExifTool call, retrying transient errors.
+
+        Returns:
+            `metadata, raw_image_bytes` or the error of each file,
+            and the number of attempts for each file.
+        """
+        try:
+            return [(result, 1) for result in self._call(str_paths)]
+        except Exception as e:
+            if len(str_paths) == 1 and (
+                self.retries == 0 or not isinstance(e, TRANSIENT_ERRORS)
+            ):
+                return [(e, 1)]
+        # find which files fail, by loading each file on its own, which
+        # isn't counted as a retry if the whole chunk failed
+        last_attempt = self.retries + (2 if len(str_paths) > 1 else 1)
+        results: typing.List[typing.Tuple[_Loaded, int]] = []
+        for str_path in str_paths:
+            for attempt in range(2, last_attempt + 1):
+                try:
+                    (result,) = self._call([str_path])
+                except TRANSIENT_ERRORS as e:
+                    result = e
+                    continue
+                except Exception as e:
+                    result = e
+                break
+            results.append((result, attempt))
+        return results
+
+
+def iter_thermal_results(
+    exiftool: ExifTool,
+    filepaths: typing.Iterable[Path],
+    engine: str = "exiftool",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    retries: int = DEFAULT_RETRIES,
+    timeout: typing.Optional[float] = DEFAULT_TIMEOUT,
+    cache: typing.Optional[ThermalCache] = None,
+    executor: typing.Optional[concurrent.futures.Executor] = None,
+    restart_exiftool: typing.Optional[typing.Callable[[], typing.Any]] = None,
+) -> typing.Iterator[ThermalResult]:
+    """Lazily loads FLIR images, with a result for each file.
+
+    Errors are never raised, but returned in each file's `ThermalResult`,
+    see `flirextractor.results`.
+
+    Parameters:
+        exiftool: The ExifTool process to use.
+        filepaths: An iterable of paths to the files to load.
+        engine: The engine to use, see `ENGINES`.
+        chunk_size: The number of files to load in each ExifTool call.
+        retries: The number of times to retry each file after a transient
+            error, see `TRANSIENT_ERRORS`.
+        timeout: The maximum time in seconds to wait for each ExifTool
+            call before restarting ExifTool, or `None` to wait forever.
+        cache: A cache to load thermal data from, and store it in.
+        executor: A thread pool to decode and convert thermal data in.
+        restart_exiftool: Called to restart ExifTool after a transient
+            error (default: kill `exiftool` and start it again).
+
+    Yields:
+        A `ThermalResult` for each file, in order.
+    """
+    _check_batch_args(engine, chunk_size)
+    if retries < 0:
+        raise ValueError(f"retries must not be negative, not {retries}.")
+    if restart_exiftool is None:
+        restart_exiftool = functools.partial(_restart, exiftool)
+    loader = _ChunkLoader(exiftool, retries, timeout, restart_exiftool)
+    for chunk in chunked(filepaths, chunk_size):
+        results: typing.List[typing.Optional[ThermalResult]]
+        results = [None] * len(chunk)
+        str_paths: typing.List[str] = [""] * len(chunk)
+        for index, filepath in enumerate(chunk):
+            try:
+                str_paths[index] = get_str_filepath(filepath)
+            except Exception as e:
+                results[index] = ThermalResult(filepath, None, e, 1)
+                continue
+            if cache is not None:
+                thermal_data = cache.get_thermal(
+                    str_paths[index], engine=engine
+                )
+                if thermal_data is not None:
+                    results[index] = ThermalResult(
+                        filepath, thermal_data, None, 1
+                    )
+
+        todo = [index for index, done in enumerate(results) if done is None]
+        loaded: typing.Dict[int, typing.Tuple[typing.Any, int]] = {}
+        if engine == "native":
+            for index in todo:
+                try:
+                    raw_data = _try_load_flir_file(str_paths[index])
+                except Exception as e:
+                    raw_data = e
+                if raw_data is not None:
+                    loaded[index] = raw_data, 1
+        fallback_indexes = [index for index in todo if index not in loaded]
+        if fallback_indexes:
+            fallback_paths = [str_paths[index] for index in fallback_indexes]
+            loaded.update(zip(fallback_indexes, loader.load(fallback_paths)))
+
+        decode_and_convert = bind(_decode_and_convert)
+        conversions = {}
+        if executor is not None:
+            conversions = {
+                index: executor.submit(decode_and_convert, *raw_data)
+                for index, (raw_data, _) in loaded.items()
+                if not isinstance(raw_data, Exception)
+            }
+        for index in todo:
+            raw_data, attempts = loaded[index]
+            if isinstance(raw_data, Exception):
+                results[index] = ThermalResult(
+                    chunk[index], None, raw_data, attempts
+                )
+                continue
+            try:
+                if executor is None:
+                    thermal_data = decode_and_convert(*raw_data)
+                else:
+                    thermal_data = conversions[index].result()
+            except Exception as e:
+                results[index] = ThermalResult(chunk[index], None, e, attempts)
+                continue
+            if cache is not None:
+                cache.put_thermal(
+                    str_paths[index], thermal_data, engine=engine
+                )
+            results[index] = ThermalResult(
+                chunk[index], thermal_data, None, attempts
+            )
+        yield from typing.cast(typing.List[ThermalResult], results)
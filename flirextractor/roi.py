@@ -0,0 +1,222 @@
+"""Calculates temperature statistics inside regions of interest (ROIs).
+
+Only the pixels inside each ROI are used, and statistics are calculated from
+a histogram of the raw values, so `raw_temp_to_celcius` is only run once for
+each distinct raw value, instead of for every pixel in the image.
+"""
+import math
+import typing
+
+import numpy as np  # type: ignore
+from exiftool import ExifTool  # type: ignore
+
+from .cache import ThermalCache
+from .get_thermal import (
+    DEFAULT_CHUNK_SIZE,
+    _check_batch_args,
+    _get_conversion_kwargs,
+    _get_raw_chunk,
+)
+from .pathutils import Path, get_str_filepath
+from .raw_temp_to_celcius import raw_temp_to_celcius
+from .utils import chunked
+
+
+class Box(typing.NamedTuple):
+    """A rectangular ROI, in pixels, like PIL's `(left, upper, right, lower)`.
+
+    `right` and `lower` are exclusive. Boxes must be inside the image, and
+    contain at least one pixel.
+    """
+
+    left: int
+    upper: int
+    right: int
+    lower: int
+
+
+class Polygon(typing.NamedTuple):
+    """A polygonal ROI, as a list of `(x, y)` vertices in pixels."""
+
+    points: typing.Sequence[typing.Tuple[float, float]]
+
+
+ROI = typing.Union[Box, Polygon, np.ndarray]
+"""A `Box`, a `Polygon`, or a 2-D boolean mask the same shape as the image"""
+
+
+class ROIStats(typing.NamedTuple):
+    """Temperature statistics in Celcius of the pixels in an ROI.
+
+    Pixels that can not be converted (i.e. NaN) are ignored.
+
+    Attributes:
+        pixels: The number of pixels used.
+        min, max, mean, std: The statistics of the pixels in Celcius,
+            or NaN if `pixels` is 0.
+        percentiles: A map of each requested percentile to the temperature,
+            using the nearest-rank method, so that each value is the
+            temperature of an actual pixel.
+    """
+
+    pixels: int  # not `count`, which would shadow `tuple.count`
+    min: float
+    max: float
+    mean: float
+    std: float
+    percentiles: typing.Dict[float, float]
+
+
+def _select(raw_np: np.ndarray, roi: ROI) -> np.ndarray:
+    """Gets the raw values of the pixels in an ROI, as a 1-D array."""
+    if isinstance(roi, Box):
+        left, upper, right, lower = roi
+        height, width = raw_np.shape
+        if not (0 <= left < right <= width and 0 <= upper < lower <= height):
+            raise ValueError(
+                f"ROI box {tuple(roi)} must be a non-empty box inside the "
+                f"{width}x{height} image."
+            )
+        return raw_np[upper:lower, left:right].ravel()
+    if isinstance(roi, Polygon):
+        from PIL import Image, ImageDraw  # type: ignore  # slow to import
+
+        # only rasterise the bounding box of the polygon, not the whole image
+        height, width = raw_np.shape
+        xs = [x for x, _ in roi.points]
+        ys = [y for _, y in roi.points]
+        left, upper = max(int(min(xs)), 0), max(int(min(ys)), 0)
+        right = min(int(math.ceil(max(xs))) + 1, width)
+        lower = min(int(math.ceil(max(ys))) + 1, height)
+        if right <= left or lower <= upper:
+            return raw_np[:0, :0].ravel()
+        mask_image = Image.new("1", (right - left, lower - upper), 0)
+        ImageDraw.Draw(mask_image).polygon(
+            [(x - left, y - upper) for x, y in roi.points], fill=1
+        )
+        return raw_np[upper:lower, left:right][np.array(mask_image)]
+    mask = np.asarray(roi)
+    if mask.dtype != np.bool_ or mask.shape != raw_np.shape:
+        raise ValueError(
+            f"ROI masks must be boolean arrays of shape {raw_np.shape}, "
+            f"not {mask.dtype} arrays of shape {mask.shape}."
+        )
+    return raw_np[mask]
+
+
+def _raw_values_stats(
+    raw_values: np.ndarray,
+    percentiles: typing.Sequence[float],
+    conversion_kwargs: typing.Mapping[str, typing.Any],
+) -> ROIStats:
+    """Calculates the statistics in Celcius of some raw values."""
+    values, counts = np.unique(raw_values, return_counts=True)
+    celcius = raw_temp_to_celcius(values, **conversion_kwargs)
+    valid = np.isfinite(celcius)
+    celcius, counts = celcius[valid], counts[valid]
+    # don't assume conversion is increasing, e.g. for odd calibrations
+    order = np.argsort(celcius, kind="stable")
+    celcius, counts = celcius[order], counts[order]
+
+    count = int(counts.sum())
+    if count == 0:
+        nan = float("nan")
+        return ROIStats(
+            pixels=0,
+            min=nan,
+            max=nan,
+            mean=nan,
+            std=nan,
+            percentiles={percentile: nan for percentile in percentiles},
+        )
+    mean = float(np.dot(celcius, counts) / count)
+    variance = float(np.dot((celcius - mean) ** 2, counts) / count)
+    cumulative_counts = np.cumsum(counts)
+    percentile_values = {}
+    for percentile in percentiles:
+        rank = max(int(math.ceil(percentile / 100 * count)), 1)
+        index = np.searchsorted(cumulative_counts, rank)
+        percentile_values[percentile] = float(celcius[index])
+    return ROIStats(
+        pixels=count,
+        min=float(celcius[0]),
+        max=float(celcius[-1]),
+        mean=mean,
+        std=math.sqrt(variance),
+        percentiles=percentile_values,
+    )
+
+
+def _check_percentiles(percentiles: typing.Sequence[float]):
+    """Raises a ValueError if any percentile is not in [0, 100]."""
+    for percentile in percentiles:
+        if not 0 <= percentile <= 100:
+            raise ValueError(
+                f"Percentiles must be between 0 and 100, not {percentile}."
+            )
+
+
+def roi_stats(
+    metadata: typing.Mapping[str, typing.Any],
+    raw_np: np.ndarray,
+    rois: typing.Sequence[ROI],
+    percentiles: typing.Sequence[float] = (),
+    params: typing.Optional[typing.Mapping[str, typing.Any]] = None,
+) -> typing.List[ROIStats]:
+    """Calculates temperature statistics in ROIs of raw FLIR thermal data.
+
+    Parameters:
+        metadata: A list of metadata tags with calibration values.
+        raw_np: The raw thermal data as a 2-D numpy array.
+        rois: The regions of interest.
+        percentiles: The percentiles to calculate, between 0 and 100.
+        params: `raw_temp_to_celcius` parameters that override the values
+            in the metadata, e.g. `{"emissivity": 0.9}`.
+
+    Returns:
+        The statistics of each ROI, in order.
+    """
+    _check_percentiles(percentiles)
+    conversion_kwargs = _get_conversion_kwargs(metadata)
+    if params:
+        conversion_kwargs.update(params)
+    return [
+        _raw_values_stats(_select(raw_np, roi), percentiles, conversion_kwargs)
+        for roi in rois
+    ]
+
+
+def get_roi_stats_batch(
+    exiftool: ExifTool,
+    filepaths: typing.Iterable[Path],
+    rois: typing.Sequence[ROI],
+    percentiles: typing.Sequence[float] = (),
+    engine: str = "exiftool",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: typing.Optional[ThermalCache] = None,
+) -> typing.List[typing.List[ROIStats]]:
+    """Calculates temperature statistics in ROIs of multiple FLIR images.
+
+    Only a chunk of raw thermal data is in memory at a time, and no
+    full-size thermal data in Celcius is ever created.
+
+    Parameters:
+        exiftool: The ExifTool process to use.
+        filepaths: A list of paths to the files to load.
+        rois: The regions of interest, used for every file.
+        percentiles: The percentiles to calculate, between 0 and 100.
+        engine: The engine to use, see `ENGINES`.
+        chunk_size: The number of files to load in each ExifTool call.
+        cache: A cache to load raw data from, and store loaded raw data in.
+
+    Returns:
+        For each file, the statistics of each ROI.
+    """
+    _check_batch_args(engine, chunk_size)
+    _check_percentiles(percentiles)
+    str_paths = [get_str_filepath(filepath) for filepath in filepaths]
+    return [
+        roi_stats(metadata, raw_np, rois, percentiles)
+        for chunk in chunked(str_paths, chunk_size)
+        for metadata, raw_np in _get_raw_chunk(exiftool, chunk, engine, cache)
+    ]
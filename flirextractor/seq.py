@@ -0,0 +1,132 @@
+"""Streams frames from FLIR radiometric sequences (SEQ and CSQ files).
+
+A sequence is a series of FFF files, one for each frame, so frames are
+found by searching a memory-mapped file for FFF headers, without reading the
+whole sequence into memory.
+CSQ files store their raw thermal data as JPEG-LS, which needs the optional
+`imagecodecs` package to decode.
+"""
+import mmap
+import os
+import typing
+
+import numpy as np  # type: ignore
+
+from .fff import (
+    FFF_MAGICS,
+    RECORD_CAMERA_INFO,
+    RECORD_RAW_DATA,
+    FFFBuffer,
+    FFFData,
+    FFFParseError,
+    _get_records,
+    fff_length,
+    parse_camera_info,
+    parse_raw_data,
+)
+from .get_thermal import _get_conversion_kwargs, _get_converter
+from .pathutils import Path, get_str_filepath
+
+_FFF_MAGIC_SUFFIX = b"FF\0"
+"""The end of every magic in `FFF_MAGICS`, so all can be found in one search"""
+
+
+def _iter_fff_frames(data: FFFBuffer) -> typing.Iterator[bytes]:
+    """Finds each FFF file in a sequence.
+
+    Each magic in `FFF_MAGICS` is found with a single search for their
+    shared suffix, so finding every frame takes a single pass over the
+    sequence, even if some magics never appear.
+
+    Parameters:
+        data: The contents of the sequence, e.g. a memory-mapped file.
+
+    Yields:
+        The FFF file of each frame, in order.
+        A truncated last frame, e.g. from an interrupted recording,
+        is skipped.
+    """
+    pos = 1  # the suffix starts after the first byte of the magic
+    while True:
+        suffix_start = data.find(_FFF_MAGIC_SUFFIX, pos)
+        if suffix_start == -1:
+            return
+        start = suffix_start - 1
+        magic_end = suffix_start + len(_FFF_MAGIC_SUFFIX)
+        pos = suffix_start + 1  # where to search next, if not a frame
+        if data[start:magic_end] not in FFF_MAGICS:
+            continue
+        try:
+            end = start + fff_length(data, start)
+        except FFFParseError:
+            continue  # not a real FFF header, e.g. in pixel data
+        if end > len(data):
+            return
+        yield data[start:end]
+        pos = end + 1
+
+
+def iter_raw_frames(filepath: Path) -> typing.Iterator[FFFData]:
+    """Lazily reads the raw thermal data of each frame in a FLIR sequence.
+
+    The CameraInfo record is only parsed again if it changes, so frames
+    with the same calibration share the same `metadata` dict.
+
+    Parameters:
+        filepath: The path to the SEQ or CSQ file.
+
+    Yields:
+        The calibration constants and raw thermal data of each frame.
+
+    Raises:
+        FFFParseError if a frame could not be parsed.
+    """
+    with open(get_str_filepath(filepath), "rb") as seq_file:
+        if os.fstat(seq_file.fileno()).st_size == 0:
+            return  # can't mmap an empty file
+        with mmap.mmap(seq_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            camera_info = None
+            metadata: typing.Dict[str, float] = {}
+            for frame in _iter_fff_frames(data):
+                raw_record, camera_info_record = _get_records(
+                    frame, RECORD_RAW_DATA, RECORD_CAMERA_INFO
+                )
+                if camera_info_record.data != camera_info:
+                    camera_info = camera_info_record.data
+                    metadata = parse_camera_info(camera_info)
+                yield FFFData(
+                    metadata=metadata, raw=parse_raw_data(raw_record.data)
+                )
+
+
+def iter_frames(
+    filepath: Path,
+    dtype: typing.Optional[np.dtype] = None,
+    params: typing.Optional[typing.Mapping[str, typing.Any]] = None,
+) -> typing.Iterator[np.ndarray]:
+    """Lazily reads each frame in a FLIR sequence in Celcius.
+
+    The conversion parameters are only recalculated when the calibration
+    changes, so most frames are converted with the same cached lookup table
+    (see `raw_temp_to_celcius_lut`).
+
+    Parameters:
+        filepath: The path to the SEQ or CSQ file.
+        dtype: The floating point type of the output
+            (default: `np.float64`).
+        params: `raw_temp_to_celcius` parameters that override the values
+            in the metadata, e.g. `{"emissivity": 0.9}`.
+
+    Yields:
+        The thermal data in Celcius of each frame as a 2-D numpy array.
+    """
+    metadata = None
+    kwargs: typing.Dict[str, typing.Any] = {}
+    for frame_metadata, raw_np in iter_raw_frames(filepath):
+        if frame_metadata is not metadata:
+            metadata = frame_metadata
+            kwargs = _get_conversion_kwargs(metadata)
+            if params:
+                kwargs.update(params)
+        convert = _get_converter(raw_np)
+        yield convert(raw_np, dtype=dtype, **kwargs)
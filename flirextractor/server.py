@@ -0,0 +1,438 @@
+"""A local daemon that keeps warm ExifTool processes, and a client for it.
+
+Starting Python, NumPy and ExifTool can take longer than converting a
+handful of images, so short-lived scripts can instead ask a long-running
+`flirextractor serve` daemon to load images, over a Unix domain socket.
+
+Each message is a 4-byte big-endian length, followed by a JSON header.
+Responses with thermal data are followed by the raw bytes of each array,
+back-to-back, as described by the header, so that the client can read them
+straight into numpy arrays, without pickling or copying.
+
+Example:
+    # in a shell: flirextractor serve --workers 4
+    with FlirClient() as client:
+        thermal_data = client.get_thermal("path/to/FLIR.jpg")
+"""
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import threading
+import typing
+
+import numpy as np  # type: ignore
+
+from .defaults import default_socket_path
+from .fff import FFFParseError
+from .get_thermal import ExifToolTimeoutError
+from .pathutils import Path
+
+if typing.TYPE_CHECKING:
+    from .pool import FlirExtractorPool  # noqa: F401
+
+
+def _make_private_directory(directory: str):
+    """Creates a directory that only the current user can access.
+
+    Raises:
+        PermissionError if the directory already exists, but is not owned
+        by the current user, or other users can access it.
+    """
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    status = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(status.st_mode)
+        or status.st_uid != os.getuid()
+        or status.st_mode & 0o077
+    ):
+        raise PermissionError(
+            f"{directory} must be a directory that only the current user "
+            "can access."
+        )
+
+
+def _check_peer_uid(sock: socket.socket):
+    """Checks that the process on the other end of a Unix domain socket is
+    run by the current user, on platforms that support `SO_PEERCRED`.
+
+    Raises:
+        PermissionError if the process is run by a different user.
+    """
+    if not hasattr(socket, "SO_PEERCRED"):
+        return
+    credentials = sock.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, _PEER_CREDENTIALS.size
+    )
+    _, uid, _ = _PEER_CREDENTIALS.unpack(credentials)
+    if uid != os.getuid():
+        raise PermissionError(
+            f"The daemon at {sock.getpeername()} is run by another user "
+            f"(uid {uid})."
+        )
+
+
+_LENGTH = struct.Struct("!I")
+"""The length prefix of each JSON header"""
+_PEER_CREDENTIALS = struct.Struct("3i")
+"""The pid, uid and gid returned by `SO_PEERCRED`"""
+_REMOTE_EXCEPTIONS = (
+    FFFParseError,
+    ExifToolTimeoutError,
+    FileNotFoundError,
+    IsADirectoryError,
+    PermissionError,
+    OSError,
+    ValueError,
+    TypeError,
+)
+"""Exceptions that are raised again by the client.
+
+Any other exception is raised as its nearest base class in this tuple,
+see `_remote_type`, or else as a `ServerError`.
+"""
+_remote_exceptions_by_name = {
+    exception_type.__name__: exception_type
+    for exception_type in _REMOTE_EXCEPTIONS
+}
+
+
+def _remote_type(exception: BaseException) -> typing.Optional[str]:
+    """The name of the nearest base class of an exception that is in
+    `_REMOTE_EXCEPTIONS`, or `None` if there isn't one."""
+    for base in type(exception).__mro__:
+        if base in _REMOTE_EXCEPTIONS:
+            return base.__name__
+    return None
+
+
+class ServerError(RuntimeError):
+    """Raised by `FlirClient` for unexpected errors in the daemon."""
+
+
+def _send_message(
+    sock: socket.socket,
+    header: typing.Mapping[str, typing.Any],
+    arrays: typing.Sequence[np.ndarray] = (),
+):
+    """Sends a JSON header, followed by the bytes of each array."""
+    encoded = json.dumps(header).encode("utf-8")
+    sock.sendall(_LENGTH.pack(len(encoded)) + encoded)
+    for array in arrays:
+        sock.sendall(memoryview(array).cast("B"))
+
+
+def _recv_into(sock: socket.socket, buffer: memoryview):
+    """Fills a buffer from a socket, raising EOFError if it closes."""
+    while len(buffer):
+        received = sock.recv_into(buffer)
+        if not received:
+            raise EOFError("Connection closed.")
+        buffer = buffer[received:]
+
+
+def _recv_header(sock: socket.socket) -> typing.Dict[str, typing.Any]:
+    """Receives a JSON header."""
+    length = bytearray(_LENGTH.size)
+    _recv_into(sock, memoryview(length))
+    (header_length,) = _LENGTH.unpack(length)
+    encoded = bytearray(header_length)
+    _recv_into(sock, memoryview(encoded))
+    return json.loads(encoded.decode("utf-8"))
+
+
+def _recv_arrays(
+    sock: socket.socket,
+    descriptions: typing.Sequence[typing.Mapping[str, typing.Any]],
+) -> typing.List[np.ndarray]:
+    """Receives the bytes of each array described in a header."""
+    arrays = []
+    for description in descriptions:
+        array = np.empty(description["shape"], dtype=description["dtype"])
+        _recv_into(sock, memoryview(array).cast("B"))
+        arrays.append(array)
+    return arrays
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """Handles every request of a single client connection."""
+
+    server: "_FlirServer"
+
+    def handle(self):
+        while True:
+            try:
+                request = _recv_header(self.request)
+            except EOFError:
+                return  # client disconnected
+            try:
+                response, arrays = self.server.dispatch(request)
+            except Exception as e:
+                error = dict(
+                    type=type(e).__name__,
+                    remote_type=_remote_type(e),
+                    message=str(e),
+                )
+                response, arrays = dict(error=error), []
+            try:
+                _send_message(self.request, response, arrays)
+            except (BrokenPipeError, ConnectionResetError):
+                return  # client disconnected before reading the response
+
+
+class _FlirServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves requests from a `FlirExtractorPool`."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, pool: "FlirExtractorPool"):
+        self.pool = pool
+        super().__init__(socket_path, _RequestHandler)
+
+    def server_bind(self):
+        # only the current user can connect, as the daemon can read any of
+        # their files
+        old_umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(old_umask)
+
+    def dispatch(
+        self, request: typing.Mapping[str, typing.Any]
+    ) -> typing.Tuple[typing.Dict[str, typing.Any], typing.List[np.ndarray]]:
+        """Runs a single request from a client.
+
+        Not named `handle_request`, which would override
+        `socketserver.BaseServer.handle_request`.
+
+        Returns:
+            The response header, and the arrays to send after it.
+        """
+        method = request.get("method")
+        if method == "ping":
+            return dict(pid=os.getpid()), []
+        if method == "get_thermal_batch":
+            arrays = [
+                np.ascontiguousarray(thermal_data)
+                for thermal_data in self.pool.get_thermal_batch(
+                    request["filepaths"]
+                )
+            ]
+            descriptions = [
+                dict(dtype=array.dtype.str, shape=array.shape)
+                for array in arrays
+            ]
+            return dict(arrays=descriptions), arrays
+        raise ValueError(f"Unknown method {method}.")
+
+
+def _remove_stale_socket(socket_path: str):
+    """Removes the socket of a daemon that is no longer running.
+
+    Raises:
+        OSError if a daemon is already listening on the socket.
+    """
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(socket_path)
+            return
+    raise OSError(f"A daemon is already listening on {socket_path}.")
+
+
+def serve(
+    socket_path: typing.Optional[str] = None,
+    ready: typing.Optional[threading.Event] = None,
+    stop: typing.Optional[threading.Event] = None,
+    **pool_kwargs: typing.Any,
+):
+    """Runs a daemon that loads FLIR images for `FlirClient`s.
+
+    Blocks until interrupted (e.g. with Ctrl+C), or until `stop` is set.
+
+    Parameters:
+        socket_path: The Unix domain socket to listen on
+            (default: `default_socket_path()`).
+        ready: Set once the daemon is listening.
+        stop: Stops the daemon when set, e.g. from another thread.
+        **pool_kwargs: Passed to `FlirExtractorPool`, e.g. `workers=4`.
+            Every ExifTool process is started in the background by default,
+            so that they are warm by the first request.
+    """
+    from .pool import FlirExtractorPool
+
+    if socket_path is None:
+        socket_path = default_socket_path()
+        _make_private_directory(os.path.dirname(socket_path))
+    pool_kwargs.setdefault("exiftool_start", "background")
+    _remove_stale_socket(socket_path)
+    with FlirExtractorPool(**pool_kwargs) as pool:
+        server = _FlirServer(socket_path, pool)
+        try:
+            if stop is not None:
+
+                def wait_for_stop():
+                    stop.wait()
+                    server.shutdown()
+
+                threading.Thread(target=wait_for_stop, daemon=True).start()
+            if ready is not None:
+                ready.set()
+            server.serve_forever()
+        finally:
+            server.server_close()
+            os.unlink(socket_path)
+
+
+class FlirClient:
+    """Loads FLIR images using a `flirextractor serve` daemon.
+
+    Has the same API as `FlirExtractor`, but starts instantly, as the
+    daemon's ExifTool processes are already running.
+    The connection is thread-safe, but requests are sent one at a time.
+    Errors in the daemon are raised as the nearest exception type in
+    `_REMOTE_EXCEPTIONS`, e.g. `NotADirectoryError` as `OSError`,
+    or else as a `ServerError`.
+
+    Attributes:
+        socket_path: The Unix domain socket of the daemon.
+
+    Example:
+        with FlirClient() as client:
+            thermal_d_list = client.get_thermal_batch(
+                ["./FLIR1.jpg", "./FLIR2.jpg"]
+            )
+    """
+
+    socket_path: str
+    _socket: typing.Optional[socket.socket]
+    _lock: threading.Lock
+
+    def __init__(self, socket_path: typing.Optional[str] = None):
+        if socket_path is None:
+            socket_path = default_socket_path()
+        self.socket_path = socket_path
+        self._socket = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Connects to the daemon.
+
+        Not recommended, use `with:` context manager instead.
+
+        Raises:
+            ConnectionError if no daemon is listening on the socket.
+            PermissionError if the daemon is run by another user.
+        """
+        if self._socket is not None:
+            raise Exception("FlirClient was already connected.")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise ConnectionError(
+                f"Could not connect to a daemon at {self.socket_path}. "
+                "Start one with `flirextractor serve`."
+            ) from e
+        try:
+            _check_peer_uid(sock)
+        except BaseException:
+            sock.close()
+            raise
+        self._socket = sock
+
+    def close(self):
+        """Disconnects from the daemon.
+
+        Not recommended, use `with:` context manager instead.
+        """
+        if self._socket is None:
+            return  # already closed, do nothing
+        self._socket.close()
+        self._socket = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+    def _request(
+        self, request: typing.Mapping[str, typing.Any]
+    ) -> typing.Tuple[typing.Dict[str, typing.Any], typing.List[np.ndarray]]:
+        """Sends a request, and receives the response and its arrays."""
+        sock = self._socket
+        if sock is None:
+            raise AttributeError(
+                "FlirClient was not connected. "
+                "Use FlirClient in a context manager, e.g. \n"
+                "with FlirClient() as e:\n"
+                "    e.do_magic()"
+            )
+        with self._lock:
+            _send_message(sock, request)
+            response = _recv_header(sock)
+            arrays = _recv_arrays(sock, response.get("arrays", ()))
+        error = response.get("error")
+        if error is not None:
+            exception_type = _remote_exceptions_by_name.get(
+                error.get("remote_type")
+            )
+            if exception_type is None:
+                raise ServerError(f"{error['type']}: {error['message']}")
+            if exception_type.__name__ == error["type"]:
+                raise exception_type(error["message"])
+            raise exception_type(f"{error['type']}: {error['message']}")
+        return response, arrays
+
+    def ping(self) -> int:
+        """Checks that the daemon is running.
+
+        Returns:
+            The process ID of the daemon.
+        """
+        response, _ = self._request(dict(method="ping"))
+        return response["pid"]
+
+    def get_thermal(self, filepath: Path) -> np.ndarray:
+        """Gets a thermal image from a FLIR file.
+
+        Parameters:
+            filepath: The path to the FLIR file.
+
+        Returns:
+            The thermal data in Celcius as a 2-D numpy array.
+        """
+        return self.get_thermal_batch((filepath,))[0]
+
+    def get_thermal_batch(
+        self, filepaths: typing.Iterable[Path]
+    ) -> typing.List[np.ndarray]:
+        """Gets thermal images from a list of FLIR files.
+
+        Parameters:
+            filepaths: The paths to the FLIR files. Relative paths are
+                relative to this process's working directory, not the
+                daemon's.
+
+        Returns:
+            A list of the thermal data in Celcius as 2-D numpy arrays.
+        """
+        str_paths = [
+            os.path.abspath(os.fspath(filepath)) for filepath in filepaths
+        ]
+        _, arrays = self._request(
+            dict(method="get_thermal_batch", filepaths=str_paths)
+        )
+        return arrays
@@ -0,0 +1,390 @@
+"""Creates synthetic radiometric FLIR JPGs with known raw data.
+
+The files have the same layout as real FLIR JPGs (an FFF file with RawData
+and CameraInfo records, split over JPEG APP1 segments), so they can be
+loaded with ExifTool or `flirextractor.fff`. As the raw data and calibration
+constants are known exactly, they are useful for benchmarks, and as ground
+truth for testing the conversion into Celcius.
+
+Example:
+    image = make_flir_image((240, 320), raw_format="png", seed=0)
+    pathlib.Path("synthetic.jpg").write_bytes(image.data)
+    with FlirExtractor() as extractor:
+        thermal_data = extractor.get_thermal("synthetic.jpg")
+    expected = convert_image(image.metadata, image.raw)
+"""
+import io
+import os
+import pathlib
+import struct
+import typing
+
+import numpy as np  # type: ignore
+from PIL import Image  # type: ignore
+
+from .fff import (
+    _FFF_HEADER_SIZE,
+    _RAW_DATA_HEADER_SIZE,
+    _RECORD_ENTRY_SIZE,
+    FLIR_APP1_HEADER,
+    JPEG_SOI,
+    RECORD_CAMERA_INFO,
+    RECORD_EMBEDDED_IMAGE,
+    RECORD_PIP,
+    RECORD_RAW_DATA,
+    _camera_info_tags,
+    _kelvin_camera_info_tags,
+    _pip_tags,
+    parse_pip,
+)
+from .pathutils import Path
+from .raw_temp_to_celcius import CELCIUS_KELVIN_DIFF
+
+RAW_FORMATS = ("tiff", "png")
+"""Formats of the synthetic raw thermal data.
+
+- `tiff`: Uncompressed 16-bit data, which ExifTool outputs as a TIFF.
+- `png`: A 16-bit PNG with swapped bytes, like most newer FLIR cameras.
+"""
+BYTE_ORDERS = ("<", ">")
+"""Byte orders of the synthetic FFF file, little- or big-endian"""
+
+DEFAULT_CALIBRATION = dict(
+    Emissivity=0.95,
+    SubjectDistance=1.0,
+    ReflectedApparentTemperature=20.0,
+    AtmosphericTemperature=20.0,
+    IRWindowTemperature=20.0,
+    IRWindowTransmission=1.0,
+    RelativeHumidity=0.5,
+    PlanckR1=21106.77,
+    PlanckB=1501.0,
+    PlanckF=1.0,
+    AtmosphericTransAlpha1=0.006569,
+    AtmosphericTransAlpha2=0.01262,
+    AtmosphericTransBeta1=-0.002276,
+    AtmosphericTransBeta2=-0.00667,
+    AtmosphericTransX=1.9,
+    PlanckO=-7340,
+    PlanckR2=0.012545258,
+)
+"""The calibration constants of a FLIR E5, in the units ExifTool uses"""
+
+_APP1_PAYLOAD_SIZE = 0xFFFF - 2 - len(FLIR_APP1_HEADER) - 3
+"""The largest FFF chunk that fits in a JPEG APP1 segment"""
+_CAMERA_INFO_SIZE = 0x400
+
+
+class SyntheticFlirImage(typing.NamedTuple):
+    """A synthetic FLIR JPG, and the values it contains.
+
+    Attributes:
+        data: The contents of the FLIR JPG.
+        raw: The raw thermal data.
+        metadata: The calibration constants, as they are stored in the file,
+            i.e. rounded to 32-bit floats, as ExifTool would load them.
+        visual: The embedded visual image, if any.
+        alignment: The PiP tags, as they are stored in the file, if any.
+    """
+
+    data: bytes
+    raw: np.ndarray
+    metadata: typing.Dict[str, float]
+    visual: typing.Optional[np.ndarray] = None
+    alignment: typing.Optional[typing.Dict[str, float]] = None
+
+
+def make_raw(
+    shape: typing.Tuple[int, int], seed: typing.Optional[int] = None
+) -> np.ndarray:
+    """Creates realistic raw thermal data: a warm blob on a noisy gradient.
+
+    Parameters:
+        shape: The `(height, width)` of the data.
+        seed: The random seed, for reproducible noise.
+
+    Returns:
+        A 2-D `np.uint16` array, with values between roughly 16000 and
+        21000 (about 10 °C to 50 °C with `DEFAULT_CALIBRATION`).
+    """
+    height, width = shape
+    rng = np.random.RandomState(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    background = 16500 + 1500 * x / max(width - 1, 1)
+    center_y, center_x = rng.uniform(0.25, 0.75, 2) * (height, width)
+    radius = max(min(height, width) / 6, 1)
+    blob = 3000 * np.exp(
+        -((y - center_y) ** 2 + (x - center_x) ** 2) / (2 * radius ** 2)
+    )
+    noise = rng.normal(0, 20, shape)
+    return np.clip(background + blob + noise, 0, 0xFFFF).astype(np.uint16)
+
+
+def stored_metadata(
+    calibration: typing.Mapping[str, float] = DEFAULT_CALIBRATION,
+) -> typing.Dict[str, float]:
+    """Gets the metadata that is loaded from a synthetic FLIR JPG.
+
+    Parameters:
+        calibration: The calibration constants the file was created with.
+
+    Returns:
+        The calibration constants, rounded like storing them in a
+        CameraInfo record.
+    """
+    metadata = {}
+    for tag, (_, fmt) in _camera_info_tags.items():
+        value = calibration[tag]
+        if tag in _kelvin_camera_info_tags:
+            kelvin = float(np.float32(value + CELCIUS_KELVIN_DIFF))
+            metadata[tag] = kelvin - CELCIUS_KELVIN_DIFF
+        elif fmt == "f":
+            metadata[tag] = float(np.float32(value))
+        else:
+            metadata[tag] = float(int(value))
+    return metadata
+
+
+def _make_camera_info(
+    calibration: typing.Mapping[str, float], byte_order: str
+) -> bytes:
+    """Creates a CameraInfo record with the given calibration constants."""
+    record = bytearray(_CAMERA_INFO_SIZE)
+    struct.pack_into(f"{byte_order}H", record, 0, 2)
+    for tag, (offset, fmt) in _camera_info_tags.items():
+        value = calibration[tag]
+        if tag in _kelvin_camera_info_tags:
+            value += CELCIUS_KELVIN_DIFF
+        if fmt == "i":
+            value = int(value)
+        struct.pack_into(f"{byte_order}{fmt}", record, offset, value)
+    return bytes(record)
+
+
+def _make_raw_data(raw: np.ndarray, raw_format: str, byte_order: str) -> bytes:
+    """Creates a RawData record containing the raw thermal data."""
+    height, width = raw.shape
+    header = struct.pack(
+        f"{byte_order}6H2xH2xH",
+        2,
+        width,
+        height,
+        0,
+        0,
+        0,
+        width - 1,
+        height - 1,
+    ).ljust(_RAW_DATA_HEADER_SIZE, b"\0")
+    if raw_format == "png":
+        # FLIR PNGs have the wrong byte order, see `decode_flir_png`
+        png = io.BytesIO()
+        Image.fromarray(raw.byteswap()).save(png, "PNG")
+        return header + png.getvalue()
+    if raw_format == "tiff":
+        return header + raw.astype(f"{byte_order}u2").tobytes()
+    raise ValueError(f"Unknown raw_format {raw_format}, not in {RAW_FORMATS}.")
+
+
+def _make_embedded_image(visual: np.ndarray, byte_order: str) -> bytes:
+    """Creates an EmbeddedImage record containing a lossless PNG, so that
+    the decoded visual image is exactly `visual`."""
+    height, width = visual.shape[:2]
+    header = struct.pack(f"{byte_order}3H", 2, width, height).ljust(
+        _RAW_DATA_HEADER_SIZE, b"\0"
+    )
+    png = io.BytesIO()
+    Image.fromarray(visual).save(png, "PNG")
+    return header + png.getvalue()
+
+
+def _make_pip(alignment: typing.Mapping[str, float], byte_order: str) -> bytes:
+    """Creates a PiP record with the given alignment tags."""
+    record = bytearray(0x10)
+    for tag, (offset, fmt) in _pip_tags.items():
+        value = alignment.get(tag, 0)
+        if fmt != "f":
+            value = int(value)
+        struct.pack_into(f"{byte_order}{fmt}", record, offset, value)
+    return bytes(record)
+
+
+def make_fff(
+    raw: np.ndarray,
+    calibration: typing.Mapping[str, float] = DEFAULT_CALIBRATION,
+    raw_format: str = "tiff",
+    byte_order: str = "<",
+    visual: typing.Optional[np.ndarray] = None,
+    alignment: typing.Optional[typing.Mapping[str, float]] = None,
+) -> bytes:
+    """Creates an FFF file with RawData and CameraInfo records.
+
+    Parameters:
+        raw: The raw thermal data, as a 2-D `np.uint16` array.
+        calibration: The calibration constants, see `DEFAULT_CALIBRATION`.
+        raw_format: The format of the raw data, see `RAW_FORMATS`.
+        byte_order: The byte order of the FFF file, see `BYTE_ORDERS`.
+        visual: If given, an RGB `np.uint8` image to store in an
+            EmbeddedImage record.
+        alignment: If given, the PiP tags (e.g. `Real2IR`) to store in a
+            PiP record.
+
+    Returns:
+        The FFF file.
+    """
+    if byte_order not in BYTE_ORDERS:
+        raise ValueError(
+            f"Unknown byte_order {byte_order}, not in {BYTE_ORDERS}."
+        )
+    records = [
+        (RECORD_RAW_DATA, 2, _make_raw_data(raw, raw_format, byte_order)),
+        (RECORD_CAMERA_INFO, 1, _make_camera_info(calibration, byte_order)),
+    ]
+    if visual is not None:
+        embedded_image = _make_embedded_image(visual, byte_order)
+        records.append((RECORD_EMBEDDED_IMAGE, 3, embedded_image))
+    if alignment is not None:
+        records.append((RECORD_PIP, 1, _make_pip(alignment, byte_order)))
+    header = bytearray(_FFF_HEADER_SIZE)
+    header[:4] = b"FFF\0"
+    header[4:20] = b"flirextractor".ljust(16, b"\0")
+    struct.pack_into(
+        f"{byte_order}III", header, 0x14, 100, _FFF_HEADER_SIZE, len(records)
+    )
+    directory = b""
+    offset = _FFF_HEADER_SIZE + len(records) * _RECORD_ENTRY_SIZE
+    for record_type, subtype, record in records:
+        directory += struct.pack(
+            f"{byte_order}HHIIII",
+            record_type,
+            subtype,
+            100,
+            1,
+            offset,
+            len(record),
+        ).ljust(_RECORD_ENTRY_SIZE, b"\0")
+        offset += len(record)
+    return b"".join(
+        [bytes(header), directory, *(record for *_, record in records)]
+    )
+
+
+def _make_preview_jpeg(raw: np.ndarray) -> bytes:
+    """Creates a greyscale JPEG of the raw data, like a camera's preview."""
+    low, high = float(raw.min()), float(raw.max())
+    scaled = (raw - low) * (255 / max(high - low, 1))
+    preview = io.BytesIO()
+    Image.fromarray(scaled.astype(np.uint8)).save(preview, "JPEG")
+    return preview.getvalue()
+
+
+def embed_fff(jpeg: bytes, fff: bytes) -> bytes:
+    """Embeds an FFF file in a JPEG, as FLIR APP1 segments.
+
+    Parameters:
+        jpeg: The visible JPEG image.
+        fff: The FFF file, e.g. from `make_fff`.
+
+    Returns:
+        The FLIR JPG.
+    """
+    if jpeg[:2] != JPEG_SOI:
+        raise ValueError("jpeg is not a JPEG.")
+    payloads = []
+    for start in range(0, len(fff), _APP1_PAYLOAD_SIZE):
+        end = start + _APP1_PAYLOAD_SIZE
+        payloads.append(fff[start:end])
+    if len(payloads) > 0x100:
+        raise ValueError("FFF file is too large to embed in a JPEG.")
+    segments = []
+    for index, payload in enumerate(payloads):
+        segment = (
+            FLIR_APP1_HEADER
+            + bytes((1, index, len(payloads) - 1))
+            + payload
+        )
+        segments.append(
+            b"\xff\xe1" + struct.pack(">H", len(segment) + 2) + segment
+        )
+    return JPEG_SOI + b"".join(segments) + jpeg[2:]
+
+
+def make_flir_image(
+    shape: typing.Tuple[int, int] = (480, 640),
+    raw_format: str = "tiff",
+    byte_order: str = "<",
+    calibration: typing.Mapping[str, float] = DEFAULT_CALIBRATION,
+    seed: typing.Optional[int] = None,
+    raw: typing.Optional[np.ndarray] = None,
+    visual: typing.Optional[np.ndarray] = None,
+    alignment: typing.Optional[typing.Mapping[str, float]] = None,
+) -> SyntheticFlirImage:
+    """Creates a synthetic FLIR JPG.
+
+    Parameters:
+        shape: The `(height, width)` of the thermal sensor.
+        raw_format: The format of the raw data, see `RAW_FORMATS`.
+        byte_order: The byte order of the FFF file, see `BYTE_ORDERS`.
+        calibration: The calibration constants, see `DEFAULT_CALIBRATION`.
+        seed: The random seed of `make_raw`.
+        raw: The raw thermal data to use, instead of `make_raw`.
+        visual: An RGB `np.uint8` image to embed, see `make_fff`.
+        alignment: The PiP tags to embed, see `make_fff`.
+
+    Returns:
+        The FLIR JPG, and the raw data and metadata it contains.
+    """
+    if raw is None:
+        raw = make_raw(shape, seed)
+    fff = make_fff(
+        raw, calibration, raw_format, byte_order, visual, alignment
+    )
+    return SyntheticFlirImage(
+        data=embed_fff(_make_preview_jpeg(raw), fff),
+        raw=raw,
+        metadata=stored_metadata(calibration),
+        visual=visual,
+        alignment=(
+            None
+            if alignment is None
+            else parse_pip(_make_pip(alignment, byte_order), byte_order)
+        ),
+    )
+
+
+def write_flir_images(
+    directory: Path,
+    count: int,
+    unique: typing.Optional[int] = None,
+    **kwargs: typing.Any,
+) -> typing.List[pathlib.Path]:
+    """Writes synthetic FLIR JPGs to a directory.
+
+    Parameters:
+        directory: The directory to write the files to.
+        count: The number of files to write.
+        unique: If given, only this many different files are created,
+            and the rest are hard links to them (or copies, if hard links
+            are not supported), to save time and disk space.
+        **kwargs: Passed to `make_flir_image`, except for `seed`,
+            which is the index of each unique file.
+
+    Returns:
+        The paths to the files.
+    """
+    directory = pathlib.Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    unique = count if unique is None else max(min(unique, count), 1)
+    filepaths: typing.List[pathlib.Path] = []
+    for index in range(count):
+        filepath = directory / f"IR_{index:06d}.jpg"
+        if index < unique:
+            image = make_flir_image(seed=index, **kwargs)
+            filepath.write_bytes(image.data)
+        else:
+            source = filepaths[index % unique]
+            try:
+                os.link(source, filepath)
+            except OSError:
+                filepath.write_bytes(source.read_bytes())
+        filepaths.append(filepath)
+    return filepaths
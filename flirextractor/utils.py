@@ -1,5 +1,6 @@
 """Stores utilility functions that don't go anywhere else.
 """
+import itertools
 import typing
 
 V = typing.TypeVar("V")
@@ -25,3 +26,27 @@ def split_dict(
         if key in excluded_dict
     }
     return included_dict, excluded_dict
+
+
+def chunked(
+    iterable: typing.Iterable[V], chunk_size: int
+) -> typing.Iterator[typing.List[V]]:
+    """Splits an iterable into lists of at most `chunk_size` items.
+
+    Consumes the iterable lazily, so it can be used on unbounded iterables.
+
+    Parameters:
+        iterable: The iterable to split.
+        chunk_size: The maximum size of each chunk.
+
+    Yields:
+        Lists of at most `chunk_size` items, in order.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive, not {chunk_size}.")
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
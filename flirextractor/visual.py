@@ -0,0 +1,345 @@
+"""Loads the embedded visual image of FLIR images, and registers it to the
+thermal image.
+
+FLIR cameras store a visual photo in an EmbeddedImage record, and how it
+lines up with the thermal image in a PiP (picture in picture) record.
+`get_thermal_visual_batch` loads the thermal data, the visual image and the
+alignment of each file at once, with a single ExifTool call per chunk, or
+by parsing each file once with the `native` engine.
+
+Example:
+    with FlirExtractor() as extractor:
+        image = extractor.get_thermal_visual("path/to/FLIR.jpg")
+    registered = image.register()  # the visual image on the thermal grid
+    hot_colours = registered[image.thermal > 50]
+"""
+import base64
+import io
+import typing
+
+import numpy as np  # type: ignore
+from exiftool import ExifTool  # type: ignore
+
+from .fff import FFFParseError, load_flir_visual_data
+from .get_thermal import (
+    _BASE64_PREFIX,
+    DEFAULT_CHUNK_SIZE,
+    _check_batch_args,
+    _decode_and_convert,
+    _execute_json,
+    _parse_raw_batch,
+    _raw_batch_params,
+    _split_by_size,
+)
+from .instrument import stage
+from .pathutils import Path, get_str_filepath
+from .utils import chunked
+
+EMBEDDED_IMAGE_TAG = "EmbeddedImage"
+"""The EXIF metadata tag name of the embedded visual image"""
+ALIGNMENT_TAGS = (
+    "Real2IR",
+    "OffsetX",
+    "OffsetY",
+    "PiPX1",
+    "PiPX2",
+    "PiPY1",
+    "PiPY2",
+)
+"""The EXIF metadata tag names of the alignment, in `Alignment` order"""
+INTERPOLATIONS = ("nearest", "bilinear")
+"""Interpolation methods of `register_visual`"""
+
+
+class Alignment(typing.NamedTuple):
+    """How the embedded visual image lines up with the thermal image.
+
+    Attributes:
+        real2ir: How many times wider the field of view of the visual image
+            is than that of the thermal image.
+        offset_x: The horizontal offset of the centre of the thermal field
+            of view from the centre of the visual image, in visual pixels.
+        offset_y: The vertical offset, like `offset_x`.
+        pip_x1: The left of the picture in picture shown by the camera.
+        pip_x2: The right of the picture in picture.
+        pip_y1: The top of the picture in picture.
+        pip_y2: The bottom of the picture in picture.
+    """
+
+    real2ir: float
+    offset_x: int
+    offset_y: int
+    pip_x1: int
+    pip_x2: int
+    pip_y1: int
+    pip_y2: int
+
+
+def _make_alignment(
+    tags: typing.Mapping[str, typing.Any]
+) -> typing.Optional[Alignment]:
+    """Creates an `Alignment` from `ALIGNMENT_TAGS`, if there are any."""
+    if "Real2IR" not in tags:
+        return None
+    real2ir, *pip_values = (tags.get(tag, 0) for tag in ALIGNMENT_TAGS)
+    return Alignment(float(real2ir), *(int(value) for value in pip_values))
+
+
+def _bilinear_axis(
+    coordinates: np.ndarray, size: int
+) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Finds the neighbouring pixels of each coordinate along one axis.
+
+    Returns:
+        The `low` and `high` neighbouring indexes, and the weight of `high`.
+    """
+    low = np.clip(np.floor(coordinates), 0, size - 1).astype(np.intp)
+    high = np.minimum(low + 1, size - 1)
+    weight = np.clip(coordinates - low, 0, 1)
+    return low, high, weight
+
+
+def register_visual(
+    visual: np.ndarray,
+    thermal_shape: typing.Tuple[int, int],
+    alignment: Alignment,
+    interpolation: str = "bilinear",
+    fill: typing.Any = 0,
+) -> np.ndarray:
+    """Resamples and crops a visual image onto the thermal image's grid.
+
+    The thermal field of view is centred on the centre of the visual image
+    plus the alignment offsets, and is `real2ir` times narrower than the
+    visual image. As this is only a scale and a shift, every row and column
+    is resampled at once, with vectorised indexing.
+
+    Parameters:
+        visual: The visual image, as a `(H, W)` or `(H, W, C)` array.
+        thermal_shape: The `(height, width)` of the thermal image.
+        alignment: The alignment of the images, see `Alignment`.
+        interpolation: How to resample the visual image,
+            see `INTERPOLATIONS`.
+        fill: The value of thermal pixels outside the visual image.
+
+    Returns:
+        The visual image on the thermal grid, with shape
+        `thermal_shape + visual.shape[2:]`, and the dtype of `visual`.
+    """
+    if interpolation not in INTERPOLATIONS:
+        raise ValueError(
+            f"Unknown interpolation {interpolation}, "
+            f"must be in {INTERPOLATIONS}."
+        )
+    if alignment.real2ir <= 0:
+        raise ValueError(f"Invalid Real2IR {alignment.real2ir}.")
+    visual_height, visual_width = visual.shape[:2]
+    height, width = thermal_shape
+    # visual pixels per thermal pixel, which are square in both images
+    scale = visual_width / alignment.real2ir / width
+    # the visual pixel coordinates of the centre of each thermal pixel
+    x = (
+        visual_width / 2
+        + alignment.offset_x
+        + (np.arange(width) + 0.5 - width / 2) * scale
+        - 0.5
+    )
+    y = (
+        visual_height / 2
+        + alignment.offset_y
+        + (np.arange(height) + 0.5 - height / 2) * scale
+        - 0.5
+    )
+    channels = (1,) * (visual.ndim - 2)  # to broadcast weights over colours
+    if interpolation == "nearest":
+        x_index = np.clip(np.rint(x), 0, visual_width - 1).astype(np.intp)
+        y_index = np.clip(np.rint(y), 0, visual_height - 1).astype(np.intp)
+        registered = visual[y_index[:, np.newaxis], x_index]
+    else:
+        left, right, x_weight = _bilinear_axis(x, visual_width)
+        top, bottom, y_weight = _bilinear_axis(y, visual_height)
+        x_weight = x_weight.reshape((1, width, *channels))
+        y_weight = y_weight.reshape((height, 1, *channels))
+        top_rows = visual[top[:, np.newaxis], left] * (1 - x_weight)
+        top_rows += visual[top[:, np.newaxis], right] * x_weight
+        bottom_rows = visual[bottom[:, np.newaxis], left] * (1 - x_weight)
+        bottom_rows += visual[bottom[:, np.newaxis], right] * x_weight
+        registered = top_rows * (1 - y_weight) + bottom_rows * y_weight
+        if np.issubdtype(visual.dtype, np.integer):
+            np.rint(registered, out=registered)
+        registered = registered.astype(visual.dtype)
+    inside_x = (x >= -0.5) & (x <= visual_width - 0.5)
+    inside_y = (y >= -0.5) & (y <= visual_height - 0.5)
+    registered[~(inside_y[:, np.newaxis] & inside_x)] = fill
+    return registered
+
+
+class ThermalVisualImage(typing.NamedTuple):
+    """The thermal data, embedded visual image and alignment of a FLIR image.
+
+    Attributes:
+        thermal: The thermal data in Celcius as a 2-D numpy array.
+        visual: The embedded visual image as a `(H, W, 3)` RGB `np.uint8`
+            array, or `None` if the file doesn't have one.
+        alignment: How the visual image lines up with the thermal image,
+            or `None` if the file doesn't say.
+    """
+
+    thermal: np.ndarray
+    visual: typing.Optional[np.ndarray]
+    alignment: typing.Optional[Alignment]
+
+    def register(
+        self, interpolation: str = "bilinear", fill: typing.Any = 0
+    ) -> np.ndarray:
+        """Resamples and crops the visual image onto the thermal grid,
+        see `register_visual`.
+
+        Raises:
+            ValueError if there is no visual image or alignment.
+        """
+        if self.visual is None or self.alignment is None:
+            raise ValueError(
+                "Image does not have an embedded visual image and alignment."
+            )
+        return register_visual(
+            self.visual,
+            self.thermal.shape,
+            self.alignment,
+            interpolation=interpolation,
+            fill=fill,
+        )
+
+
+_VisualData = typing.Tuple[
+    typing.Mapping[str, typing.Any],
+    typing.Union[bytes, np.ndarray],
+    typing.Optional[bytes],
+    typing.Optional[Alignment],
+]
+"""`metadata, raw, embedded_image, alignment` of a FLIR image, where `raw`
+is the raw thermal data, or the still-encoded RawThermalImage"""
+
+
+def _decode_visual(embedded_image: bytes) -> np.ndarray:
+    """Decodes an embedded visual image into an RGB array."""
+    from PIL import Image  # type: ignore  # slow to import
+
+    with stage("visual") as visual_stage:
+        visual_stage.add_bytes(len(embedded_image))
+        with Image.open(io.BytesIO(embedded_image)) as image:
+            return np.array(image.convert("RGB"))
+
+
+def _try_load_native(str_path: str) -> typing.Optional[_VisualData]:
+    """Loads a FLIR file natively, or returns `None` if it can't be parsed."""
+    try:
+        with stage("native") as native_stage:
+            data = load_flir_visual_data(str_path)
+            native_stage.add_bytes(data.raw.nbytes)
+    except FFFParseError:
+        return None  # load using ExifTool instead
+    return (
+        data.metadata,
+        data.raw,
+        data.embedded_image,
+        _make_alignment(data.alignment),
+    )
+
+
+def _get_visual_batch(
+    exiftool: ExifTool, str_paths: typing.Sequence[str]
+) -> typing.List[_VisualData]:
+    """Gets the thermal data, visual image and alignment of multiple FLIR
+    images, using a single ExifTool call for every `MAX_BATCH_BYTES` of files.
+
+    Raises:
+        ValueError if a file does not have a RawThermalImage.
+    """
+    extra_tags = (EMBEDDED_IMAGE_TAG, *ALIGNMENT_TAGS)
+    json_output = []
+    for batch in _split_by_size(str_paths):
+        with stage("exiftool", files=len(batch)):
+            json_output.extend(
+                _execute_json(exiftool, _raw_batch_params(batch, extra_tags))
+            )
+    with stage("parse", files=len(str_paths)):
+        thermal_tags = []
+        # ExifTool skips files it can't read, so match files by name
+        visual_tags: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+        for file_tags in json_output:
+            thermal_file_tags = {}
+            visual_file_tags = {}
+            for tag, value in file_tags.items():
+                _, _, name = tag.rpartition(":")  # remove any group prefix
+                if name == EMBEDDED_IMAGE_TAG or name in ALIGNMENT_TAGS:
+                    visual_file_tags[name] = value
+                else:
+                    thermal_file_tags[tag] = value
+            thermal_tags.append(thermal_file_tags)
+            visual_tags[file_tags["SourceFile"]] = visual_file_tags
+        raw_batch = _parse_raw_batch(str_paths, thermal_tags)
+    visual_batch: typing.List[_VisualData] = []
+    for str_path, (metadata, raw_image_bytes) in zip(str_paths, raw_batch):
+        tags = visual_tags[str_path]  # _parse_raw_batch raises if missing
+        embedded_image = None
+        value = str(tags.get(EMBEDDED_IMAGE_TAG, ""))
+        if value.startswith(_BASE64_PREFIX):
+            _, _, encoded = value.partition(_BASE64_PREFIX)
+            embedded_image = base64.b64decode(encoded)
+        visual_batch.append(
+            (metadata, raw_image_bytes, embedded_image, _make_alignment(tags))
+        )
+    return visual_batch
+
+
+def get_thermal_visual_batch(
+    exiftool: ExifTool,
+    filepaths: typing.Iterable[Path],
+    engine: str = "exiftool",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> typing.List[ThermalVisualImage]:
+    """Loads the thermal data, visual image and alignment of FLIR images.
+
+    Everything is loaded with a single ExifTool call per chunk of files,
+    or by parsing each file once with the `native` engine.
+
+    Parameters:
+        exiftool: The ExifTool process to use.
+        filepaths: A list of paths to the files to load.
+        engine: The engine to use, see `ENGINES`.
+        chunk_size: The number of files to load in each ExifTool call.
+
+    Returns:
+        A `ThermalVisualImage` for each file, in order.
+    """
+    _check_batch_args(engine, chunk_size)
+    str_paths = [get_str_filepath(filepath) for filepath in filepaths]
+    images = []
+    for chunk in chunked(str_paths, chunk_size):
+        loaded: typing.List[typing.Optional[_VisualData]] = [None] * len(chunk)
+        if engine == "native":
+            loaded = [_try_load_native(str_path) for str_path in chunk]
+        fallback_indexes = [
+            index for index, data in enumerate(loaded) if data is None
+        ]
+        if fallback_indexes:
+            fallback = _get_visual_batch(
+                exiftool, [chunk[index] for index in fallback_indexes]
+            )
+            for index, data in zip(fallback_indexes, fallback):
+                loaded[index] = data
+        for metadata, raw, embedded_image, alignment in typing.cast(
+            typing.List[_VisualData], loaded
+        ):
+            images.append(
+                ThermalVisualImage(
+                    thermal=_decode_and_convert(metadata, raw),
+                    visual=(
+                        None
+                        if embedded_image is None
+                        else _decode_visual(embedded_image)
+                    ),
+                    alignment=alignment,
+                )
+            )
+    return images
@@ -0,0 +1,358 @@
+"""Benchmarks each stage of loading synthetic FLIR images.
+
+Synthetic FLIR JPGs (see `flirextractor.synthetic`) are generated for every
+combination of sensor size, raw format and byte order, and then each stage
+is timed, for every number of files:
+
+- `metadata`: `FlirExtractor.get_metadata_batch`
+- `raw_fetch`: getting the calibration constants and the encoded raw data,
+  from ExifTool, or from the FFF records when using the `native` engine
+- `exiftool_reply`: reading a single ExifTool reply with the raw data of
+  `DEFAULT_CHUNK_SIZE` files, which is tens of MB for real sensor sizes
+  (only for the `exiftool` engine)
+- `decode`: decoding the raw data into a numpy array
+- `convert`: converting the raw data into Celcius
+- `full_batch`: `FlirExtractor.get_thermal_batch`, which is also checked
+  against the known raw data, see `max_abs_error`
+- `render`: rendering the thermal data as false-colour thumbnails,
+  see `flirextractor.render`
+
+Results are written as JSON, so that they can be compared across commits.
+Run this with
+
+```bash
+poetry run python3 scripts/benchmark.py --quick -o before.json
+git checkout my-branch
+poetry run python3 scripts/benchmark.py --quick -o after.json \
+    --compare before.json
+```
+"""
+import argparse
+import itertools
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+import numpy as np
+
+from flirextractor import FlirExtractor, Instrumentation, __version__
+from flirextractor.fff import (
+    RECORD_CAMERA_INFO,
+    RECORD_RAW_DATA,
+    _get_records,
+    parse_camera_info,
+    parse_raw_data,
+)
+from flirextractor.get_thermal import (
+    DEFAULT_CHUNK_SIZE,
+    ENGINES,
+    _decode_raw_np,
+    _execute_json,
+    _get_raw_batch,
+    _raw_batch_params,
+    convert_image,
+)
+from flirextractor.render import DEFAULT_THUMBNAIL_SIZE, render
+from flirextractor.synthetic import (
+    BYTE_ORDERS,
+    RAW_FORMATS,
+    make_raw,
+    stored_metadata,
+    write_flir_images,
+)
+from flirextractor.utils import chunked
+
+STAGES = (
+    "metadata",
+    "raw_fetch",
+    "exiftool_reply",
+    "decode",
+    "convert",
+    "full_batch",
+    "render",
+)
+RESULT_KEY = ("engine", "sensor", "raw_format", "byte_order", "files", "stage")
+"""The fields that identify a result, e.g. when comparing results"""
+
+
+def best_time(function: typing.Callable[[], typing.Any], repeat: int):
+    """Runs a function `repeat` times, returning the fastest time and the
+    result of the last run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def fetch_raw(extractor: FlirExtractor, filepaths: typing.List[str]):
+    """Gets the metadata and encoded raw data of each file."""
+    if extractor.engine == "native":
+        fetched = []
+        for filepath in filepaths:
+            with open(filepath, "rb") as flir_file:
+                fetched.append(
+                    _get_records(
+                        flir_file.read(), RECORD_RAW_DATA, RECORD_CAMERA_INFO
+                    )
+                )
+        return fetched
+    return [
+        raw
+        for chunk in chunked(filepaths, extractor.chunk_size)
+        for raw in _get_raw_batch(extractor.exiftool, chunk)
+    ]
+
+
+def decode_raw(engine: str, fetched):
+    """Decodes the raw data of each file fetched by `fetch_raw`."""
+    if engine == "native":
+        return [
+            (parse_camera_info(camera_info.data), parse_raw_data(raw.data))
+            for raw, camera_info in fetched
+        ]
+    return [
+        (metadata, _decode_raw_np(raw_image_bytes))
+        for metadata, raw_image_bytes in fetched
+    ]
+
+
+def benchmark_files(
+    extractor: FlirExtractor,
+    filepaths: typing.List[str],
+    expected: typing.Callable[[int], np.ndarray],
+    repeat: int,
+) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    """Times every stage of loading the given files.
+
+    Yields:
+        The results of each stage.
+    """
+    seconds = {}
+    stage_filepaths = {}
+
+    seconds["metadata"], _ = best_time(
+        lambda: extractor.get_metadata_batch(filepaths), repeat
+    )
+    seconds["raw_fetch"], fetched = best_time(
+        lambda: fetch_raw(extractor, filepaths), repeat
+    )
+    if extractor.engine == "exiftool":
+        # a single call, not split by MAX_BATCH_BYTES, to time reading a
+        # multi-MB reply, see `_read_reply`
+        chunk = filepaths[:DEFAULT_CHUNK_SIZE]
+        stage_filepaths["exiftool_reply"] = chunk
+        seconds["exiftool_reply"], _ = best_time(
+            lambda: _execute_json(
+                extractor.exiftool, _raw_batch_params(chunk)
+            ),
+            repeat,
+        )
+    seconds["decode"], decoded = best_time(
+        lambda: decode_raw(extractor.engine, fetched), repeat
+    )
+    seconds["convert"], _ = best_time(
+        lambda: [convert_image(metadata, raw) for metadata, raw in decoded],
+        repeat,
+    )
+
+    assert extractor.instrumentation is not None
+    extractor.instrumentation.reset()
+    seconds["full_batch"], thermal_images = best_time(
+        lambda: list(extractor.get_thermal_batch(filepaths)), repeat
+    )
+    seconds["render"], _ = best_time(
+        lambda: [
+            render(thermal_data, max_size=DEFAULT_THUMBNAIL_SIZE)
+            for thermal_data in thermal_images
+        ],
+        repeat,
+    )
+    max_abs_error = max(
+        float(np.nanmax(np.abs(thermal_data - expected(index))))
+        for index, thermal_data in enumerate(thermal_images)
+    )
+
+    for stage in STAGES:
+        if stage not in seconds:
+            continue
+        stage_files = stage_filepaths.get(stage, filepaths)
+        input_bytes = sum(os.path.getsize(path) for path in stage_files)
+        result = dict(
+            stage=stage,
+            seconds=seconds[stage],
+            files_per_second=len(stage_files) / seconds[stage],
+            mb_per_second=input_bytes / seconds[stage] / 1e6,
+        )
+        if stage == "full_batch":
+            result["max_abs_error"] = max_abs_error
+            result["stage_stats"] = {
+                name: stats._asdict()
+                for name, stats in extractor.stats().items()
+            }
+        yield result
+
+
+def get_environment() -> typing.Dict[str, typing.Any]:
+    """Gets the versions of everything that affects the results."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            universal_newlines=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return dict(
+        commit=commit,
+        flirextractor=__version__,
+        python=platform.python_version(),
+        numpy=np.__version__,
+        platform=platform.platform(),
+        cpus=os.cpu_count(),
+    )
+
+
+def compare(
+    results: typing.List[typing.Dict[str, typing.Any]],
+    baseline: typing.List[typing.Dict[str, typing.Any]],
+):
+    """Prints the speedup of each result, compared to a baseline."""
+    baseline_seconds = {
+        tuple(result[key] for key in RESULT_KEY): result["seconds"]
+        for result in baseline
+    }
+    for result in results:
+        key = tuple(result[key] for key in RESULT_KEY)
+        if key not in baseline_seconds:
+            continue
+        speedup = baseline_seconds[key] / result["seconds"]
+        print(" ".join(str(value) for value in key), f"{speedup:.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", help="write JSON results here")
+    parser.add_argument(
+        "--compare", help="print speedups compared to these JSON results"
+    )
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[1, 100, 10000]
+    )
+    parser.add_argument(
+        "--sensors",
+        nargs="+",
+        default=["160x120", "320x240", "640x480", "1024x768"],
+    )
+    parser.add_argument(
+        "--raw-formats", nargs="+", choices=RAW_FORMATS, default=RAW_FORMATS
+    )
+    parser.add_argument(
+        "--byte-orders", nargs="+", choices=BYTE_ORDERS, default=BYTE_ORDERS
+    )
+    parser.add_argument(
+        "--engines", nargs="+", choices=ENGINES, default=ENGINES
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="runs of each stage, only 1 run for more than 100 files",
+    )
+    parser.add_argument(
+        "--unique",
+        type=int,
+        default=100,
+        help="number of different files, the rest are hard links",
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="only 1 and 100 files of 160x120 and 640x480 sensors",
+    )
+    parser.add_argument("--workdir", help="where to write synthetic files")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.counts = [1, 100]
+        args.sensors = ["160x120", "640x480"]
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for sensor, raw_format, byte_order in itertools.product(
+            args.sensors, args.raw_formats, args.byte_orders
+        ):
+            width, height = (int(size) for size in sensor.split("x"))
+            endian = "little" if byte_order == "<" else "big"
+            directory = pathlib.Path(
+                workdir, f"{sensor}-{raw_format}-{endian}"
+            )
+            filepaths = [
+                str(filepath)
+                for filepath in write_flir_images(
+                    directory,
+                    max(args.counts),
+                    unique=args.unique,
+                    shape=(height, width),
+                    raw_format=raw_format,
+                    byte_order=byte_order,
+                )
+            ]
+            expected_images: typing.Dict[int, np.ndarray] = {}
+
+            def expected(index: int) -> np.ndarray:
+                """The thermal data of a file, from its known raw data."""
+                seed = index % args.unique
+                if seed not in expected_images:
+                    raw = make_raw((height, width), seed)
+                    expected_images[seed] = convert_image(
+                        stored_metadata(), raw
+                    )
+                return expected_images[seed]
+
+            for engine in args.engines:
+                with FlirExtractor(
+                    engine=engine, instrumentation=Instrumentation()
+                ) as extractor:
+                    for count in args.counts:
+                        repeat = args.repeat if count <= 100 else 1
+                        for result in benchmark_files(
+                            extractor, filepaths[:count], expected, repeat
+                        ):
+                            result = dict(
+                                engine=engine,
+                                sensor=sensor,
+                                raw_format=raw_format,
+                                byte_order=endian,
+                                files=count,
+                                **result,
+                            )
+                            results.append(result)
+                            print(
+                                f"{engine} {sensor} {raw_format} {endian} "
+                                f"{count} files {result['stage']}: "
+                                f"{result['files_per_second']:.1f} files/s",
+                                file=sys.stderr,
+                            )
+
+    output = dict(environment=get_environment(), results=results)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(output, output_file, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(results, json.load(baseline_file)["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmarks decoding RawThermalImages, compared to the old PIL-only path.
+
+Run this with
+
+```bash
+poetry run python3 scripts/benchmark_decode.py
+```
+"""
+import io
+import timeit
+
+import numpy as np
+from PIL import Image
+
+from flirextractor.get_thermal import _decode_raw_np
+
+
+def old_decode_raw_np(raw_image_bytes: bytes) -> np.ndarray:
+    """The old decoder, which always round-tripped through PIL.
+
+    `ndarray.newbyteorder()` was removed in NumPy 2, so this uses the
+    equivalent `view()`.
+    """
+    fp = io.BytesIO(raw_image_bytes)
+    image = Image.open(fp)
+    as_array = np.array(image)
+    if image.format == "PNG":
+        as_array = as_array.astype("uint16")
+        as_array = as_array.view(as_array.dtype.newbyteorder())
+    return as_array
+
+
+def encode(raw: np.ndarray, format: str) -> bytes:
+    fp = io.BytesIO()
+    Image.fromarray(raw).save(fp, format)
+    return fp.getvalue()
+
+
+def main():
+    rng = np.random.default_rng(seed=0)
+    for height, width in ((480, 640), (1024, 1280)):
+        raw = rng.integers(15000, 20000, (height, width), dtype=np.uint16)
+        for format in ("TIFF", "PNG"):
+            encoded = encode(raw, format)
+            assert np.array_equal(
+                _decode_raw_np(encoded), old_decode_raw_np(encoded)
+            )
+            times = {}
+            for name, decode in (
+                ("old", old_decode_raw_np),
+                ("new", _decode_raw_np),
+            ):
+                timer = timeit.Timer(lambda: decode(encoded))
+                number, _ = timer.autorange()
+                times[name] = min(timer.repeat(5, number)) / number
+            print(
+                f"{width}x{height} {format}: "
+                f"old {times['old'] * 1e3:.3f} ms, "
+                f"new {times['new'] * 1e3:.3f} ms, "
+                f"{times['old'] / times['new']:.1f}x speedup"
+            )
+
+
+if __name__ == "__main__":
+    main()
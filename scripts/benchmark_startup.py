@@ -0,0 +1,151 @@
+"""Benchmarks how quickly a new process can load its first FLIR image.
+
+Each measurement runs in a fresh Python process, so that nothing is already
+imported or started. Measured times are from the start of the measurement:
+
+- `import`: `from flirextractor import FlirExtractor`
+- `open`: entering `with FlirExtractor(...)`, including the deferred
+  imports of NumPy and ExifTool
+- `first_array`: the first `get_thermal()` returning, after the caller's
+  own initialisation (simulated with `--init-seconds`), which ExifTool can
+  start up during with `exiftool_start="background"`
+
+Results are written as JSON, like `scripts/benchmark.py`. Run this with
+
+```bash
+poetry run python3 scripts/benchmark_startup.py -o startup.json
+```
+"""
+import argparse
+import itertools
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import typing
+
+from benchmark import get_environment
+
+from flirextractor.flirextractor import EXIFTOOL_STARTS
+from flirextractor.get_thermal import ENGINES
+from flirextractor.synthetic import RAW_FORMATS, write_flir_images
+
+STAGES = ("import", "open", "first_array")
+
+_MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+from flirextractor import FlirExtractor
+imported = time.perf_counter()
+engine, exiftool_start, init_seconds, filepath = sys.argv[1:]
+with FlirExtractor(
+    engine=engine, exiftool_start=exiftool_start
+) as extractor:
+    opened = time.perf_counter()
+    time.sleep(float(init_seconds))  # the caller's own initialisation
+    extractor.get_thermal(filepath)
+    first_array = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "open": opened - start,
+    "first_array": first_array - start - float(init_seconds),
+}))
+"""
+"""Run in a fresh process, printing the times of each stage as JSON"""
+
+
+def measure(
+    engine: str, exiftool_start: str, init_seconds: float, filepath: str
+) -> typing.Dict[str, float]:
+    """Measures the startup times of a fresh process."""
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            _MEASURE,
+            engine,
+            exiftool_start,
+            str(init_seconds),
+            filepath,
+        ],
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", help="write JSON results here")
+    parser.add_argument(
+        "--engines", nargs="+", choices=ENGINES, default=ENGINES
+    )
+    parser.add_argument(
+        "--exiftool-starts",
+        nargs="+",
+        choices=EXIFTOOL_STARTS,
+        default=EXIFTOOL_STARTS,
+    )
+    parser.add_argument(
+        "--raw-formats", nargs="+", choices=RAW_FORMATS, default=RAW_FORMATS
+    )
+    parser.add_argument(
+        "--init-seconds",
+        type=float,
+        default=0.0,
+        help="simulated initialisation of the caller, before the first image",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="fresh processes per measurement, the median is reported",
+    )
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        filepaths = {
+            raw_format: write_flir_images(
+                f"{workdir}/{raw_format}", 1, raw_format=raw_format
+            )[0]
+            for raw_format in args.raw_formats
+        }
+        for raw_format, engine, exiftool_start in itertools.product(
+            args.raw_formats, args.engines, args.exiftool_starts
+        ):
+            filepath = filepaths[raw_format]
+            runs = [
+                measure(
+                    engine, exiftool_start, args.init_seconds, str(filepath)
+                )
+                for _ in range(args.repeat)
+            ]
+            for stage in STAGES:
+                result = dict(
+                    engine=engine,
+                    exiftool_start=exiftool_start,
+                    raw_format=raw_format,
+                    init_seconds=args.init_seconds,
+                    stage=stage,
+                    seconds=statistics.median(run[stage] for run in runs),
+                )
+                results.append(result)
+                print(
+                    f"{engine} {exiftool_start} {raw_format} {stage}: "
+                    f"{result['seconds'] * 1000:.1f} ms",
+                    file=sys.stderr,
+                )
+
+    output = dict(environment=get_environment(), results=results)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(output, output_file, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -30,7 +30,11 @@ from PIL.ImageOps import autocontrast, colorize
 thermal_image = Image.fromarray(thermal_data)
 thermal_image.show()  # warning, might be quite dark
 
-# use matplotlib to colorize the image
+# quickly render a false-colour image, e.g. for previews of many images
+from flirextractor.render import render
+Image.fromarray(render(thermal_data, palette="iron")).save("example-iron.png")
+
+# use matplotlib to colorize the image, with a colorbar
 # Make sure you install matplotlib first
 import matplotlib.pyplot as plt
 plt.matshow(thermal_data)
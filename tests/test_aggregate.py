@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from flirextractor import ThermalAggregator
+
+BINS = np.linspace(0, 40, 9)
+
+
+@pytest.fixture(scope="module")
+def images() -> np.ndarray:
+    rng = np.random.default_rng(seed=0)
+    images = rng.normal(20, 5, (30, 4, 5))
+    images[3, 1, 1] = np.nan
+    images[:, 2, 2] = np.nan  # pixel that is always invalid
+    return images
+
+
+def check_aggregator(aggregator: ThermalAggregator, images: np.ndarray):
+    assert aggregator.images == len(images)
+    assert aggregator.shape == images.shape[1:]
+    assert np.array_equal(aggregator.count, (~np.isnan(images)).sum(axis=0))
+    valid = aggregator.count > 0
+    assert np.allclose(
+        aggregator.mean[valid], np.nanmean(images[:, valid], axis=0)
+    )
+    assert np.allclose(
+        aggregator.variance[valid], np.nanvar(images[:, valid], axis=0)
+    )
+    assert np.array_equal(
+        aggregator.min[valid], np.nanmin(images[:, valid], axis=0)
+    )
+    assert np.array_equal(
+        aggregator.max[valid], np.nanmax(images[:, valid], axis=0)
+    )
+    assert np.isnan(aggregator.mean[2, 2])
+    assert np.isnan(aggregator.std[2, 2])
+
+    expected_histogram, _ = np.histogram(
+        images[np.isfinite(images)], bins=BINS
+    )
+    assert np.array_equal(aggregator.histogram, expected_histogram)
+
+
+def test_update(images: np.ndarray):
+    aggregator = ThermalAggregator(BINS)
+    for image in images:
+        aggregator.update(image)
+    check_aggregator(aggregator, images)
+
+
+def test_update_stack(images: np.ndarray):
+    aggregator = ThermalAggregator(BINS)
+    aggregator.update_stack(images[:10]).update_stack(images[10:])
+    check_aggregator(aggregator, images)
+
+
+def test_merge(images: np.ndarray):
+    shards = [
+        ThermalAggregator(BINS).update_iter(images[:7]),
+        ThermalAggregator(BINS),  # empty shards should be fine
+        ThermalAggregator(BINS).update_iter(
+            (f"{i}.jpg", image) for i, image in enumerate(images[7:])
+        ),
+    ]
+    check_aggregator(ThermalAggregator.merge_all(shards), images)
+
+    with pytest.raises(ValueError):
+        ThermalAggregator(BINS).merge(ThermalAggregator())
+    with pytest.raises(ValueError):
+        ThermalAggregator().update(images[0]).update(np.zeros((2, 2)))
@@ -0,0 +1,149 @@
+import asyncio
+import pathlib
+import sys
+
+import numpy as np
+import pytest
+
+from flirextractor import AsyncFlirExtractor, FlirExtractor
+from flirextractor.aio import _AsyncExifTool
+
+TEST_IMAGE = pathlib.Path(__file__).parent / "IR_2412.jpg"
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+@pytest.mark.parametrize("engine", ["exiftool", "native"])
+def test_async_get_thermal(engine: str):
+    with FlirExtractor() as extractor:
+        expected = extractor.get_thermal(TEST_IMAGE)
+
+    async def get_thermal():
+        async with AsyncFlirExtractor(engine=engine) as extractor:
+            return await extractor.get_thermal(TEST_IMAGE)
+
+    assert np.allclose(run(get_thermal()), expected, equal_nan=True)
+
+
+def test_async_get_thermal_concurrent():
+    async def get_thermal_concurrent():
+        async with AsyncFlirExtractor(
+            processes=2, max_in_flight=2, chunk_size=3
+        ) as extractor:
+            batch = extractor.get_thermal_batch([TEST_IMAGE] * 7)
+            singles = [extractor.get_thermal(TEST_IMAGE) for _ in range(5)]
+            return await asyncio.gather(batch, *singles)
+
+    batch, *singles = run(get_thermal_concurrent())
+    assert len(batch) == 7
+    for thermal_data in [*batch, *singles]:
+        assert np.allclose(thermal_data, batch[0], equal_nan=True)
+
+
+def test_async_not_opened():
+    with pytest.raises(AttributeError):
+        run(AsyncFlirExtractor().get_thermal(TEST_IMAGE))
+
+
+def test_async_get_thermal_from_bytes():
+    with FlirExtractor() as extractor:
+        expected = extractor.get_thermal(TEST_IMAGE)
+
+    async def get_thermal_from_bytes():
+        async with AsyncFlirExtractor() as extractor:
+            return await extractor.get_thermal_from_bytes(
+                TEST_IMAGE.read_bytes()
+            )
+
+    thermal_data = run(get_thermal_from_bytes())
+    assert np.allclose(thermal_data, expected, equal_nan=True)
+
+
+def test_async_terminate_in_flight(tmp_path: pathlib.Path):
+    # a slow ExifTool that replies to each request with no output
+    executable = tmp_path / "slow-exiftool"
+    executable.write_text(
+        f"#!{sys.executable}\n"
+        "import sys, time\n"
+        "for line in sys.stdin:\n"
+        "    if line.startswith('-execute'):\n"
+        "        time.sleep(0.05)\n"
+        "        print('{ready' + line.strip()[8:] + '}', flush=True)\n"
+        "    elif line.strip() == 'False':\n"
+        "        break\n"
+    )
+    executable.chmod(0o755)
+
+    async def terminate_in_flight():
+        exiftool = _AsyncExifTool(str(executable), max_in_flight=4)
+        await exiftool.start()
+        requests = [
+            asyncio.ensure_future(exiftool.execute("-ver")) for _ in range(3)
+        ]
+        await asyncio.sleep(0)  # let every request be written
+        await asyncio.wait_for(exiftool.terminate(), timeout=10)
+        return await asyncio.wait_for(asyncio.gather(*requests), timeout=10)
+
+    assert run(terminate_in_flight()) == [b""] * 3
+
+
+def test_async_execute_json_no_output(tmp_path: pathlib.Path):
+    # ExifTool prints nothing if it can't read any of the files
+    executable = tmp_path / "empty-exiftool"
+    executable.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        "for line in sys.stdin:\n"
+        "    if line.startswith('-execute'):\n"
+        "        print('{ready' + line.strip()[8:] + '}', flush=True)\n"
+        "    elif line.strip() == 'False':\n"
+        "        break\n"
+    )
+    executable.chmod(0o755)
+
+    async def execute_json():
+        exiftool = _AsyncExifTool(str(executable), max_in_flight=1)
+        await exiftool.start()
+        try:
+            return await exiftool.execute_json("/missing.jpg")
+        finally:
+            await exiftool.terminate()
+
+    assert run(execute_json()) == []
+
+
+def test_async_restart_after_exit(tmp_path: pathlib.Path):
+    # an ExifTool that exits without replying to its first request
+    executable = tmp_path / "crashing-exiftool"
+    executable.write_text(
+        f"#!{sys.executable}\n"
+        "import pathlib, sys\n"
+        f"crashed = pathlib.Path({str(tmp_path / 'crashed')!r})\n"
+        "for line in sys.stdin:\n"
+        "    if line.startswith('-execute'):\n"
+        "        if not crashed.exists():\n"
+        "            crashed.touch()\n"
+        "            sys.exit(1)\n"
+        "        print('{ready' + line.strip()[8:] + '}', flush=True)\n"
+        "    elif line.strip() == 'False':\n"
+        "        break\n"
+    )
+    executable.chmod(0o755)
+
+    async def execute_after_crash():
+        exiftool = _AsyncExifTool(str(executable), max_in_flight=1)
+        await exiftool.start()
+        try:
+            with pytest.raises(asyncio.IncompleteReadError):
+                await asyncio.wait_for(exiftool.execute("-ver"), timeout=10)
+            return await asyncio.wait_for(exiftool.execute("-ver"), timeout=10)
+        finally:
+            await exiftool.terminate()
+
+    assert run(execute_after_crash()) == b""
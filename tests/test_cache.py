@@ -0,0 +1,109 @@
+import os
+import pathlib
+
+import numpy as np
+
+from flirextractor.cache import ThermalCache
+
+
+def make_flir_file(directory: pathlib.Path, name: str) -> str:
+    flir_file = directory / name
+    flir_file.write_bytes(b"not really a FLIR file")
+    return str(flir_file)
+
+
+def test_cache(tmp_path: pathlib.Path):
+    cache = ThermalCache(tmp_path / "cache")
+    str_path = make_flir_file(tmp_path, "a.jpg")
+    metadata = {"Emissivity": 0.95}
+    raw_np = np.arange(12, dtype=np.uint16).reshape((3, 4))
+    thermal_np = raw_np / 2
+
+    assert cache.get_raw(str_path) is None
+    assert cache.get_thermal(str_path) is None
+    cache.put_raw(str_path, metadata, raw_np)
+    cache.put_thermal(str_path, thermal_np)
+
+    cached_metadata, cached_raw = cache.get_raw(str_path)
+    assert cached_metadata == metadata
+    assert np.array_equal(cached_raw, raw_np)
+    assert np.array_equal(cache.get_thermal(str_path), thermal_np)
+    # different conversion params should have a different entry
+    assert cache.get_thermal(str_path, params={"emissivity": 0.5}) is None
+    # engines return slightly different metadata, so don't share entries
+    assert cache.get_raw(str_path, engine="native") is None
+    assert cache.get_thermal(str_path, engine="native") is None
+
+    # modifying the file should invalidate the cache
+    stat = os.stat(str_path)
+    os.utime(str_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.get_raw(str_path) is None
+    assert cache.get_thermal(str_path) is None
+
+    cache.clear()
+    assert cache.size == 0
+
+
+def test_cache_eviction(tmp_path: pathlib.Path):
+    thermal_np = np.zeros((100, 100))
+    entry_size = thermal_np.nbytes + 128  # npy header
+    cache = ThermalCache(tmp_path / "cache", max_size=entry_size * 2)
+
+    str_paths = [make_flir_file(tmp_path, f"{i}.jpg") for i in range(3)]
+    for str_path in str_paths:
+        # age existing entries, so that each entry has a different mtime
+        for entry in (cache.cache_dir / "thermal").iterdir():
+            stat = entry.stat()
+            os.utime(entry, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10 ** 9))
+        cache.put_thermal(str_path, thermal_np)
+
+    assert cache.size <= cache.max_size
+    assert cache.get_thermal(str_paths[0]) is None  # least recently used
+    assert cache.get_thermal(str_paths[2]) is not None
+
+
+def test_cache_eviction_scans(tmp_path: pathlib.Path, monkeypatch):
+    thermal_np = np.zeros((10, 10))
+    entry_size = thermal_np.nbytes + 128  # npy header
+    cache = ThermalCache(tmp_path / "cache", max_size=entry_size * 20)
+    scans = []
+    entry_stats = cache._entry_stats
+    monkeypatch.setattr(
+        cache, "_entry_stats", lambda: scans.append(1) or entry_stats()
+    )
+
+    for i in range(60):
+        cache.put_thermal(make_flir_file(tmp_path, f"{i}.jpg"), thermal_np)
+
+    assert cache.size <= cache.max_size
+    # each eviction frees space for a few puts, instead of just one
+    assert len(scans) <= 40 // 2
+
+
+def test_cache_size(tmp_path: pathlib.Path):
+    thermal_np = np.zeros((10, 10))
+    cache = ThermalCache(tmp_path / "cache")
+    str_path = make_flir_file(tmp_path, "a.jpg")
+    cache.put_thermal(str_path, thermal_np)
+    size = cache.size
+
+    # overwriting an entry replaces its size, instead of adding to it
+    cache.put_thermal(str_path, thermal_np)
+    cache.put_thermal(str_path, thermal_np)
+    assert cache.size == size
+
+
+def test_cache_eviction_race(tmp_path: pathlib.Path, monkeypatch):
+    thermal_np = np.zeros((100, 100))
+    max_size = thermal_np.nbytes * 3 // 2  # only one entry fits
+    cache = ThermalCache(tmp_path / "cache", max_size=max_size)
+    str_paths = [make_flir_file(tmp_path, f"{i}.jpg") for i in range(2)]
+    cache.put_thermal(str_paths[0], thermal_np)
+
+    # another process evicts an entry after it was listed
+    entries = cache._entries()
+    assert len(entries) == 1
+    for entry in entries:
+        os.unlink(entry.path)
+    monkeypatch.setattr(cache, "_entries", lambda: entries)
+    cache.put_thermal(str_paths[1], thermal_np)  # shouldn't raise
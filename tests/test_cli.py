@@ -0,0 +1,175 @@
+import json
+import pathlib
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from flirextractor import FlirExtractor
+from flirextractor.cli import MANIFEST_NAME, Manifest, main
+from flirextractor.pathutils import iter_inputs
+
+TEST_IMAGE = pathlib.Path(__file__).parent / "IR_2412.jpg"
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    input_dir = tmp_path / "input"
+    (input_dir / "day2").mkdir(parents=True)
+    shutil.copy(TEST_IMAGE, input_dir / "IR_0001.jpg")
+    shutil.copy(TEST_IMAGE, input_dir / "day2" / "IR_0002.jpg")
+    (input_dir / "notes.txt").write_text("not a FLIR image")
+    return input_dir
+
+
+def test_iter_inputs(input_dir):
+    expected = [
+        (input_dir / "IR_0001.jpg", pathlib.PurePath("IR_0001.jpg")),
+        (
+            input_dir / "day2" / "IR_0002.jpg",
+            pathlib.PurePath("day2", "IR_0002.jpg"),
+        ),
+    ]
+    assert sorted(iter_inputs([str(input_dir)], ["*.jpg"])) == sorted(
+        expected
+    )
+    pattern = str(input_dir / "**" / "IR_*.jpg")
+    assert sorted(iter_inputs([pattern], ["*.jpg"])) == sorted(expected)
+    single_file = input_dir / "day2" / "IR_0002.jpg"
+    assert list(iter_inputs([str(single_file)], [])) == [
+        (single_file, pathlib.PurePath("IR_0002.jpg"))
+    ]
+    with pytest.raises(FileNotFoundError):
+        list(iter_inputs([str(input_dir / "missing.jpg")], []))
+
+
+def test_manifest(tmp_path):
+    source = tmp_path / "IR_0001.jpg"
+    shutil.copy(TEST_IMAGE, source)
+    output = tmp_path / "IR_0001.npy"
+    output.write_bytes(b"")
+    manifest_path = tmp_path / MANIFEST_NAME
+
+    manifest = Manifest(manifest_path)
+    assert not manifest.is_done(source)
+    manifest.add([(source, output)])
+    assert manifest.is_done(source)
+
+    with open(manifest_path, "a") as manifest_file:
+        manifest_file.write('{"source": "half-writ')  # e.g. killed
+    assert Manifest(manifest_path).is_done(source)
+
+    output.unlink()
+    assert not Manifest(manifest_path).is_done(source)
+
+
+def test_convert(input_dir, tmp_path, capsys):
+    output_dir = tmp_path / "output"
+    with FlirExtractor() as extractor:
+        expected = extractor.get_thermal(TEST_IMAGE)
+
+    args = ["convert", str(input_dir), "-o", str(output_dir), "-j", "2"]
+    assert main(args) == 0
+    assert "Converted 2 files" in capsys.readouterr().err
+    for output in ("IR_0001.npy", "day2/IR_0002.npy"):
+        thermal_data = np.load(output_dir / output)
+        assert np.allclose(thermal_data, expected, equal_nan=True)
+    with open(output_dir / MANIFEST_NAME) as manifest_file:
+        assert len([json.loads(line) for line in manifest_file]) == 2
+
+    # rerunning only converts new files
+    shutil.copy(TEST_IMAGE, input_dir / "IR_0003.jpg")
+    assert main(args + ["--format", "npz", "--dtype", "float32"]) == 0
+    assert "Converted 1 files (skipped 2" in capsys.readouterr().err
+    with np.load(output_dir / "IR_0003.npz") as npz_file:
+        assert npz_file["thermal"].dtype == np.float32
+        assert np.allclose(npz_file["thermal"], expected, equal_nan=True)
+    assert not (output_dir / "IR_0001.npz").exists()
+
+
+def test_convert_failed_files(input_dir, tmp_path, capsys):
+    output_dir = tmp_path / "output"
+    (input_dir / "IR_0003.jpg").write_bytes(b"not a FLIR image")
+
+    args = ["convert", str(input_dir), "-o", str(output_dir), "--retries=0"]
+    assert main(args) == 1
+    err = capsys.readouterr().err
+    assert "Could not convert" in err and "IR_0003.jpg" in err
+    assert "Converted 2 files (skipped 0 already converted, 1 failed)" in err
+    assert not (output_dir / "IR_0003.npy").exists()
+    with open(output_dir / MANIFEST_NAME) as manifest_file:
+        assert len([json.loads(line) for line in manifest_file]) == 2
+
+
+def test_convert_duplicate_outputs(input_dir, tmp_path, capsys):
+    output_dir = tmp_path / "output"
+    other_dir = tmp_path / "other"
+    other_dir.mkdir()
+    shutil.copy(TEST_IMAGE, other_dir / "IR_0001.jpg")
+    shutil.copy(TEST_IMAGE, input_dir / "IR_0001.JPG")
+
+    repeated = str(input_dir / "**" / "IR_0002.jpg")
+    args = ["convert", str(input_dir), str(other_dir), repeated]
+    args += ["-o", str(output_dir)]
+    assert main(args) == 1
+    err = capsys.readouterr().err
+    # IR_0001.jpg and other/IR_0001.jpg would overwrite IR_0001.JPG
+    assert err.count("Could not convert") == 2
+    assert err.count("is also the output of") == 2
+    # day2/IR_0002.jpg is found twice, but only converted once
+    assert "Converted 2 files (skipped 1 already converted, 2 failed)" in err
+    with open(output_dir / MANIFEST_NAME) as manifest_file:
+        sources = [json.loads(line)["source"] for line in manifest_file]
+    assert sorted(sources) == [
+        str((input_dir / "IR_0001.JPG").resolve()),
+        str((input_dir / "day2" / "IR_0002.jpg").resolve()),
+    ]
+
+    # the first file still claims its output when it is skipped
+    assert main(args) == 1
+    err = capsys.readouterr().err
+    assert "Converted 0 files (skipped 3 already converted, 2 failed)" in err
+
+
+def test_convert_nothing_instantly(tmp_path, capsys, monkeypatch):
+    # a clock too coarse to measure the conversion
+    monkeypatch.setattr(time, "perf_counter", lambda: 1.0)
+    (tmp_path / "empty").mkdir()
+    args = ["convert", str(tmp_path / "empty"), "-o", str(tmp_path / "out")]
+    assert main(args) == 0
+    assert "Converted 0 files" in capsys.readouterr().err
+
+
+def test_thumbnails(input_dir, tmp_path, capsys):
+    from PIL import Image
+
+    output_dir = tmp_path / "output"
+    (input_dir / "IR_0003.jpg").write_bytes(b"not a FLIR image")
+
+    args = ["thumbnails", str(input_dir), "-o", str(output_dir), "--size=80"]
+    assert main(args + ["--palette=grey", "--retries=0", "-j", "2"]) == 1
+    err = capsys.readouterr().err
+    assert "Could not render" in err and "IR_0003.jpg" in err
+    assert "Rendered 2 thumbnails (1 failed)" in err
+    for output in ("IR_0001.png", "day2/IR_0002.png"):
+        with Image.open(output_dir / output) as thumbnail:
+            assert thumbnail.size == (80, 60)
+            assert thumbnail.mode == "RGB"
+    assert not (output_dir / "IR_0003.png").exists()
+
+
+def test_cli_import_is_lazy():
+    code = (
+        "import sys, flirextractor.cli; "
+        "print(sorted({'numpy', 'PIL'} & set(sys.modules)))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    assert output.strip() == "[]"
@@ -1,10 +1,27 @@
+import base64
+import io
 import pathlib
+import struct
+import subprocess
+import sys
 from typing import NamedTuple, Tuple
 
 import numpy as np
+import PIL.Image
 import pytest
+from exiftool import ExifTool
 
 from flirextractor import FlirExtractor
+from flirextractor.fff import load_flir_file
+from flirextractor.get_thermal import (
+    _decode_raw_np,
+    _execute_json,
+    _parse_raw_batch,
+    _split_by_size,
+    convert_image,
+    convert_image_stack,
+)
+from flirextractor.roi import Box
 
 
 class Image(NamedTuple):
@@ -53,3 +70,291 @@ def test_get_thermal(image: AbsImage):
 def test_get_thermal_batch(image: AbsImage):
     with FlirExtractor() as flir_extractor:
         flir_extractor.get_thermal_batch((image.path, str(image.path)))
+
+
+def test_get_thermal_batch_chunk_size(image: AbsImage):
+    filepaths = [image.path] * 5
+    with FlirExtractor() as flir_extractor:
+        expected = flir_extractor.get_thermal(image.path)
+        thermal_list = flir_extractor.get_thermal_batch(filepaths)
+    with FlirExtractor(chunk_size=2) as flir_extractor:
+        thermal_list_chunked = flir_extractor.get_thermal_batch(filepaths)
+    assert len(thermal_list) == len(thermal_list_chunked) == len(filepaths)
+    for thermal_a, thermal_b in zip(thermal_list, thermal_list_chunked):
+        assert np.allclose(thermal_a, expected, equal_nan=True)
+        assert np.allclose(thermal_b, expected, equal_nan=True)
+
+
+def test_get_thermal_stack(image: AbsImage):
+    filepaths = [image.path] * 3
+    with FlirExtractor() as flir_extractor:
+        expected = flir_extractor.get_thermal(image.path)
+        stack = flir_extractor.get_thermal_stack(filepaths)
+        assert stack.shape == (len(filepaths), *image.shape)
+        for thermal_data in stack:
+            assert np.allclose(thermal_data, expected, equal_nan=True)
+
+        out = np.empty((len(filepaths), *image.shape), dtype=np.float32)
+        stack_32 = flir_extractor.get_thermal_stack(filepaths, out=out)
+        assert stack_32 is out
+        assert np.allclose(stack_32, stack, equal_nan=True)
+
+        for length in (len(filepaths) - 1, len(filepaths) + 1):
+            wrong_length = np.empty((length, *image.shape))
+            with pytest.raises(ValueError, match="out has"):
+                flir_extractor.get_thermal_stack(filepaths, out=wrong_length)
+
+
+def test_convert_image_stack(image: AbsImage):
+    metadata = load_flir_file(image.path).metadata
+    raw = load_flir_file(image.path).raw
+    metadata_list = [metadata, dict(metadata, Emissivity=0.8)]
+    stack = convert_image_stack(metadata_list, np.stack([raw, raw]))
+    for image_metadata, thermal_data in zip(metadata_list, stack):
+        expected = convert_image(image_metadata, raw)
+        assert np.allclose(thermal_data, expected, equal_nan=True)
+
+
+def test_iter_thermal(image: AbsImage):
+    def infinite_filepaths():
+        while True:
+            yield image.path
+
+    with FlirExtractor() as flir_extractor:
+        expected = flir_extractor.get_thermal(image.path)
+        thermal_iter = flir_extractor.iter_thermal(
+            infinite_filepaths(), chunk_size=2
+        )
+        for _ in range(3):
+            path, thermal_data = next(thermal_iter)
+            assert path == image.path
+            assert np.allclose(thermal_data, expected, equal_nan=True)
+
+
+def test_get_thermal_native(image: AbsImage):
+    with pytest.raises(ValueError):
+        FlirExtractor(engine="not an engine")
+
+    with FlirExtractor() as exiftool_extractor:
+        thermal_exiftool = exiftool_extractor.get_thermal(image.path)
+    with FlirExtractor(engine="native") as native_extractor:
+        thermal_native = native_extractor.get_thermal(image.path)
+    assert np.allclose(thermal_exiftool, thermal_native, equal_nan=True)
+
+
+def test_get_thermal_cache(image: AbsImage, tmp_path: pathlib.Path):
+    with FlirExtractor() as flir_extractor:
+        expected = flir_extractor.get_thermal(image.path)
+    for _ in range(2):  # second time should load from the cache
+        with FlirExtractor(cache_dir=tmp_path) as flir_extractor:
+            thermal_data = flir_extractor.get_thermal(image.path)
+        assert np.allclose(thermal_data, expected, equal_nan=True)
+    assert any((tmp_path / "thermal").iterdir())
+
+
+def test_get_radiometric(image: AbsImage):
+    with FlirExtractor() as flir_extractor:
+        expected = flir_extractor.get_thermal(image.path)
+        radiometric_image = flir_extractor.get_radiometric(image.path)
+    assert radiometric_image.shape == image.shape
+    assert np.allclose(radiometric_image.celcius, expected, equal_nan=True)
+    # should be memoised
+    assert radiometric_image.celcius is radiometric_image.celcius
+
+    reparameterised = radiometric_image.with_params(emissivity=0.5)
+    assert reparameterised.raw is radiometric_image.raw
+    # lower emissivity means a hotter object for the same radiance
+    assert np.nanmean(reparameterised.celcius) > np.nanmean(expected)
+
+    with pytest.raises(TypeError):
+        radiometric_image.with_params(not_a_param=1)
+
+
+def test_get_metadata(image: AbsImage):
+    with FlirExtractor() as exiftool_extractor:
+        metadata = exiftool_extractor.get_metadata(image.path)
+    with FlirExtractor(engine="native") as native_extractor:
+        native_metadata = native_extractor.get_metadata(image.path)
+    assert metadata.shape == image.shape
+    assert native_metadata.shape == image.shape
+    for name, value in metadata.params.items():
+        assert np.allclose(native_metadata.params[name], value)
+
+
+def test_get_thermal_from_bytes(image: AbsImage):
+    data = image.path.read_bytes()
+    with FlirExtractor() as flir_extractor:
+        expected = flir_extractor.get_thermal(image.path)
+        from_bytes = flir_extractor.get_thermal_from_bytes(data)
+        with open(image.path, "rb") as image_file:
+            batch = flir_extractor.get_thermal_batch_from_buffers(
+                [memoryview(data), bytearray(data), image_file]
+            )
+    for thermal_data in [from_bytes, *batch]:
+        assert np.allclose(thermal_data, expected, equal_nan=True)
+
+
+@pytest.mark.parametrize("engine", ["exiftool", "native"])
+def test_get_thermal_batch_pipelined(image: AbsImage, engine: str):
+    filepaths = [image.path] * 7
+    with FlirExtractor(engine=engine, pipeline_workers=0) as flir_extractor:
+        expected = flir_extractor.get_thermal_batch(filepaths)
+    with FlirExtractor(
+        engine=engine, chunk_size=2, pipeline_workers=2, queue_depth=1
+    ) as flir_extractor:
+        thermal_d_list = flir_extractor.get_thermal_batch(filepaths)
+        iterated = list(flir_extractor.iter_thermal(iter(filepaths)))
+    assert len(thermal_d_list) == len(iterated) == len(filepaths)
+    for thermal_data, (path, iterated_data) in zip(thermal_d_list, iterated):
+        assert path == image.path
+        assert np.array_equal(thermal_data, expected[0], equal_nan=True)
+        assert np.array_equal(iterated_data, expected[0], equal_nan=True)
+
+
+def _make_tiff(raw: np.ndarray, byte_order: str) -> bytes:
+    """Makes a minimal uncompressed TIFF, like ExifTool's RawThermalImage."""
+    height, width = raw.shape
+    header = b"II*\0" if byte_order == "<" else b"MM\0*"
+    pixel_offset = 8 + 2 + 5 * 12 + 4  # header, then IFD with 5 entries
+    entries = [(256, 4, width), (257, 4, height), (258, 3, 16)]
+    entries += [(259, 3, 1), (273, 4, pixel_offset)]
+    ifd = struct.pack(f"{byte_order}H", len(entries))
+    for tag, field_type, value in entries:
+        value_format = "HH" if field_type == 3 else "I"
+        values = (value, 0) if field_type == 3 else (value,)
+        ifd += struct.pack(f"{byte_order}HHI", tag, field_type, 1)
+        ifd += struct.pack(f"{byte_order}{value_format}", *values)
+    ifd += b"\0\0\0\0"  # no next IFD
+    pixels = raw.astype(f"{byte_order}u2").tobytes()
+    return header + struct.pack(f"{byte_order}I", 8) + ifd + pixels
+
+
+@pytest.mark.parametrize("byte_order", ["<", ">"])
+def test_decode_raw_np_tiff(byte_order: str):
+    raw = np.arange(12, dtype=np.uint16).reshape((3, 4)) * 1000
+    decoded = _decode_raw_np(_make_tiff(raw, byte_order))
+    assert np.array_equal(decoded, raw)
+    assert not decoded.flags.owndata  # should be a view of the bytes
+
+
+def test_parse_raw_batch():
+    def tags(str_path: str, raw: bytes):
+        encoded = base64.b64encode(raw).decode("ascii")
+        return {
+            "SourceFile": str_path,
+            "APP1:Emissivity": 0.95,
+            "APP1:RawThermalImage": f"base64:{encoded}",
+        }
+
+    # ExifTool skips files it can't read, so later files shouldn't shift
+    json_output = [tags("/a.jpg", b"a"), tags("/c.jpg", b"c")]
+    parsed = _parse_raw_batch(["/c.jpg", "/a.jpg"], json_output)
+    assert [raw for _, raw in parsed] == [b"c", b"a"]
+    assert parsed[0][0]["APP1:Emissivity"] == 0.95
+    with pytest.raises(ValueError, match="could not read /b.jpg"):
+        _parse_raw_batch(["/a.jpg", "/b.jpg", "/c.jpg"], json_output)
+
+
+def test_split_by_size(tmp_path: pathlib.Path):
+    str_paths = []
+    for index, size in enumerate([4, 4, 10, 1, 1]):
+        filepath = tmp_path / f"{index}.jpg"
+        filepath.write_bytes(b"a" * size)
+        str_paths.append(str(filepath))
+    missing = str(tmp_path / "missing.jpg")
+    batches = list(_split_by_size([*str_paths, missing], max_bytes=8))
+    # files larger than max_bytes get a batch of their own
+    assert batches == [
+        str_paths[:2],
+        str_paths[2:3],
+        [*str_paths[3:], missing],
+    ]
+
+
+LARGE_REPLY_SIZE = 8 * 1024 * 1024
+
+
+def test_execute_json_large_reply(tmp_path: pathlib.Path):
+    executable = tmp_path / "large-reply-exiftool"
+    executable.write_text(
+        f"#!{sys.executable}\n"
+        "import json, sys\n"
+        "for line in sys.stdin:\n"
+        "    if line.startswith('-execute'):\n"
+        f"        data = 'a' * {LARGE_REPLY_SIZE}\n"
+        "        print(json.dumps([{'SourceFile': '/a.jpg', 'Data': data}]))\n"
+        "        print('{ready}', flush=True)\n"
+    )
+    executable.chmod(0o755)
+    with ExifTool(executable_=str(executable)) as exiftool:
+        (tags,) = _execute_json(exiftool, ["-b", "/a.jpg"])
+        assert len(tags["Data"]) == LARGE_REPLY_SIZE
+        # the next reply should start cleanly after the previous one
+        (tags,) = _execute_json(exiftool, ["-b", "/a.jpg"])
+        assert tags["SourceFile"] == "/a.jpg"
+        (tags,) = _execute_json(exiftool, ["-b", "/a.jpg"], timeout=30)
+        assert len(tags["Data"]) == LARGE_REPLY_SIZE
+
+
+def test_decode_raw_np_png():
+    raw = np.arange(12, dtype=np.uint16).reshape((3, 4)) * 1000
+    png_file = io.BytesIO()
+    PIL.Image.fromarray(raw.byteswap()).save(png_file, "PNG")
+    decoded = _decode_raw_np(png_file.getvalue())
+    assert decoded.dtype == np.uint16
+    assert np.array_equal(decoded, raw)
+
+
+def test_get_roi_stats(image: AbsImage):
+    box = Box(10, 20, 110, 220)
+    with FlirExtractor() as flir_extractor:
+        thermal_data = flir_extractor.get_thermal(image.path)
+        (stats,) = flir_extractor.get_roi_stats(image.path, [box], (50,))
+    assert stats.pixels == 100 * 200
+    assert stats.mean == pytest.approx(thermal_data[20:220, 10:110].mean())
+
+
+@pytest.mark.parametrize("exiftool_start", ["lazy", "background", "eager"])
+def test_exiftool_start(image: AbsImage, exiftool_start: str):
+    with pytest.raises(ValueError):
+        FlirExtractor(exiftool_start="not a start")
+
+    with FlirExtractor(
+        engine="native", exiftool_start=exiftool_start
+    ) as flir_extractor:
+        assert flir_extractor.get_thermal(image.path).shape == image.shape
+        if exiftool_start == "lazy":
+            # the native engine never needed ExifTool
+            assert flir_extractor._exiftool is None
+        elif exiftool_start == "eager":
+            assert flir_extractor._exiftool is not None
+    assert flir_extractor._exiftool is None
+
+    with FlirExtractor(exiftool_start=exiftool_start) as flir_extractor:
+        assert flir_extractor.get_thermal(image.path).shape == image.shape
+        assert flir_extractor._exiftool is not None
+    assert flir_extractor._exiftool is None
+
+    with pytest.raises(AttributeError):
+        flir_extractor.get_thermal(image.path)
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 7), reason="lazy imports need Python 3.7"
+)
+@pytest.mark.parametrize(
+    "statement",
+    ["import flirextractor", "from flirextractor import FlirExtractor"],
+)
+def test_import_is_lazy(statement: str):
+    code = (
+        f"import sys; {statement}; "
+        "print(sorted({'numpy', 'PIL', 'exiftool'} & set(sys.modules)))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    assert output.strip() == "[]"
@@ -0,0 +1,69 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+from flirextractor.fff import (
+    FFFParseError,
+    load_flir_file,
+    load_flir_metadata,
+    read_flir_data,
+)
+from flirextractor.synthetic import make_flir_image
+
+TEST_IMAGE = pathlib.Path(__file__).parent / "IR_2412.jpg"
+
+
+def test_load_flir_file():
+    fff_data = load_flir_file(TEST_IMAGE)
+    assert fff_data.raw.shape == (480, 640)
+    assert fff_data.raw.dtype == np.uint16
+    # data taken from first pixel of IR_2412.jpg
+    assert fff_data.raw[0, 0] == 18090
+
+    expected_metadata = dict(
+        Emissivity=0.949999988079071,
+        SubjectDistance=1.0,
+        ReflectedApparentTemperature=19.9999938964844,
+        RelativeHumidity=0.5,
+        PlanckR1=21106.76953125,
+        PlanckR2=0.012545257806778,
+        PlanckB=1501.0,
+        PlanckF=1.0,
+        PlanckO=-7340.0,
+        AtmosphericTransX=1.9,
+    )
+    for tag, value in expected_metadata.items():
+        assert pytest.approx(value) == fff_data.metadata[tag]
+
+
+def test_read_flir_data_invalid():
+    with pytest.raises(FFFParseError):
+        read_flir_data(b"not a FLIR file")
+
+    jpeg_without_flir = TEST_IMAGE.read_bytes()[:2] + b"\xff\xda"
+    with pytest.raises(FFFParseError):
+        read_flir_data(jpeg_without_flir)
+
+
+def test_read_flir_data_corrupt():
+    # a FLIR APP1 segment too short to have an index
+    short_segment = b"\xff\xd8\xff\xe1\x00\x09FLIR\x00\x01\x00\xff\xda"
+    with pytest.raises(FFFParseError):
+        read_flir_data(short_segment)
+
+    data = make_flir_image((8, 8), raw_format="png").data
+    with pytest.raises(FFFParseError):
+        read_flir_data(data[:len(data) // 2])  # truncated segment
+
+    png_start = data.index(b"\x89PNG")
+    corrupt_png = bytearray(data)
+    corrupt_png[png_start + 8:png_start + 32] = bytes(24)
+    with pytest.raises(FFFParseError):
+        read_flir_data(bytes(corrupt_png))
+
+
+def test_load_flir_metadata():
+    fff_metadata = load_flir_metadata(TEST_IMAGE)
+    assert fff_metadata.shape == (480, 640)
+    assert fff_metadata.metadata == load_flir_file(TEST_IMAGE).metadata
@@ -0,0 +1,126 @@
+import os
+import pathlib
+import shutil
+
+import pytest
+
+from flirextractor import FlirExtractor, ThermalIndex
+from flirextractor.index import CALIBRATION_COLUMNS
+from flirextractor.metadata import _parse_metadata_batch
+
+TEST_IMAGE = pathlib.Path(__file__).parent / "IR_2412.jpg"
+
+
+def test_thermal_index(tmp_path: pathlib.Path):
+    image_paths = [tmp_path / f"{i}.jpg" for i in range(3)]
+    for image_path in image_paths:
+        shutil.copy(TEST_IMAGE, image_path)
+
+    with FlirExtractor(engine="native", chunk_size=2) as extractor:
+        with ThermalIndex(tmp_path / "index.db") as index:
+            assert index.update(extractor, image_paths) == (3, {})
+            assert len(index) == 3
+            # unmodified files should be skipped
+            assert index.update(extractor, image_paths) == (0, {})
+
+            metadata = index.get(image_paths[0])
+            assert metadata == extractor.get_metadata(image_paths[0])
+            assert index.get(TEST_IMAGE) is None
+
+            groups = index.group_by()
+            assert len(groups) == 1
+            (calibration,) = groups
+            assert len(calibration) == len(CALIBRATION_COLUMNS)
+            with pytest.raises(ValueError):
+                index.group_by(["path; DROP TABLE images"])
+
+            image_paths[0].unlink()
+            assert index.prune() == 1
+            assert len(index) == 2
+
+        # index should persist on disk
+        with ThermalIndex(tmp_path / "index.db") as index:
+            assert len(index) == 2
+            assert index.is_current(image_paths[1])
+
+
+def test_thermal_index_inputs(tmp_path: pathlib.Path):
+    archive = tmp_path / "archive"
+    (archive / "day1").mkdir(parents=True)
+    for name in ["IR_1.jpg", "day1/IR_2.jpg", "day1/[3].jpg"]:
+        shutil.copy(TEST_IMAGE, archive / name)
+    (archive / "day1" / "notes.txt").write_text("not an image")
+    corrupt_path = archive / "day1" / "corrupt.jpg"
+    corrupt_path.write_bytes(b"\xff\xd8 not a FLIR image")
+
+    with FlirExtractor(engine="native", chunk_size=2) as extractor:
+        with ThermalIndex(tmp_path / "index.db") as index:
+            updated, errors = index.update(extractor, [archive])
+            # the corrupt file is skipped, without losing the rest of its chunk
+            assert updated == 3
+            assert list(errors) == [str(corrupt_path.resolve())]
+            assert not index.is_current(corrupt_path)
+            assert index.is_current(archive / "day1" / "[3].jpg")
+
+            glob_pattern = str(archive / "**" / "IR_*.jpg")
+            assert index.update(extractor, [glob_pattern]) == (0, {})
+            # a file whose name looks like a glob pattern
+            (archive / "day1" / "[3].jpg").touch()
+            updated, errors = index.update(
+                extractor, [archive / "day1" / "[3].jpg"]
+            )
+            assert updated == 1
+
+            updated, errors = index.update(
+                extractor, [archive], patterns=["*.txt"]
+            )
+            assert updated == 0
+            assert len(errors) == 1
+
+            with pytest.raises(FileNotFoundError):
+                index.update(extractor, [archive / "missing"])
+
+
+def test_thermal_index_modified_while_loading(
+    tmp_path: pathlib.Path, monkeypatch
+):
+    image_path = tmp_path / "IR_1.jpg"
+    shutil.copy(TEST_IMAGE, image_path)
+
+    with FlirExtractor(engine="native") as extractor:
+        get_metadata_batch = extractor.get_metadata_batch
+
+        def modify_while_loading(str_paths):
+            metadata = get_metadata_batch(str_paths)
+            stat = image_path.stat()
+            os.utime(image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+            return metadata
+
+        monkeypatch.setattr(
+            extractor, "get_metadata_batch", modify_while_loading
+        )
+        with ThermalIndex(tmp_path / "index.db") as index:
+            assert index.update(extractor, [image_path]) == (1, {})
+            # the metadata may be of the old file, so it must be reloaded
+            assert not index.is_current(image_path)
+
+
+def test_parse_metadata_batch():
+    def tags(str_path: str, emissivity: float):
+        return {
+            "SourceFile": str_path,
+            "APP1:Emissivity": emissivity,
+            "APP1:RawThermalImageHeight": 480,
+            "APP1:RawThermalImageWidth": 640,
+        }
+
+    # ExifTool skips files it can't read, so later files shouldn't shift
+    json_output = [tags("/a.jpg", 0.9), tags("/c.jpg", 0.8)]
+    parsed = _parse_metadata_batch(["/c.jpg", "/a.jpg"], json_output)
+    assert [metadata.params["emissivity"] for metadata in parsed] == [
+        0.8,
+        0.9,
+    ]
+    assert parsed[0].shape == (480, 640)
+    with pytest.raises(ValueError, match="could not read /b.jpg"):
+        _parse_metadata_batch(["/a.jpg", "/b.jpg", "/c.jpg"], json_output)
@@ -0,0 +1,92 @@
+import concurrent.futures
+import contextlib
+import pathlib
+
+from flirextractor import FlirExtractor, Instrumentation
+from flirextractor.instrument import (
+    LATENCY_BUCKETS,
+    StageEvent,
+    bind,
+    current,
+    iterate,
+    stage,
+)
+
+TEST_IMAGE = pathlib.Path(__file__).parent / "IR_2412.jpg"
+
+
+def test_instrumentation():
+    events = []
+    traced = []
+
+    @contextlib.contextmanager
+    def tracer(name):
+        traced.append(name)
+        yield
+
+    instrumentation = Instrumentation(callbacks=[events.append], tracer=tracer)
+    with stage("decode") as decode_stage:
+        decode_stage.add_bytes(10)  # disabled, so nothing is recorded
+    assert instrumentation.stats() == {}
+
+    with instrumentation.activate():
+        assert current() is instrumentation
+        with stage("exiftool", files=4) as exiftool_stage:
+            exiftool_stage.add_bytes(100)
+        with stage("exiftool", files=2):
+            pass
+    assert current() is None
+
+    stats = instrumentation.stats()
+    assert list(stats) == ["exiftool"]
+    assert stats["exiftool"].calls == 2
+    assert stats["exiftool"].files == 6
+    assert stats["exiftool"].bytes == 100
+    assert sum(stats["exiftool"].latency_histogram) == 6
+    assert len(stats["exiftool"].latency_histogram) == len(LATENCY_BUCKETS) + 1
+    assert [event.stage for event in events] == ["exiftool", "exiftool"]
+    assert isinstance(events[0], StageEvent)
+    assert traced == ["exiftool", "exiftool"]
+
+    instrumentation.reset()
+    assert instrumentation.stats() == {}
+
+
+def test_instrumentation_threads():
+    instrumentation = Instrumentation()
+
+    def convert():
+        with stage("convert"):
+            pass
+
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        with instrumentation.activate():
+            bound_convert = bind(convert)
+        executor.submit(convert).result()  # not bound, so not recorded
+        executor.submit(bound_convert).result()
+    assert instrumentation.stats()["convert"].calls == 1
+
+    def frames():
+        for _ in range(3):
+            assert current() is instrumentation
+            convert()
+            yield
+
+    for _ in iterate(instrumentation, frames()):
+        assert current() is None
+    assert instrumentation.stats()["convert"].calls == 4
+
+
+def test_extractor_stats():
+    with FlirExtractor() as extractor:
+        assert extractor.stats() == {}
+
+    instrumentation = Instrumentation()
+    with FlirExtractor(instrumentation=instrumentation) as extractor:
+        extractor.get_thermal_batch([TEST_IMAGE] * 3)
+        list(extractor.iter_thermal([TEST_IMAGE] * 2))
+        stats = extractor.stats()
+    assert stats["exiftool"].files == 5
+    assert stats["decode"].files == 5
+    assert stats["convert"].files == 5
+    assert stats["convert"].bytes == 5 * 480 * 640 * 8
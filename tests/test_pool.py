@@ -0,0 +1,49 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+from flirextractor import FlirExtractor, FlirExtractorPool
+
+TEST_IMAGE = pathlib.Path(__file__).parent / "IR_2412.jpg"
+
+
+def test_get_thermal_batch():
+    filepaths = [TEST_IMAGE, str(TEST_IMAGE)] * 3
+    with FlirExtractor() as flir_extractor:
+        expected = flir_extractor.get_thermal(TEST_IMAGE)
+    with FlirExtractorPool(workers=2, chunk_size=2) as pool:
+        thermal_list = pool.get_thermal_batch(filepaths)
+        assert np.allclose(pool.get_thermal(TEST_IMAGE), expected)
+    assert len(thermal_list) == len(filepaths)
+    for thermal_data in thermal_list:
+        assert np.allclose(thermal_data, expected, equal_nan=True)
+
+
+def test_pool_lifecycle():
+    with pytest.raises(ValueError):
+        FlirExtractorPool(workers=0)
+
+    pool = FlirExtractorPool(workers=1)
+    with pytest.raises(AttributeError):
+        pool.get_thermal_batch([TEST_IMAGE])
+    pool.open()
+    with pytest.raises(Exception):
+        pool.open()
+    pool.close()
+    pool.close()  # closing twice should do nothing
+
+
+def test_pool_aggregate():
+    filepaths = [TEST_IMAGE] * 5
+    with FlirExtractor() as extractor:
+        expected = extractor.aggregate(filepaths)
+        with pytest.raises(ValueError, match="histogram_bins"):
+            extractor.aggregate(filepaths, [0, 20, 40], raw=True)
+    with FlirExtractorPool(workers=2, chunk_size=2) as pool:
+        aggregator = pool.aggregate(filepaths)
+        with pytest.raises(ValueError, match="histogram_bins"):
+            pool.aggregate(filepaths, [0, 20, 40], raw=True)
+    assert aggregator.images == 5
+    assert np.allclose(aggregator.mean, expected.mean, equal_nan=True)
+    assert np.allclose(aggregator.max, expected.max, equal_nan=True)
@@ -6,6 +6,8 @@ import pytest
 from flirextractor.raw_temp_to_celcius import (
     CameraPlanckConsts,
     raw_temp_to_celcius,
+    raw_temp_to_celcius_lut,
+    raw_temp_to_celcius_stack,
     water_vapor_pressure,
 )
 
@@ -87,3 +89,65 @@ def test_raw_temp_to_celcius(input_vals, expected_output_val):
     out_array = raw_temp_to_celcius(**input_vals._asdict())
     output_val = out_array[0]
     assert pytest.approx(output_val) == expected_output_val
+
+
+@pytest.mark.parametrize("input_vals", expected_raw_temp_to_celcius.keys())
+def test_raw_temp_to_celcius_lut(input_vals):
+    raw = np.arange(17000, 19000, dtype=np.uint16).reshape((40, 50))
+    input_vals = input_vals._replace(raw=raw)
+    expected = raw_temp_to_celcius(**input_vals._asdict())
+    actual = raw_temp_to_celcius_lut(**input_vals._asdict())
+    assert actual.shape == expected.shape
+    assert np.array_equal(actual, expected)
+    # big-endian raw data from FLIR PNGs should also work
+    actual_big_endian = raw_temp_to_celcius_lut(
+        **input_vals._replace(raw=raw.astype(">u2"))._asdict()
+    )
+    assert np.array_equal(actual_big_endian, expected)
+
+    with pytest.raises(TypeError):
+        raw_temp_to_celcius_lut(
+            **input_vals._replace(raw=raw.astype("float"))._asdict()
+        )
+
+
+@pytest.mark.parametrize("input_vals", expected_raw_temp_to_celcius.keys())
+def test_raw_temp_to_celcius_out(input_vals):
+    raw = np.arange(17000, 19000, dtype=np.uint16).reshape((40, 50))
+    input_vals = input_vals._replace(raw=raw)
+    expected = raw_temp_to_celcius(**input_vals._asdict())
+
+    out = np.empty(raw.shape, dtype=np.float64)
+    assert raw_temp_to_celcius(**input_vals._asdict(), out=out) is out
+    assert np.array_equal(out, expected)
+
+    for convert in (raw_temp_to_celcius, raw_temp_to_celcius_lut):
+        actual_32 = convert(**input_vals._asdict(), dtype=np.float32)
+        assert actual_32.dtype == np.float32
+        assert np.allclose(actual_32, expected)
+
+
+def test_raw_temp_to_celcius_stack():
+    raw = np.arange(17000, 19000, dtype=np.uint16).reshape((2, 20, 50))
+    emissivities = [0.9, 0.95]
+    distances = [1.0, 10.0]
+    plancks = [CameraPlanckConsts(), CameraPlanckConsts(b=1500)]
+    stack = raw_temp_to_celcius_stack(
+        raw,
+        emissivity=emissivities,
+        subject_distance=distances,
+        reflected_temp=25,  # same value for every image
+        planck=CameraPlanckConsts(*zip(*plancks)),
+    )
+    assert stack.shape == raw.shape
+    for raw_image, thermal, emissivity, distance, planck in zip(
+        raw, stack, emissivities, distances, plancks
+    ):
+        expected = raw_temp_to_celcius(
+            raw_image,
+            emissivity=emissivity,
+            subject_distance=distance,
+            reflected_temp=25,
+            planck=planck,
+        )
+        assert np.allclose(thermal, expected)
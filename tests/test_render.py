@@ -0,0 +1,131 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+from flirextractor import FlirExtractor, Instrumentation
+from flirextractor.render import (
+    LUT_SIZE,
+    PALETTES,
+    auto_range,
+    downscale,
+    get_lut,
+    render,
+    write_thumbnails,
+)
+
+TEST_IMAGE = pathlib.Path(__file__).parent / "IR_2412.jpg"
+
+
+@pytest.mark.parametrize("palette", PALETTES)
+def test_get_lut(palette: str):
+    lut = get_lut(palette)
+    assert lut.shape == (LUT_SIZE, 3)
+    assert lut.dtype == np.uint8
+    assert get_lut(palette) is lut
+    with pytest.raises(ValueError):
+        lut[0] = 0  # shared, so read-only
+
+    with pytest.raises(ValueError, match="Unknown palette"):
+        get_lut("viridis")
+
+
+def test_render():
+    data = np.linspace(20, 30, 12).reshape(3, 4)
+    grey = render(data, "grey", vmin=20, vmax=30)
+    assert grey.shape == (3, 4, 3)
+    assert grey.dtype == np.uint8
+    assert np.array_equal(grey[..., 0], grey[..., 1])
+    assert grey[0, 0, 0] == 0 and grey[-1, -1, 0] == 255
+    assert np.all(np.diff(grey[..., 0].ravel().astype(int)) > 0)
+
+    # values outside the range are clipped, and NaN has its own colour
+    data[0, 0], data[0, 1] = np.nan, 100
+    grey = render(data, "grey", vmin=20, vmax=25, nan_colour=(255, 0, 0))
+    assert grey[0, 0].tolist() == [255, 0, 0]
+    assert grey[0, 1].tolist() == [255, 255, 255]
+    assert render(np.full((2, 2), np.nan)).shape == (2, 2, 3)
+
+
+def test_render_raw():
+    rng = np.random.default_rng(0)
+    raw = rng.integers(10000, 20000, (60, 80)).astype(np.uint16)
+    for palette in PALETTES:
+        assert np.array_equal(
+            render(raw, palette), render(raw.astype(np.float64), palette)
+        )
+    assert np.array_equal(
+        render(raw, vmin=12000, vmax=18000, max_size=40),
+        render(downscale(raw, 40).astype(np.float64), vmin=12000, vmax=18000),
+    )
+
+
+def test_auto_range():
+    data = np.arange(100, dtype=np.float64).reshape(10, 10)
+    assert auto_range(data, (0, 100)) == (0, 99)
+    assert auto_range(data) == pytest.approx((0.99, 98.01))
+    data[:5] = np.nan
+    assert auto_range(data, (0, 100)) == (50, 99)
+    assert auto_range(np.full((2, 2), np.nan)) == (0.0, 0.0)
+
+    large = np.arange(1024 * 1024, dtype=np.float32).reshape(1024, 1024)
+    vmin, vmax = auto_range(large, (0, 100))
+    assert vmin == 0 and vmax > 0.99 * large.max()
+
+
+def test_downscale():
+    data = np.arange(4 * 6, dtype=np.float64).reshape(4, 6)
+    assert downscale(data, 6) is data
+    small = downscale(data, 3)
+    assert small.shape == (2, 3)
+    assert small[0, 0] == pytest.approx(data[:2, :2].mean())
+
+    # leftover rows are cropped, and integers keep their dtype
+    raw = np.arange(5 * 7, dtype=np.uint16).reshape(5, 7)
+    small = downscale(raw, 3)
+    assert small.shape == (1, 2) and small.dtype == np.uint16
+    assert small[0, 0] == round(raw[:3, :3].mean())
+
+    with pytest.raises(ValueError):
+        downscale(data, 0)
+
+
+def test_write_thumbnails(tmp_path: pathlib.Path):
+    from PIL import Image
+
+    files = [
+        (TEST_IMAGE, tmp_path / "a.png"),
+        (tmp_path / "missing.jpg", tmp_path / "missing.png"),
+        (TEST_IMAGE, tmp_path / "nested" / "b.jpg"),
+        (TEST_IMAGE, tmp_path / "c.unknown"),
+    ]
+    instrumentation = Instrumentation()
+    with FlirExtractor(
+        chunk_size=2, instrumentation=instrumentation
+    ) as flir_extractor:
+        thermal_data = flir_extractor.get_thermal(TEST_IMAGE)
+        results = list(
+            flir_extractor.write_thumbnails(files, palette="rainbow")
+        )
+
+    assert [result.filepath for result in results] == [
+        filepath for filepath, _ in files
+    ]
+    assert [result.error is None for result in results] == [
+        True,
+        False,
+        True,
+        False,
+    ]
+    assert isinstance(results[1].error, FileNotFoundError)
+    assert isinstance(results[3].error, ValueError)
+    with Image.open(tmp_path / "a.png") as thumbnail:
+        assert np.array_equal(
+            np.array(thumbnail), render(thermal_data, "rainbow", max_size=160)
+        )
+    with Image.open(tmp_path / "nested" / "b.jpg") as thumbnail:
+        assert thumbnail.size == (160, 120)
+    assert instrumentation.stats()["render"].files == 2
+
+    with pytest.raises(ValueError, match="Unknown palette"):
+        next(write_thumbnails(flir_extractor, files, palette="viridis"))
@@ -0,0 +1,90 @@
+import pathlib
+import sys
+
+import numpy as np
+import pytest
+
+from flirextractor import FlirExtractor, FlirExtractorPool
+from flirextractor.get_thermal import ExifToolTimeoutError
+from flirextractor.results import ThermalResult
+from flirextractor.synthetic import make_flir_image
+
+TEST_IMAGE = pathlib.Path(__file__).parent / "IR_2412.jpg"
+
+
+@pytest.fixture
+def hanging_exiftool(tmp_path: pathlib.Path) -> pathlib.Path:
+    """An ExifTool executable that never replies."""
+    executable = tmp_path / "hanging-exiftool"
+    executable.write_text(
+        f"#!{sys.executable}\nimport time\ntime.sleep(60)\n"
+    )
+    executable.chmod(0o755)
+    return executable
+
+
+def test_thermal_result():
+    thermal_data = np.zeros((2, 2))
+    ok = ThermalResult("a.jpg", thermal_data, None, 1)
+    assert ok.ok
+    assert ok.unwrap() is thermal_data
+
+    failed = ThermalResult("b.jpg", None, FileNotFoundError("b.jpg"), 1)
+    assert not failed.ok
+    with pytest.raises(FileNotFoundError):
+        failed.unwrap()
+
+
+def test_get_thermal_results(tmp_path: pathlib.Path):
+    not_radiometric = tmp_path / "not_radiometric.jpg"
+    not_radiometric.write_bytes(make_flir_image((8, 8)).data[:2] + b"\xff\xd9")
+    filepaths = [
+        TEST_IMAGE,
+        tmp_path / "missing.jpg",
+        not_radiometric,
+        str(TEST_IMAGE),
+    ]
+    with FlirExtractor(chunk_size=4) as flir_extractor:
+        expected = flir_extractor.get_thermal(TEST_IMAGE)
+        with pytest.raises(FileNotFoundError):
+            flir_extractor.get_thermal_batch(filepaths)
+        results = flir_extractor.get_thermal_results(filepaths)
+
+    assert [result.filepath for result in results] == filepaths
+    assert [result.ok for result in results] == [True, False, False, True]
+    assert isinstance(results[1].error, FileNotFoundError)
+    assert isinstance(results[2].error, ValueError)
+    for result in results[::3]:
+        assert np.allclose(result.thermal, expected, equal_nan=True)
+
+
+def test_get_thermal_results_timeout(
+    hanging_exiftool: pathlib.Path, tmp_path: pathlib.Path
+):
+    synthetic = tmp_path / "synthetic.jpg"
+    synthetic.write_bytes(make_flir_image((8, 8)).data)
+    filepaths = [synthetic, TEST_IMAGE.with_suffix(".missing"), TEST_IMAGE]
+    with FlirExtractor(
+        exiftoolpath=hanging_exiftool, engine="native"
+    ) as flir_extractor:
+        # TEST_IMAGE is loaded natively, so only the missing file fails
+        results = flir_extractor.get_thermal_results(filepaths, timeout=0.1)
+        assert [result.ok for result in results] == [True, False, True]
+
+        not_native = tmp_path / "not_native.jpg"
+        not_native.write_bytes(b"not a FLIR file")
+        results = flir_extractor.get_thermal_results(
+            [synthetic, not_native, synthetic], retries=2, timeout=0.1
+        )
+    assert [result.ok for result in results] == [True, False, True]
+    assert isinstance(results[1].error, ExifToolTimeoutError)
+    assert results[1].attempts == 3
+    assert flir_extractor._exiftool is None
+
+
+def test_pool_get_thermal_results(tmp_path: pathlib.Path):
+    filepaths = [TEST_IMAGE, tmp_path / "missing.jpg"] * 3
+    with FlirExtractorPool(workers=2, chunk_size=2) as pool:
+        results = pool.get_thermal_results(filepaths)
+    assert [result.filepath for result in results] == filepaths
+    assert [result.ok for result in results] == [True, False] * 3
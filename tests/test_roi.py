@@ -0,0 +1,106 @@
+import math
+import pathlib
+
+import numpy as np
+import pytest
+
+from flirextractor.fff import load_flir_file
+from flirextractor.get_thermal import convert_image
+from flirextractor.radiometric import RadiometricImage
+from flirextractor.roi import Box, Polygon, roi_stats
+
+TEST_IMAGE = pathlib.Path(__file__).parent / "IR_2412.jpg"
+
+
+@pytest.fixture(scope="module")
+def radiometric() -> RadiometricImage:
+    fff_data = load_flir_file(TEST_IMAGE)
+    return RadiometricImage(fff_data.raw, fff_data.metadata)
+
+
+def _expected_stats(values: np.ndarray, percentiles):
+    values = np.sort(values[np.isfinite(values)])
+    expected = dict(
+        pixels=len(values),
+        min=values[0],
+        max=values[-1],
+        mean=values.mean(),
+        std=values.std(),
+    )
+    for percentile in percentiles:
+        rank = max(math.ceil(percentile / 100 * len(values)), 1)
+        expected[percentile] = values[rank - 1]
+    return expected
+
+
+def test_roi_stats(radiometric: RadiometricImage):
+    celcius = radiometric.celcius
+    mask = np.zeros(radiometric.shape, dtype=bool)
+    mask[100:200:3, 50:400:7] = True
+    # triangle with its right angle at (10, 10)
+    polygon = Polygon([(10, 10), (110, 10), (10, 110)])
+    ys, xs = np.mgrid[: celcius.shape[0], : celcius.shape[1]]
+    polygon_mask = (xs >= 10) & (ys >= 10) & (xs + ys <= 120)
+
+    percentiles = (0, 5, 50, 99.5, 100)
+    rois = [Box(20, 30, 300, 200), mask, polygon]
+    expected_values = [celcius[30:200, 20:300], celcius[mask]]
+    all_stats = radiometric.roi_stats(rois, percentiles)
+    for stats, values in zip(all_stats, expected_values):
+        expected = _expected_stats(values.ravel(), percentiles)
+        assert stats.pixels == expected["pixels"]
+        for name in ("min", "max", "mean", "std"):
+            assert getattr(stats, name) == pytest.approx(expected[name])
+        for percentile in percentiles:
+            assert stats.percentiles[percentile] == pytest.approx(
+                expected[percentile]
+            )
+
+    # PIL's polygon edges might not exactly match our mask
+    polygon_stats = all_stats[2]
+    assert polygon_stats.pixels == pytest.approx(polygon_mask.sum(), rel=0.05)
+    assert polygon_stats.mean == pytest.approx(
+        celcius[polygon_mask].mean(), rel=0.01
+    )
+
+
+def test_roi_stats_params(radiometric: RadiometricImage):
+    box = Box(0, 0, 10, 10)
+    emissive = radiometric.with_params(emissivity=0.5)
+    (stats,) = emissive.roi_stats([box])
+    assert stats.mean == pytest.approx(emissive.celcius[:10, :10].mean())
+
+
+def test_roi_stats_invalid(radiometric: RadiometricImage):
+    empty_mask = np.zeros(radiometric.raw.shape, dtype=bool)
+    (empty_stats,) = radiometric.roi_stats([empty_mask], (50,))
+    assert empty_stats.pixels == 0
+    assert math.isnan(empty_stats.mean)
+    assert math.isnan(empty_stats.percentiles[50])
+
+    with pytest.raises(ValueError):
+        radiometric.roi_stats([Box(0, 0, 10, 10)], (101,))
+    with pytest.raises(ValueError):
+        radiometric.roi_stats([np.ones((2, 2), dtype=bool)])
+
+    height, width = radiometric.raw.shape
+    for box in [
+        Box(10, 10, 10, 20),  # empty
+        Box(10, 20, 20, 10),  # upside down
+        Box(-1, 0, 10, 10),
+        Box(0, -1, 10, 10),
+        Box(0, 0, width + 1, 10),
+        Box(0, 0, 10, height + 1),
+    ]:
+        with pytest.raises(ValueError, match="ROI box"):
+            radiometric.roi_stats([box])
+    (whole_image,) = radiometric.roi_stats([Box(0, 0, width, height)])
+    assert whole_image.pixels == np.isfinite(radiometric.celcius).sum()
+
+
+def test_roi_stats_function():
+    fff_data = load_flir_file(TEST_IMAGE)
+    (stats,) = roi_stats(fff_data.metadata, fff_data.raw, [Box(0, 0, 1, 1)])
+    celcius = convert_image(fff_data.metadata, fff_data.raw)
+    assert stats.pixels == 1
+    assert stats.min == stats.max == pytest.approx(celcius[0, 0])
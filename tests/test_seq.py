@@ -0,0 +1,62 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+from flirextractor.fff import load_flir_file, read_fff
+from flirextractor.get_thermal import convert_image
+from flirextractor.seq import _iter_fff_frames, iter_frames, iter_raw_frames
+from flirextractor.synthetic import make_fff, make_raw
+
+TEST_IMAGE = pathlib.Path(__file__).parent / "IR_2412.jpg"
+
+
+@pytest.fixture(scope="module")
+def fff() -> bytes:
+    return read_fff(TEST_IMAGE.read_bytes())
+
+
+def test_iter_frames(fff: bytes, tmp_path: pathlib.Path):
+    seq_path = tmp_path / "test.seq"
+    # frames can be padded, and the last one truncated
+    seq_path.write_bytes(fff + b"\0FFF" + fff + fff[:100])
+
+    raw_frames = list(iter_raw_frames(seq_path))
+    assert len(raw_frames) == 2
+    # calibration should only be parsed once
+    assert raw_frames[0].metadata is raw_frames[1].metadata
+
+    expected = load_flir_file(TEST_IMAGE)
+    expected_thermal = convert_image(expected.metadata, expected.raw)
+    frames = list(iter_frames(seq_path, dtype=np.float32))
+    assert len(frames) == 2
+    for frame in frames:
+        assert frame.dtype == np.float32
+        assert np.allclose(frame, expected_thermal, equal_nan=True)
+
+
+def test_iter_frames_empty(tmp_path: pathlib.Path):
+    seq_path = tmp_path / "empty.seq"
+    seq_path.write_bytes(b"")
+    assert list(iter_frames(seq_path)) == []
+
+
+class _ScanCountingBytes(bytes):
+    """Counts how many bytes `find` scans."""
+
+    scanned = 0
+
+    def find(self, sub, start=0, *args):
+        found = super().find(sub, start, *args)
+        self.scanned += (len(self) if found == -1 else found) - start
+        return found
+
+
+def test_iter_fff_frames_single_pass():
+    frame = make_fff(make_raw((8, 8), seed=0))
+    frames = 1000
+    data = _ScanCountingBytes(frame * frames)
+    assert list(_iter_fff_frames(data)) == [frame] * frames
+    # searching for a magic that never appears must not rescan the rest of
+    # the sequence for every frame
+    assert data.scanned <= len(data)
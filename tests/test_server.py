@@ -0,0 +1,159 @@
+import json
+import os
+import pathlib
+import socket
+import stat
+import tempfile
+import threading
+
+import numpy as np
+import pytest
+
+from flirextractor import FlirClient, FlirExtractor
+from flirextractor.fff import FFFParseError
+from flirextractor.server import (
+    ServerError,
+    _FlirServer,
+    _make_private_directory,
+    default_socket_path,
+    serve,
+)
+
+TEST_IMAGE = pathlib.Path(__file__).parent / "IR_2412.jpg"
+
+
+@pytest.fixture
+def socket_path(tmp_path: pathlib.Path):
+    socket_path = str(tmp_path / "flirextractor.sock")
+    ready, stop = threading.Event(), threading.Event()
+    server_thread = threading.Thread(
+        target=serve,
+        args=(socket_path, ready, stop),
+        kwargs=dict(workers=2),
+    )
+    server_thread.start()
+    try:
+        assert ready.wait(timeout=30)
+        yield socket_path
+    finally:
+        stop.set()
+        server_thread.join(timeout=30)
+    assert not pathlib.Path(socket_path).exists()
+
+
+def test_client(socket_path: str):
+    with FlirExtractor() as extractor:
+        expected = extractor.get_thermal(TEST_IMAGE)
+
+    with FlirClient(socket_path) as client:
+        assert client.ping() > 0
+        assert np.array_equal(
+            client.get_thermal(TEST_IMAGE), expected, equal_nan=True
+        )
+        thermal_images = client.get_thermal_batch([TEST_IMAGE] * 3)
+        assert len(thermal_images) == 3
+        for thermal_data in thermal_images:
+            assert thermal_data.shape == expected.shape
+            assert np.array_equal(thermal_data, expected, equal_nan=True)
+
+        with pytest.raises(FileNotFoundError):
+            client.get_thermal(TEST_IMAGE.with_name("missing.jpg"))
+        # the connection is still usable after an error
+        assert client.get_thermal_batch([]) == []
+
+
+def test_server_handle_request(tmp_path: pathlib.Path):
+    socket_path = str(tmp_path / "flirextractor.sock")
+    server = _FlirServer(socket_path, pool=None)
+    server.timeout = 30
+    try:
+        # socketserver's handle_request() serves a single connection
+        handler = threading.Thread(target=server.handle_request)
+        handler.start()
+        with FlirClient(socket_path) as client:
+            assert client.ping() == os.getpid()
+        handler.join(timeout=30)
+        assert not handler.is_alive()
+    finally:
+        server.server_close()
+
+
+@pytest.mark.parametrize(
+    "error, expected_type",
+    [
+        (FileNotFoundError("missing"), FileNotFoundError),
+        (IsADirectoryError("a directory"), IsADirectoryError),
+        (NotADirectoryError("not a directory"), OSError),
+        (FFFParseError("corrupt"), FFFParseError),
+        (json.JSONDecodeError("invalid", "", 0), ValueError),
+        (RuntimeError("unexpected"), ServerError),
+    ],
+)
+def test_client_remote_errors(
+    tmp_path: pathlib.Path, error: Exception, expected_type: type
+):
+    socket_path = str(tmp_path / "flirextractor.sock")
+    server = _FlirServer(socket_path, pool=None)
+    server.timeout = 30
+
+    def dispatch(request):
+        raise error
+
+    server.dispatch = dispatch
+    try:
+        handler = threading.Thread(target=server.handle_request)
+        handler.start()
+        with FlirClient(socket_path) as client:
+            with pytest.raises(expected_type) as excinfo:
+                client.ping()
+        handler.join(timeout=30)
+    finally:
+        server.server_close()
+    assert type(excinfo.value) is expected_type
+    assert str(error) in str(excinfo.value)
+
+
+def test_client_not_running(tmp_path: pathlib.Path):
+    client = FlirClient(str(tmp_path / "missing.sock"))
+    with pytest.raises(ConnectionError):
+        client.open()
+    with pytest.raises(AttributeError):
+        client.get_thermal(TEST_IMAGE)
+
+
+def test_default_socket_path(tmp_path: pathlib.Path, monkeypatch):
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    socket_path = pathlib.Path(default_socket_path())
+    assert socket_path.parent.parent == tmp_path
+
+    _make_private_directory(str(socket_path.parent))
+    assert stat.S_IMODE(socket_path.parent.stat().st_mode) == 0o700
+    _make_private_directory(str(socket_path.parent))  # already exists
+
+    # another user could have created the directory first
+    socket_path.parent.chmod(0o777)
+    with pytest.raises(PermissionError):
+        _make_private_directory(str(socket_path.parent))
+
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path / "runtime"))
+    assert pathlib.Path(default_socket_path()).parent == tmp_path / "runtime"
+
+
+@pytest.mark.skipif(
+    not hasattr(socket, "SO_PEERCRED"), reason="requires SO_PEERCRED"
+)
+def test_client_other_user(tmp_path: pathlib.Path, monkeypatch):
+    socket_path = str(tmp_path / "other.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(socket_path)
+        listener.listen(1)
+        client = FlirClient(socket_path)
+        with client:
+            pass  # run by the current user
+
+        uid = os.getuid()
+        monkeypatch.setattr(os, "getuid", lambda: uid + 1)
+        with pytest.raises(PermissionError):
+            client.open()
+        assert client._socket is None
@@ -0,0 +1,141 @@
+import pathlib
+import typing
+
+import numpy as np
+import pytest
+
+from flirextractor import FlirExtractor
+from flirextractor.fff import read_flir_data
+from flirextractor.get_thermal import convert_image
+from flirextractor.synthetic import (
+    BYTE_ORDERS,
+    DEFAULT_CALIBRATION,
+    RAW_FORMATS,
+    make_flir_image,
+    make_raw,
+    stored_metadata,
+    write_flir_images,
+)
+
+
+@pytest.mark.parametrize("raw_format", RAW_FORMATS)
+@pytest.mark.parametrize("byte_order", BYTE_ORDERS)
+def test_make_flir_image(raw_format: str, byte_order: str):
+    image = make_flir_image((120, 160), raw_format, byte_order, seed=0)
+    assert np.array_equal(image.raw, make_raw((120, 160), seed=0))
+
+    flir_data = read_flir_data(image.data)
+    assert flir_data.metadata == image.metadata
+    assert np.array_equal(flir_data.raw, image.raw)
+
+
+def test_make_flir_image_large():
+    # the FFF file is split over many FLIR APP1 segments
+    image = make_flir_image((1024, 1280), seed=0)
+    assert np.array_equal(read_flir_data(image.data).raw, image.raw)
+
+
+def planck_raw(metadata: typing.Mapping[str, float], celcius):
+    """The raw signal of a blackbody, from the Planck calibration."""
+    kelvin = np.asarray(celcius) + 273.15
+    denominator = metadata["PlanckR2"] * (
+        np.exp(metadata["PlanckB"] / kelvin) - metadata["PlanckF"]
+    )
+    return metadata["PlanckR1"] / denominator - metadata["PlanckO"]
+
+
+def forward_raw(metadata: typing.Mapping[str, float], celcius):
+    """The raw data a camera measures of an object, i.e. the inverse of the
+    conversion into Celcius, written out independently from
+    `flirextractor.raw_temp_to_celcius`, after gtatters/Thermimage."""
+    emissivity = metadata["Emissivity"]
+    window_transmission = metadata["IRWindowTransmission"]
+    atmospheric_temp = metadata["AtmosphericTemperature"]
+    reflected_temp = metadata["ReflectedApparentTemperature"]
+    # transmission of the atmosphere on each side of the window, which is
+    # half-way between the object and the camera
+    water = metadata["RelativeHumidity"] * np.exp(
+        1.5587
+        + 0.06939 * atmospheric_temp
+        - 0.00027816 * atmospheric_temp ** 2
+        + 0.00000068455 * atmospheric_temp ** 3
+    )
+    sqrt_distance = np.sqrt(metadata["SubjectDistance"] / 2)
+    x = metadata["AtmosphericTransX"]
+    tau = x * np.exp(
+        -sqrt_distance
+        * (
+            metadata["AtmosphericTransAlpha1"]
+            + metadata["AtmosphericTransBeta1"] * np.sqrt(water)
+        )
+    ) + (1 - x) * np.exp(
+        -sqrt_distance
+        * (
+            metadata["AtmosphericTransAlpha2"]
+            + metadata["AtmosphericTransBeta2"] * np.sqrt(water)
+        )
+    )
+    # the object, reflections and atmosphere, seen through the atmosphere
+    # and the window (which has no reflections)
+    before_window = (
+        emissivity * planck_raw(metadata, celcius)
+        + (1 - emissivity) * planck_raw(metadata, reflected_temp)
+    ) * tau + (1 - tau) * planck_raw(metadata, atmospheric_temp)
+    after_window = window_transmission * before_window + (
+        1 - window_transmission
+    ) * planck_raw(metadata, metadata["IRWindowTemperature"])
+    return tau * after_window + (1 - tau) * planck_raw(
+        metadata, atmospheric_temp
+    )
+
+
+def test_conversion_ground_truth():
+    calibration = dict(
+        DEFAULT_CALIBRATION,
+        Emissivity=0.9,
+        SubjectDistance=10.0,
+        ReflectedApparentTemperature=25.0,
+        AtmosphericTemperature=15.0,
+        IRWindowTemperature=22.0,
+        IRWindowTransmission=0.95,
+        RelativeHumidity=0.6,
+    )
+    metadata = stored_metadata(calibration)
+    celcius = np.array([[-10.0, 0.0, 12.5], [20.0, 37.0, 80.0]])
+
+    raw = forward_raw(metadata, celcius)
+    assert np.allclose(convert_image(metadata, raw), celcius, atol=1e-6)
+
+    # uint16 raw data recovers the temperatures to within half a count
+    raw_counts = np.rint(raw).astype(np.uint16)
+    image = make_flir_image(raw=raw_counts, calibration=calibration)
+    flir_data = read_flir_data(image.data)
+    assert flir_data.metadata == metadata
+    error = convert_image(flir_data.metadata, flir_data.raw) - celcius
+    counts_per_degree = (forward_raw(metadata, celcius + 1e-3) - raw) / 1e-3
+    assert np.all(np.abs(error) <= 0.5 / counts_per_degree + 1e-6)
+
+
+@pytest.mark.parametrize("raw_format", RAW_FORMATS)
+@pytest.mark.parametrize("byte_order", BYTE_ORDERS)
+def test_load_synthetic(
+    raw_format: str, byte_order: str, tmp_path: pathlib.Path
+):
+    filepaths = write_flir_images(
+        tmp_path,
+        4,
+        unique=2,
+        shape=(60, 80),
+        raw_format=raw_format,
+        byte_order=byte_order,
+    )
+    assert filepaths[2].read_bytes() == filepaths[0].read_bytes()
+    for engine in ("exiftool", "native"):
+        with FlirExtractor(engine=engine) as extractor:
+            thermal_images = extractor.get_thermal_batch(filepaths)
+        for index, thermal_data in enumerate(thermal_images):
+            image = make_flir_image(
+                (60, 80), raw_format, byte_order, seed=index % 2
+            )
+            expected = convert_image(image.metadata, image.raw)
+            assert np.allclose(thermal_data, expected, atol=1e-3)
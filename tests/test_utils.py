@@ -1,4 +1,6 @@
-from flirextractor.utils import split_dict
+import pytest
+
+from flirextractor.utils import chunked, split_dict
 
 
 def test_split_dict():
@@ -9,3 +11,11 @@ def test_split_dict():
 
     even_keys = filter(lambda x: 0 == int(x) % 2, input_dict.keys())
     assert split_dict(input_dict, even_keys) == (even_dict, odd_dict)
+
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 2)) == []
+
+    with pytest.raises(ValueError):
+        next(chunked(range(5), 0))
@@ -0,0 +1,180 @@
+import base64
+import json
+import pathlib
+import sys
+
+import numpy as np
+import pytest
+from exiftool import ExifTool
+
+from flirextractor import FlirExtractor, ThermalVisualImage
+from flirextractor.fff import read_flir_data, read_flir_visual_data
+from flirextractor.get_thermal import ENGINES, convert_image
+from flirextractor.synthetic import BYTE_ORDERS, make_flir_image
+from flirextractor.visual import Alignment, _get_visual_batch, register_visual
+
+TEST_IMAGE = pathlib.Path(__file__).parent / "IR_2412.jpg"
+
+ALIGNMENT = dict(
+    Real2IR=1.5,
+    OffsetX=-4,
+    OffsetY=6,
+    PiPX1=0,
+    PiPX2=79,
+    PiPY1=0,
+    PiPY2=59,
+)
+
+
+def make_visual(shape=(90, 120)) -> np.ndarray:
+    """A visual image whose pixels encode their own coordinates."""
+    y, x = np.indices(shape)
+    return np.stack([x, y, np.full(shape, 255)], axis=-1).astype(np.uint8)
+
+
+@pytest.mark.parametrize("byte_order", BYTE_ORDERS)
+def test_read_flir_visual_data(byte_order: str):
+    visual = make_visual()
+    image = make_flir_image(
+        (60, 80),
+        byte_order=byte_order,
+        seed=0,
+        visual=visual,
+        alignment=ALIGNMENT,
+    )
+    assert image.alignment == ALIGNMENT
+
+    visual_data = read_flir_visual_data(image.data)
+    assert visual_data.metadata == image.metadata
+    assert np.array_equal(visual_data.raw, image.raw)
+    assert visual_data.alignment == ALIGNMENT
+    assert visual_data.embedded_image[:4] == b"\x89PNG"
+
+    # images without a visual image still load
+    flir_data = read_flir_visual_data(make_flir_image((60, 80)).data)
+    assert flir_data.embedded_image is None
+    assert flir_data.alignment == {}
+    assert np.array_equal(read_flir_data(image.data).raw, image.raw)
+
+
+def test_register_visual_identity():
+    visual = make_visual((60, 80))
+    alignment = Alignment(1.0, 0, 0, 0, 79, 0, 59)
+    for interpolation in ("nearest", "bilinear"):
+        registered = register_visual(
+            visual, (60, 80), alignment, interpolation=interpolation
+        )
+        assert registered.dtype == visual.dtype
+        assert np.array_equal(registered, visual)
+
+    # the same field of view, on a coarser grid
+    registered = register_visual(visual, (30, 40), alignment, "nearest")
+    assert registered.shape == (30, 40, 3)
+    difference = registered[..., 0] - visual[::2, ::2, 0].astype(int)
+    assert np.all(np.abs(difference) <= 1)
+
+
+def test_register_visual_shift_and_scale():
+    visual = make_visual((90, 120))
+    alignment = Alignment(2.0, 10, -5, 0, 0, 0, 0)
+    registered = register_visual(visual, (44, 60), alignment)
+    # the thermal image covers the centre half of the visual image,
+    # offset by 10 pixels right and 5 pixels up, at the same resolution
+    assert np.array_equal(registered, visual[18:62, 40:100])
+
+
+def test_register_visual_bilinear():
+    visual = np.array([[0, 100], [50, 150]], dtype=np.float64)
+    # each thermal pixel is a quarter of a visual pixel
+    alignment = Alignment(1.0, 0, 0, 0, 0, 0, 0)
+    registered = register_visual(visual, (4, 4), alignment)
+    assert registered[0, 0] == 0  # clamped to the corner
+    assert registered[3, 3] == 150
+    assert np.all(np.diff(registered, axis=0) >= 0)
+    assert np.all(np.diff(registered, axis=1) >= 0)
+    assert registered[1, 1] == pytest.approx(37.5)
+
+
+def test_register_visual_fill():
+    visual = make_visual((60, 80))
+    alignment = Alignment(0.5, 0, 0, 0, 0, 0, 0)
+    registered = register_visual(visual, (60, 80), alignment, fill=7)
+    # the thermal field of view is twice as wide as the visual image
+    assert np.all(registered[:, :20] == 7)
+    assert np.all(registered[:, 60:] == 7)
+    assert np.all(registered[:15] == 7)
+    assert np.all(registered[15:45, 20:60, 2] == 255)
+
+    with pytest.raises(ValueError, match="interpolation"):
+        register_visual(visual, (60, 80), alignment, interpolation="cubic")
+    with pytest.raises(ValueError, match="Real2IR"):
+        register_visual(visual, (60, 80), alignment._replace(real2ir=0))
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_get_thermal_visual(engine: str, tmp_path: pathlib.Path):
+    visual = make_visual()
+    image = make_flir_image(
+        (60, 80), seed=0, visual=visual, alignment=ALIGNMENT
+    )
+    synthetic = tmp_path / "synthetic.jpg"
+    synthetic.write_bytes(image.data)
+
+    with FlirExtractor(engine=engine) as flir_extractor:
+        thermal_visual_images = flir_extractor.get_thermal_visual_batch(
+            [synthetic, TEST_IMAGE]
+        )
+        expected = flir_extractor.get_thermal(TEST_IMAGE)
+
+    thermal_visual, real = thermal_visual_images
+    assert isinstance(thermal_visual, ThermalVisualImage)
+    assert np.allclose(
+        thermal_visual.thermal, convert_image(image.metadata, image.raw)
+    )
+    assert np.array_equal(thermal_visual.visual, visual)
+    assert thermal_visual.alignment == Alignment(1.5, -4, 6, 0, 79, 0, 59)
+    assert thermal_visual.register().shape == (60, 80, 3)
+
+    # IR_2412.jpg does not have an embedded visual image
+    assert np.allclose(real.thermal, expected, equal_nan=True)
+    assert real.visual is None
+    with pytest.raises(ValueError):
+        real.register()
+
+
+def test_get_visual_batch_out_of_order(tmp_path: pathlib.Path):
+    str_paths = []
+    for name in ("a", "b"):
+        filepath = tmp_path / f"{name}.jpg"
+        filepath.write_bytes(b"not read by the fake ExifTool")
+        str_paths.append(str(filepath))
+    # an ExifTool that replies with the files in reverse order
+    json_output = [
+        {
+            "SourceFile": str_path,
+            "APP1:RawThermalImage": "base64:" + base64.b64encode(
+                f"raw {str_path}".encode()
+            ).decode(),
+            "APP1:EmbeddedImage": "base64:" + base64.b64encode(
+                f"visual {str_path}".encode()
+            ).decode(),
+        }
+        for str_path in reversed(str_paths)
+    ]
+    executable = tmp_path / "reversed-exiftool"
+    executable.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        "for line in sys.stdin:\n"
+        "    if line.startswith('-execute'):\n"
+        f"        print({json.dumps(json_output)!r})\n"
+        "        print('{ready}', flush=True)\n"
+    )
+    executable.chmod(0o755)
+
+    with ExifTool(executable_=str(executable)) as exiftool:
+        visual_batch = _get_visual_batch(exiftool, str_paths)
+
+    for str_path, (_, raw, embedded_image, _) in zip(str_paths, visual_batch):
+        assert raw == f"raw {str_path}".encode()
+        assert embedded_image == f"visual {str_path}".encode()